@@ -4,8 +4,20 @@
 
 from .cart_helper import CartHelper
 from .order_helper import OrderHelper
+from .catalog_helper import CatalogHelper
+from .search_index import SearchIndex
+from .review_helper import ReviewHelper
+from .image_helper import ImageHelper
+from .change_feed import ChangeFeed
+from .search_report import SearchReport
 
 __all__ = [
     'CartHelper',
-    'OrderHelper'
+    'OrderHelper',
+    'CatalogHelper',
+    'SearchIndex',
+    'ReviewHelper',
+    'ImageHelper',
+    'ChangeFeed',
+    'SearchReport'
 ]
@@ -3,11 +3,354 @@
 # ============================================
 
 from flask import session
+from sqlalchemy import inspect as sa_inspect
 
 
 class CartHelper:
     """Helper para operações de carrinho"""
     
+    # Colunas de Product usadas pelo carrinho (página, /api/carrinho e checkout)
+    CART_COLUMNS = ('id', 'titulo', 'preco', 'estoque', 'imagem', 'imagens')
+    UNIQUE_INDEX = 'uq_cart_item_user_product'
+    BATCH_ACTIONS = ('set', 'add', 'sub', 'remove')
+    MAX_BATCH_OPS = 100
+    
+    @staticmethod
+    def ensure_unique_lines(db, CartItem):
+        """
+        Garante uma linha por (user_id, product_id) em cart_item (idempotente).
+        
+        Bancos criados antes do índice único podem ter linhas repetidas
+        (duplo clique, abas em paralelo): as quantidades são somadas na
+        linha mais antiga, as demais removidas, e o índice é criado.
+        
+        Returns:
+            int: linhas repetidas removidas (0 se o índice já existia)
+        """
+        indices = sa_inspect(db.engine).get_indexes(CartItem.__tablename__)
+        if any(i['name'] == CartHelper.UNIQUE_INDEX for i in indices):
+            return 0
+        
+        try:
+            db.session.execute(db.text("""
+                UPDATE cart_item SET quantity = (
+                    SELECT SUM(c.quantity) FROM cart_item c
+                    WHERE c.user_id = cart_item.user_id AND c.product_id = cart_item.product_id
+                )
+                WHERE id IN (
+                    SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id HAVING COUNT(*) > 1
+                )
+            """))
+            removidas = db.session.execute(db.text("""
+                DELETE FROM cart_item WHERE id NOT IN (
+                    SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id
+                )
+            """)).rowcount
+            db.session.execute(db.text(
+                f"CREATE UNIQUE INDEX {CartHelper.UNIQUE_INDEX} ON cart_item (user_id, product_id)"
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return removidas
+    
+    @staticmethod
+    def _insert(db):
+        """insert() do dialeto atual (com on_conflict_do_update)"""
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert
+    
+    @staticmethod
+    def add_quantity(db, CartItem, Product, user_id, product_id, quantidade=1):
+        """
+        Soma `quantidade` ao item do carrinho do usuário num único statement
+        (sem commit):
+        
+            INSERT INTO cart_item ... SELECT ... FROM product WHERE estoque >= :qtd
+            ON CONFLICT (user_id, product_id) DO UPDATE
+                SET quantity = cart_item.quantity + excluded.quantity
+                WHERE cart_item.quantity + excluded.quantity <= product.estoque
+            RETURNING quantity
+        
+        Cliques repetidos e abas em paralelo não duplicam linhas nem passam
+        do estoque. Só quando nada foi gravado o produto é consultado, para
+        explicar o motivo.
+        
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        insert = CartHelper._insert(db)
+        estoque = db.select(Product.estoque).where(Product.id == product_id).scalar_subquery()
+        origem = db.select(db.literal(user_id), Product.id, db.literal(quantidade)).where(
+            Product.id == product_id, Product.estoque >= quantidade
+        )
+        stmt = insert(CartItem).from_select(['user_id', 'product_id', 'quantity'], origem)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'product_id'],
+            set_={'quantity': CartItem.quantity + stmt.excluded.quantity},
+            where=CartItem.quantity + stmt.excluded.quantity <= estoque
+        ).returning(CartItem.quantity)
+        
+        if db.session.execute(stmt).scalar() is not None:
+            return True, "Produto adicionado (DB)"
+        
+        produto = db.session.query(Product.estoque).filter(Product.id == product_id).first()
+        if not produto:
+            return False, "Produto não encontrado"
+        if produto.estoque <= 0:
+            return False, "Produto esgotado"
+        return False, "Estoque insuficiente"
+    
+    @staticmethod
+    def subtract_quantity(db, CartItem, user_id, product_id, quantidade=1):
+        """Tira `quantidade` do item (sem SELECT); a linha sai ao chegar a zero. Sem commit."""
+        filtro = (CartItem.user_id == user_id, CartItem.product_id == product_id)
+        db.session.query(CartItem).filter(*filtro).update(
+            {CartItem.quantity: CartItem.quantity - quantidade}, synchronize_session=False
+        )
+        db.session.query(CartItem).filter(*filtro, CartItem.quantity <= 0).delete(synchronize_session=False)
+    
+    @staticmethod
+    def products_map(db, Product, product_ids):
+        """
+        Produtos do carrinho num único SELECT ... WHERE id IN (...).
+        
+        Returns:
+            dict: {id: Row(CART_COLUMNS)}; ids que não existem mais ficam de fora
+        """
+        ids = list(dict.fromkeys(product_ids))
+        if not ids:
+            return {}
+        colunas = [getattr(Product, c) for c in CartHelper.CART_COLUMNS]
+        return {p.id: p for p in db.session.query(*colunas).filter(Product.id.in_(ids))}
+    
+    @staticmethod
+    def _session_items():
+        """Itens do carrinho da sessão como [(product_id, quantidade)], ignorando entradas inválidas"""
+        linhas = []
+        for pid, qtd in session.get('cart', {}).items():
+            try:
+                linhas.append((int(pid), int(qtd)))
+            except (TypeError, ValueError):
+                continue
+        return linhas
+    
+    @staticmethod
+    def session_cart_lines(db, Product):
+        """
+        Carrinho do visitante (sessão) com os produtos resolvidos de uma vez.
+        
+        Returns:
+            list: [(produto, quantidade)] na ordem do carrinho, sem produtos
+            removidos do catálogo
+        """
+        linhas = CartHelper._session_items()
+        produtos = CartHelper.products_map(db, Product, [pid for pid, _ in linhas])
+        return [(produtos[pid], qtd) for pid, qtd in linhas if pid in produtos]
+    
+    @staticmethod
+    def user_cart_lines(db, CartItem, Product, user_id):
+        """
+        Carrinho do usuário logado: itens e produtos num único SELECT com JOIN,
+        só com as colunas do carrinho (sem CartItem.product carregado item a item).
+        
+        Returns:
+            list: [(produto, quantidade)] na ordem em que foram adicionados
+        """
+        colunas = [getattr(Product, c) for c in CartHelper.CART_COLUMNS]
+        rows = (
+            db.session.query(CartItem.quantity, *colunas)
+            .join(Product, Product.id == CartItem.product_id)
+            .filter(CartItem.user_id == user_id)
+            .order_by(CartItem.id)
+            .all()
+        )
+        return [(r, r.quantity) for r in rows]
+    
+    @staticmethod
+    def cart_lines(db, CartItem, Product):
+        """Linhas do carrinho atual (banco se logado, senão sessão) com uma consulta"""
+        if session.get('user_id'):
+            return CartHelper.user_cart_lines(db, CartItem, Product, session['user_id'])
+        return CartHelper.session_cart_lines(db, Product)
+    
+    @staticmethod
+    def merge_session_cart(db, CartItem, Product, user_id):
+        """
+        Passa o carrinho do visitante (sessão) para o carrinho do usuário no login.
+        
+        Número fixo de statements, qualquer que seja o tamanho do carrinho:
+        uma consulta de estoque e um INSERT ... ON CONFLICT em lote que soma
+        às linhas que o usuário já tinha, sempre limitado ao estoque.
+        Produtos inexistentes ou esgotados ficam de fora. O carrinho da
+        sessão é esvaziado depois do commit.
+        
+        Returns:
+            int: produtos gravados no carrinho do usuário
+        """
+        linhas = {pid: qtd for pid, qtd in CartHelper._session_items() if qtd > 0}
+        
+        gravar = []
+        if linhas:
+            estoque = dict(
+                db.session.query(Product.id, Product.estoque)
+                .filter(Product.id.in_(list(linhas)), Product.estoque > 0)
+                .all()
+            )
+            gravar = [
+                {"user_id": user_id, "product_id": pid, "quantity": min(qtd, estoque[pid])}
+                for pid, qtd in linhas.items() if pid in estoque
+            ]
+        
+        if gravar:
+            stmt = CartHelper._insert(db)(CartItem).values(gravar)
+            # "excluded" como texto: stmt.excluded numa subconsulta entraria no FROM dela
+            limite = (
+                db.select(Product.estoque)
+                .where(Product.id == db.literal_column('excluded.product_id'))
+                .scalar_subquery()
+            )
+            soma = CartItem.quantity + stmt.excluded.quantity
+            try:
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['user_id', 'product_id'],
+                    set_={'quantity': db.case((soma > limite, limite), else_=soma)}
+                ))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        session.pop('cart', None)
+        return len(gravar)
+    
+    @staticmethod
+    def parse_batch(operacoes):
+        """
+        Valida as operações de /api/carrinho/batch.
+        
+        Cada operação é {"produto_id", "acao", "quantidade"}: set exige
+        quantidade; add/sub usam 1 por padrão; remove ignora quantidade.
+        
+        Returns:
+            list: [(product_id, acao, quantidade)] na ordem enviada
+        
+        Raises:
+            ValueError: lista vazia, grande demais ou operação inválida
+        """
+        if not isinstance(operacoes, list) or not operacoes:
+            raise ValueError("Informe a lista de operações")
+        if len(operacoes) > CartHelper.MAX_BATCH_OPS:
+            raise ValueError(f"Máximo de {CartHelper.MAX_BATCH_OPS} operações por requisição")
+        
+        lista = []
+        for op in operacoes:
+            if not isinstance(op, dict):
+                raise ValueError("Operação inválida")
+            pid, acao = op.get('produto_id'), op.get('acao')
+            if isinstance(pid, bool) or not isinstance(pid, int) or pid <= 0:
+                raise ValueError(f"produto_id inválido: {pid}")
+            if acao not in CartHelper.BATCH_ACTIONS:
+                raise ValueError(f"Ação inválida: {acao}")
+            if acao == 'set' and 'quantidade' not in op:
+                raise ValueError("A ação set exige quantidade")
+            qtd = op.get('quantidade', 1) if acao != 'remove' else 0
+            if isinstance(qtd, bool) or not isinstance(qtd, int) or qtd < 0:
+                raise ValueError(f"Quantidade inválida: {qtd}")
+            lista.append((pid, acao, qtd))
+        return lista
+    
+    @staticmethod
+    def apply_batch(db, CartItem, Product, operacoes):
+        """
+        Aplica as operações (parse_batch) ao carrinho atual: tudo ou nada.
+        
+        Uma consulta lê estoque e quantidade atual de todos os produtos
+        tocados; as quantidades finais são calculadas em memória, na ordem
+        das operações, e conferidas com o estoque antes de gravar. Diminuir
+        é sempre permitido, mesmo que o item já esteja acima do estoque.
+        No banco a gravação é um DELETE e um INSERT ... ON CONFLICT na
+        transação atual (commit pelo chamador).
+        
+        Returns:
+            list: [{"produto_id", "erro", "estoque"}] — vazia se aplicou
+        """
+        ids = list(dict.fromkeys(pid for pid, _, _ in operacoes))
+        user_id = session.get('user_id')
+        
+        if user_id:
+            rows = (
+                db.session.query(Product.id, Product.estoque, CartItem.quantity)
+                .outerjoin(CartItem, db.and_(CartItem.product_id == Product.id,
+                                             CartItem.user_id == user_id))
+                .filter(Product.id.in_(ids))
+                .all()
+            )
+            estoque = {r.id: r.estoque for r in rows}
+            atual = {r.id: r.quantity or 0 for r in rows}
+        else:
+            carrinho = session.get('cart', {})
+            estoque = dict(db.session.query(Product.id, Product.estoque).filter(Product.id.in_(ids)).all())
+            atual = {pid: int(carrinho.get(str(pid), 0)) for pid in ids}
+        
+        final = dict(atual)
+        for pid, acao, qtd in operacoes:
+            quantidade = final.get(pid, 0)
+            if acao == 'set':
+                quantidade = qtd
+            elif acao == 'add':
+                quantidade += qtd
+            elif acao == 'sub':
+                quantidade = max(quantidade - qtd, 0)
+            else:
+                quantidade = 0
+            final[pid] = quantidade
+        
+        erros = []
+        for pid in ids:
+            quantidade = final[pid]
+            if quantidade == 0:
+                continue
+            if pid not in estoque:
+                erros.append({"produto_id": pid, "erro": "Produto não encontrado", "estoque": 0})
+            elif quantidade > estoque[pid] and quantidade > atual[pid]:
+                erro = "Produto esgotado" if estoque[pid] <= 0 else "Estoque insuficiente"
+                erros.append({"produto_id": pid, "erro": erro, "estoque": estoque[pid]})
+        if erros:
+            return erros
+        
+        alterados = {pid: q for pid, q in final.items() if q != atual.get(pid, 0)}
+        if user_id:
+            zerados = [pid for pid, q in alterados.items() if q == 0]
+            gravar = [
+                {"user_id": user_id, "product_id": pid, "quantity": q}
+                for pid, q in alterados.items() if q > 0
+            ]
+            if zerados:
+                db.session.query(CartItem).filter(
+                    CartItem.user_id == user_id, CartItem.product_id.in_(zerados)
+                ).delete(synchronize_session=False)
+            if gravar:
+                stmt = CartHelper._insert(db)(CartItem).values(gravar)
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['user_id', 'product_id'],
+                    set_={'quantity': stmt.excluded.quantity}
+                ))
+        else:
+            carrinho = dict(session.get('cart', {}))
+            for pid, q in alterados.items():
+                if q:
+                    carrinho[str(pid)] = q
+                else:
+                    carrinho.pop(str(pid), None)
+            session['cart'] = carrinho
+            session.modified = True
+        return []
+    
     @staticmethod
     def snapshot_cart_for_checkout(db, CartItem, Product):
         """
@@ -17,30 +360,13 @@ class CartHelper:
             list: [{"titulo": str, "quantidade": int, "preco": float, "product_id": int}]
         """
         itens = []
-        
-        if session.get('user_id'):
-            # Usuário logado: busca do banco
-            user_id = session['user_id']
-            for it in CartItem.query.filter_by(user_id=user_id).all():
-                if it.product:
-                    itens.append({
-                        "titulo": it.product.titulo,
-                        "quantidade": int(it.quantity),
-                        "preco": float(it.product.preco),
-                        "product_id": it.product.id
-                    })
-        else:
-            # Visitante: busca da sessão
-            cart = session.get('cart', {})
-            for pid_str, qtd in cart.items():
-                p = Product.query.get(int(pid_str))
-                if p:
-                    itens.append({
-                        "titulo": p.titulo,
-                        "quantidade": int(qtd),
-                        "preco": float(p.preco),
-                        "product_id": p.id
-                    })
+        for p, qtd in CartHelper.cart_lines(db, CartItem, Product):
+            itens.append({
+                "titulo": p.titulo,
+                "quantidade": int(qtd),
+                "preco": float(p.preco),
+                "product_id": p.id
+            })
         
         return itens
     
@@ -70,6 +396,13 @@ class CartHelper:
         Returns:
             tuple: (success: bool, message: str)
         """
+        if session.get('user_id'):
+            # Usuário logado: um único INSERT ... ON CONFLICT com trava de estoque
+            sucesso, mensagem = CartHelper.add_quantity(db, CartItem, Product, session['user_id'], product_id)
+            if sucesso:
+                db.session.commit()
+            return sucesso, mensagem
+        
         produto = Product.query.get(product_id)
         if not produto:
             return False, "Produto não encontrado"
@@ -77,34 +410,17 @@ class CartHelper:
         if produto.estoque <= 0:
             return False, "Produto esgotado"
         
-        if session.get('user_id'):
-            # Usuário logado
-            user_id = session['user_id']
-            item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-            
-            quantidade_atual = item.quantity if item else 0
-            if quantidade_atual + 1 > produto.estoque:
-                return False, "Estoque insuficiente"
-            
-            if item:
-                item.quantity += 1
-            else:
-                db.session.add(CartItem(user_id=user_id, product_id=product_id, quantity=1))
-            
-            db.session.commit()
-            return True, "Produto adicionado (DB)"
-        else:
-            # Visitante
-            carrinho = session.get('cart', {})
-            quantidade_atual = carrinho.get(str(product_id), 0)
-            
-            if quantidade_atual + 1 > produto.estoque:
-                return False, "Estoque insuficiente"
-            
-            carrinho[str(product_id)] = quantidade_atual + 1
-            session['cart'] = carrinho
-            session.modified = True
-            return True, "Produto adicionado (sessão)"
+        # Visitante
+        carrinho = session.get('cart', {})
+        quantidade_atual = carrinho.get(str(product_id), 0)
+        
+        if quantidade_atual + 1 > produto.estoque:
+            return False, "Estoque insuficiente"
+        
+        carrinho[str(product_id)] = quantidade_atual + 1
+        session['cart'] = carrinho
+        session.modified = True
+        return True, "Produto adicionado (sessão)"
     
     @staticmethod
     def update_quantity(db, CartItem, product_id, action):
@@ -118,18 +434,15 @@ class CartHelper:
             tuple: (success: bool, message: str)
         """
         if session.get('user_id'):
+            from app.models import Product
             user_id = session['user_id']
-            item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
             
             if action == 'add':
-                if item:
-                    item.quantity += 1
-                else:
-                    db.session.add(CartItem(user_id=user_id, product_id=product_id, quantity=1))
-            elif action == 'sub' and item:
-                item.quantity -= 1
-                if item.quantity <= 0:
-                    db.session.delete(item)
+                sucesso, mensagem = CartHelper.add_quantity(db, CartItem, Product, user_id, product_id)
+                if not sucesso:
+                    return False, mensagem
+            elif action == 'sub':
+                CartHelper.subtract_quantity(db, CartItem, user_id, product_id)
             
             db.session.commit()
             return True, "OK"
@@ -0,0 +1,372 @@
+# ============================================
+# helpers/catalog_helper.py — Helper do Catálogo
+# ============================================
+
+
+import base64
+import json
+import math
+
+
+class CatalogHelper:
+    """Helper para consultas do catálogo de produtos"""
+
+    # Campos disponíveis nas APIs de produtos (parâmetro fields=)
+    FIELDS = ('id', 'titulo', 'descricao', 'preco', 'imagem', 'imagens', 'cor_dominante', 'miniatura',
+              'estoque', 'media', 'n_reviews')
+
+    MAX_PAGE_SIZE = 100
+    # Opções de ordenar= aceitas pela busca
+    SORT_OPTIONS = ('relevancia', 'nome', 'preco_asc', 'preco_desc', 'estoque')
+    # Facetas da busca: limites das faixas de preço (a última é "acima de")
+    PRICE_BUCKETS = (0, 25, 50, 100, 200)
+    # Mesma regra dos cards: estoque < LOW_STOCK é "últimas unidades"
+    LOW_STOCK = 10
+    # Faixas de avaliação cumulativas ("4 estrelas ou mais", ...)
+    RATING_BANDS = (4, 3, 2, 1)
+
+    # Limite de ids por consulta em lote (fica abaixo do limite de parâmetros do SQLite)
+    MAX_BATCH_IDS = 500
+
+    @staticmethod
+    def parse_fields(raw):
+        """
+        Converte 'id,titulo,preco' em tupla de campos (None = todos).
+
+        Raises:
+            ValueError: se algum campo não existir
+        """
+        if not raw:
+            return None
+        fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+        invalid = [f for f in fields if f not in CatalogHelper.FIELDS]
+        if invalid:
+            raise ValueError(f"Campos inválidos: {', '.join(invalid)}")
+        return fields or None
+
+    @staticmethod
+    def parse_ids(raw):
+        """
+        Converte '1,2,3' (ou uma lista) em lista de ids sem repetição, na ordem pedida.
+
+        Raises:
+            ValueError: id não inteiro, lista vazia ou acima de MAX_BATCH_IDS
+        """
+        if isinstance(raw, str):
+            raw = [i for i in raw.split(',') if i.strip()]
+        if not isinstance(raw, list) or not raw:
+            raise ValueError("Informe ao menos um id")
+        if any(isinstance(i, bool) for i in raw):
+            raise ValueError("ids devem ser números inteiros")
+        try:
+            ids = list(dict.fromkeys(int(i) for i in raw))
+        except (TypeError, ValueError):
+            raise ValueError("ids devem ser números inteiros")
+        if len(ids) > CatalogHelper.MAX_BATCH_IDS:
+            raise ValueError(f"Máximo de {CatalogHelper.MAX_BATCH_IDS} ids por consulta")
+        return ids
+
+    @staticmethod
+    def catalog_query(db, Product, fields=None):
+        """
+        Query única do catálogo: produtos + média/contagem de avaliações.
+
+        Média e contagem vêm dos contadores desnormalizados do produto
+        (mantidos pelo ReviewHelper), sem JOIN com review nem GROUP BY.
+        Com `fields`, seleciona só as colunas pedidas.
+        """
+        fields = fields or CatalogHelper.FIELDS
+        columns = [Product.id]
+        for f in fields:
+            if f == 'media':
+                columns.append(CatalogHelper.media_expr(db, Product).label('media'))
+            elif f != 'id':
+                columns.append(getattr(Product, f))
+
+        return db.session.query(*columns)
+
+    @staticmethod
+    def media_expr(db, Product):
+        """Média das notas a partir dos contadores do produto (0 sem avaliações)"""
+        return db.case(
+            (Product.n_reviews > 0, Product.soma_notas * 1.0 / Product.n_reviews),
+            else_=0
+        )
+
+    @staticmethod
+    def apply_filters(db, Product, query, q='', preco_min=None, preco_max=None, fuzzy=False):
+        """
+        Aplica texto e faixa de preço da busca a uma query sobre product.
+
+        Com fuzzy=True o texto casa por similaridade de trigramas (tolerante
+        a erros de digitação) em vez do índice de busca.
+
+        Returns:
+            tuple: (query, relevancia) — relevancia é a coluna de rank do
+            índice de busca ou None
+        """
+        from .search_index import SearchIndex
+
+        relevancia = None
+        if q and fuzzy:
+            aproximada = SearchIndex.fuzzy_subquery(db, Product, q)
+            if aproximada is None:
+                query = query.filter(db.false())
+            else:
+                query = query.join(aproximada, aproximada.c.product_id == Product.id)
+                relevancia = aproximada.c.rank
+        elif q:
+            busca = SearchIndex.match_subquery(db, q)
+            if busca is not None:
+                query = query.join(busca, busca.c.product_id == Product.id)
+                relevancia = busca.c.rank
+            else:
+                termo = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                query = query.filter(
+                    db.or_(
+                        Product.titulo.ilike(f'%{termo}%', escape='\\'),
+                        Product.descricao.ilike(f'%{termo}%', escape='\\')
+                    )
+                )
+
+        if preco_min is not None:
+            query = query.filter(Product.preco >= preco_min)
+        if preco_max is not None:
+            query = query.filter(Product.preco <= preco_max)
+
+        return query, relevancia
+
+    @staticmethod
+    def sort_key(Product, ordenar, relevancia=None):
+        """
+        Coluna principal de ordenação e direção para cada opção de 'ordenar'.
+
+        Returns:
+            tuple: (coluna, descendente). O id (asc) sempre desempata.
+        """
+        if ordenar == 'relevancia' and relevancia is not None:
+            return relevancia, True
+        if ordenar == 'id':
+            return Product.id, False
+        if ordenar == 'preco_asc':
+            return Product.preco, False
+        if ordenar == 'preco_desc':
+            return Product.preco, True
+        if ordenar == 'estoque':
+            return Product.estoque, True
+        return Product.titulo, False  # nome
+
+    @staticmethod
+    def search_query(db, Product, q='', preco_min=None, preco_max=None, ordenar='nome',
+                     fields=None, cursor=None, fuzzy=False):
+        """
+        Query de busca sobre a mesma consulta agregada do catálogo.
+
+        Texto, faixa de preço, ordenação e paginação (keyset) são aplicados
+        no SQL. O texto usa o índice de busca (FTS5/tsvector) quando
+        disponível, senão cai no LIKE.
+
+        Returns:
+            Query com as colunas pedidas + 'cursor_valor' (valor da ordenação)
+        """
+        query, relevancia = CatalogHelper.apply_filters(
+            db, Product, CatalogHelper.catalog_query(db, Product, fields), q, preco_min, preco_max, fuzzy
+        )
+
+        coluna, descendente = CatalogHelper.sort_key(Product, ordenar, relevancia)
+
+        if cursor is not None:
+            valor, ultimo_id = cursor
+            CatalogHelper.check_cursor_value(coluna, valor)
+            depois = coluna < valor if descendente else coluna > valor
+            query = query.filter(db.or_(depois, db.and_(coluna == valor, Product.id > ultimo_id)))
+
+        return (
+            query.add_columns(coluna.label('cursor_valor'))
+            .order_by(coluna.desc() if descendente else coluna.asc(), Product.id.asc())
+        )
+
+    @staticmethod
+    def facets(db, Product, q='', preco_min=None, preco_max=None, fuzzy=False):
+        """
+        Contagens para a barra de filtros sobre o conjunto filtrado.
+
+        Uma única consulta agregada (SUM(CASE ...) por valor de faceta),
+        com os mesmos filtros de texto e preço da busca.
+
+        Returns:
+            dict: {"total", "preco": [{"min", "max", "total"}],
+                   "disponibilidade": {"disponivel", "estoque_baixo", "esgotado"},
+                   "avaliacao": {"4": n, "3": n, ...} (média >= nota)}
+        """
+        def contar(condicao, nome):
+            return db.func.coalesce(db.func.sum(db.case((condicao, 1), else_=0)), 0).label(nome)
+
+        limites = CatalogHelper.PRICE_BUCKETS
+        faixas = list(zip(limites, limites[1:] + (None,)))
+        media = CatalogHelper.media_expr(db, Product)
+
+        colunas = [db.func.count(Product.id).label('total')]
+        for i, (minimo, maximo) in enumerate(faixas):
+            condicao = Product.preco >= minimo if maximo is None else \
+                db.and_(Product.preco >= minimo, Product.preco < maximo)
+            colunas.append(contar(condicao, f'preco_{i}'))
+        colunas += [
+            contar(Product.estoque >= CatalogHelper.LOW_STOCK, 'disponivel'),
+            contar(db.and_(Product.estoque > 0, Product.estoque < CatalogHelper.LOW_STOCK), 'estoque_baixo'),
+            contar(Product.estoque <= 0, 'esgotado'),
+        ]
+        colunas += [
+            contar(db.and_(Product.n_reviews > 0, media >= nota), f'nota_{nota}')
+            for nota in CatalogHelper.RATING_BANDS
+        ]
+
+        query, _ = CatalogHelper.apply_filters(
+            db, Product, db.session.query(*colunas).select_from(Product), q, preco_min, preco_max, fuzzy
+        )
+        row = query.one()
+
+        return {
+            "total": row.total,
+            "preco": [
+                {"min": minimo, "max": maximo, "total": int(getattr(row, f'preco_{i}'))}
+                for i, (minimo, maximo) in enumerate(faixas)
+            ],
+            "disponibilidade": {
+                "disponivel": int(row.disponivel),
+                "estoque_baixo": int(row.estoque_baixo),
+                "esgotado": int(row.esgotado)
+            },
+            "avaliacao": {str(nota): int(getattr(row, f'nota_{nota}')) for nota in CatalogHelper.RATING_BANDS}
+        }
+
+    @staticmethod
+    def encode_cursor(ordenar, valor, product_id):
+        """Cursor opaco com a posição (valor da ordenação, id) do último item"""
+        raw = json.dumps([ordenar, valor, product_id], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, ordenar):
+        """
+        Decodifica um cursor gerado por encode_cursor.
+
+        Raises:
+            ValueError: cursor inválido ou de outra ordenação
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            cursor_ordenar, valor, product_id = json.loads(raw)
+        except Exception:
+            raise ValueError("Cursor inválido")
+        if cursor_ordenar != ordenar or not isinstance(product_id, int) or isinstance(product_id, bool):
+            raise ValueError("Cursor não corresponde à ordenação atual")
+        return valor, product_id
+
+    @staticmethod
+    def check_cursor_value(coluna, valor):
+        """
+        Confere o valor do cursor com o tipo da coluna de ordenação antes de
+        ir para o SQL: texto para nome, número (não bool) para preço,
+        estoque, id e relevância.
+
+        Raises:
+            ValueError: valor de outro tipo
+        """
+        if coluna.type.python_type is str:
+            valido = isinstance(valor, str)
+        else:
+            valido = (isinstance(valor, (int, float)) and not isinstance(valor, bool)
+                      and math.isfinite(valor))
+        if not valido:
+            raise ValueError("Cursor inválido")
+
+    @staticmethod
+    def clean_image_path(imagem):
+        """Remove o prefixo 'imagens/' usado no banco"""
+        if imagem and imagem.startswith('imagens/'):
+            return imagem.replace('imagens/', '')
+        return imagem or ''
+
+    @staticmethod
+    def serialize_row(row, fields=None):
+        """Converte uma linha da query do catálogo no formato da API"""
+        fields = fields or CatalogHelper.FIELDS
+        data = {}
+        for f in fields:
+            if f == 'imagem':
+                data[f] = CatalogHelper.clean_image_path(row.imagem)
+            elif f == 'imagens':
+                data[f] = row.imagens or []
+            elif f == 'media':
+                data[f] = round(float(row.media or 0), 2)
+            elif f == 'n_reviews':
+                data[f] = int(row.n_reviews or 0)
+            else:
+                data[f] = getattr(row, f)
+        return data
+
+    @staticmethod
+    def list_products(db, Product):
+        """
+        Retorna o catálogo completo no formato da API.
+
+        Returns:
+            list: [{"id", "titulo", "descricao", "preco", "imagem", "imagens", "cor_dominante",
+                    "miniatura", "estoque", "media", "n_reviews"}]
+        """
+        itens, _ = CatalogHelper.page_products(db, Product, ordenar='id')
+        return itens
+
+    @staticmethod
+    def products_by_ids(db, Product, ids, fields=None):
+        """
+        Produtos de uma lista de ids, no formato da listagem, com um único IN.
+
+        Ids inexistentes são ignorados; a ordem segue a lista pedida.
+
+        Returns:
+            list: itens no formato de list_products (ou só os campos pedidos)
+        """
+        rows = CatalogHelper.catalog_query(db, Product, fields).filter(Product.id.in_(ids))
+        por_id = {row.id: row for row in rows}
+        return [CatalogHelper.serialize_row(por_id[i], fields) for i in ids if i in por_id]
+
+    @staticmethod
+    def page_products(db, Product, q='', preco_min=None, preco_max=None, ordenar='nome',
+                      fields=None, limit=None, cursor=None, fuzzy=False):
+        """
+        Página do catálogo/busca no formato da API.
+
+        As linhas são consumidas direto do cursor (tuplas, sem instanciar Product).
+
+        Args:
+            fields: tupla de campos (None = todos)
+            limit: tamanho da página (None = todos os resultados)
+            cursor: cursor opaco retornado pela página anterior
+            fuzzy: texto por similaridade de trigramas (ver apply_filters)
+
+        Returns:
+            tuple: (itens: list, proximo_cursor: str | None)
+
+        Raises:
+            ValueError: cursor inválido
+        """
+        posicao = CatalogHelper.decode_cursor(cursor, ordenar) if cursor else None
+        query = CatalogHelper.search_query(db, Product, q, preco_min, preco_max, ordenar,
+                                           fields=fields, cursor=posicao, fuzzy=fuzzy)
+
+        if limit is None:
+            rows = query.yield_per(500)
+        else:
+            rows = query.limit(limit + 1).all()
+
+        itens, ultimo = [], None
+        for row in rows:
+            if limit is not None and len(itens) == limit:
+                proximo = CatalogHelper.encode_cursor(ordenar, ultimo.cursor_valor, ultimo.id)
+                return itens, proximo
+            itens.append(CatalogHelper.serialize_row(row, fields))
+            ultimo = row
+
+        return itens, None
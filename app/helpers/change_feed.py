@@ -0,0 +1,122 @@
+# ============================================
+# helpers/change_feed.py — Feed de Alterações do Catálogo
+# ============================================
+
+
+class ChangeFeed:
+    """
+    Sequência crescente de alterações de produtos (tabela catalog_change).
+
+    Cada mutação de produto (admin, baixa de estoque, avaliação, imagem
+    processada) grava uma linha na MESMA transação da alteração. Clientes
+    guardam o último seq recebido e perguntam só o que mudou depois dele:
+
+        1. GET /api/products/changes          -> {"seq": S, ...} (seq atual)
+        2. GET /api/products                   -> catálogo completo
+        3. GET /api/products/changes?since=S   -> alterados + removidos desde S
+
+    Alterações entre 1 e 2 voltam no passo 3 (aplicar é idempotente).
+    """
+
+    MAX_CHANGES = 500  # Mesmo limite do IN de CatalogHelper.products_by_ids
+
+    @staticmethod
+    def record(db, product_ids, deleted=False):
+        """
+        Registra a alteração dos produtos na transação atual (sem commit).
+
+        No PostgreSQL a tabela é travada para escrita até o commit: assim os
+        seq ficam visíveis na ordem em que foram gerados e um cliente nunca
+        pula um seq menor que ainda não tinha sido commitado.
+        """
+        from app.models import CatalogChange
+
+        ids = list(dict.fromkeys(product_ids))
+        if not ids:
+            return
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text("LOCK TABLE catalog_change IN EXCLUSIVE MODE"))
+        db.session.execute(db.insert(CatalogChange), [
+            {"product_id": pid, "deleted": deleted} for pid in ids
+        ])
+
+    @staticmethod
+    def current_seq(db, CatalogChange):
+        """Último seq gravado (0 se ainda não houve alterações)"""
+        return db.session.query(db.func.max(CatalogChange.seq)).scalar() or 0
+
+    @staticmethod
+    def changes_since(db, Product, CatalogChange, since, fields=None, limit=None):
+        """
+        Produtos alterados e removidos depois de `since`.
+
+        Uma consulta no feed + um IN nos produtos (formato da listagem);
+        produtos que não existem mais viram tombstones em 'removidos'.
+
+        Returns:
+            dict: {"seq", "itens", "removidos", "mais"} — "seq" é o valor a
+            usar como since na próxima chamada
+
+        Raises:
+            LookupError: alterações depois de `since` já foram limpas
+            (o cliente deve recarregar o catálogo completo)
+        """
+        from .catalog_helper import CatalogHelper
+
+        limit = min(limit or ChangeFeed.MAX_CHANGES, ChangeFeed.MAX_CHANGES)
+        rows = (
+            db.session.query(CatalogChange.seq, CatalogChange.product_id)
+            .filter(CatalogChange.seq > since)
+            .order_by(CatalogChange.seq)
+            .limit(limit + 1)
+            .all()
+        )
+        if not rows:
+            return {"seq": since, "itens": [], "removidos": [], "mais": False}
+
+        # Buraco logo após since: pode ser limpeza (prune) — só então consulta de novo
+        if rows[0].seq > since + 1 and not db.session.query(
+            db.exists().where(CatalogChange.seq <= since)
+        ).scalar():
+            raise LookupError("Alterações expiradas; recarregue o catálogo completo")
+
+        mais = len(rows) > limit
+        rows = rows[:limit]
+        ids = list(dict.fromkeys(r.product_id for r in rows))
+
+        # O id sempre vai junto: é ele que o cliente usa para aplicar a alteração
+        if fields and 'id' not in fields:
+            fields = ('id',) + tuple(fields)
+        itens = CatalogHelper.products_by_ids(db, Product, ids, fields)
+        existentes = {i['id'] for i in itens}
+
+        return {
+            "seq": rows[-1].seq,
+            "itens": itens,
+            "removidos": [pid for pid in ids if pid not in existentes],
+            "mais": mais
+        }
+
+    @staticmethod
+    def prune(db, CatalogChange, antes_de):
+        """
+        Remove alterações anteriores a `antes_de` (datetime), mantendo a última.
+
+        Clientes com since anterior ao que foi removido recebem 410 e
+        recarregam o catálogo.
+
+        Returns:
+            int: linhas removidas
+        """
+        ultimo = ChangeFeed.current_seq(db, CatalogChange)
+        try:
+            removidas = (
+                db.session.query(CatalogChange)
+                .filter(CatalogChange.created_at < antes_de, CatalogChange.seq < ultimo)
+                .delete(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return removidas
@@ -0,0 +1,262 @@
+# ============================================
+# helpers/image_helper.py — Helper de Imagens de Produtos
+# ============================================
+
+import base64
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+from werkzeug.utils import secure_filename
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele só a imagem original é servida
+    Image = None
+
+
+class ImageHelper:
+    """
+    Derivados redimensionados das imagens de produtos.
+
+    Cada upload vira versões WebP + JPEG com largura limitada (sem
+    ampliar), salvas em static/imagens/derivados/. A lista de derivados,
+    com dimensões, fica em Product.imagens e vai para as APIs no formato
+    usado para montar o srcset:
+        [{"src": "derivados/mel-320.webp", "largura": 320, "altura": 240, "tipo": "image/webp"}]
+    """
+
+    WIDTHS = (320, 640, 1280)
+    FORMATS = (
+        ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+        ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    )
+    DERIVATIVES_DIR = 'derivados'
+
+    # Uploads são salvos com o nome = sha256 do conteúdo (32 primeiros hex)
+    HASH_LENGTH = 32
+    CHUNK_SIZE = 64 * 1024
+    # O conteúdo de um nome com hash nunca muda: o navegador pode guardar por 1 ano
+    IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+    _CONTENT_ADDRESSED = re.compile(r'^/static/imagens/(derivados/)?[0-9a-f]{32}(-\d+)?\.[a-z0-9]+$')
+    # Colunas de product com derivados e placeholder (podem faltar em bancos antigos)
+    COLUMNS = {'imagens': 'JSON', 'cor_dominante': 'VARCHAR(7)', 'miniatura': 'TEXT'}
+
+    @staticmethod
+    def ensure_columns(db):
+        """
+        Cria em product as colunas de derivados/placeholder que faltarem (idempotente).
+
+        Produtos existentes ficam sem derivados (NULL) e usam a imagem
+        original até rodar scripts/database/gerar_derivados_imagens.py.
+
+        Returns:
+            bool: True se alguma coluna foi criada
+        """
+        existentes = {c['name'] for c in db.inspect(db.engine).get_columns('product')}
+        faltando = [c for c in ImageHelper.COLUMNS if c not in existentes]
+        if not faltando:
+            return False
+        try:
+            for coluna in faltando:
+                db.session.execute(db.text(
+                    f"ALTER TABLE product ADD COLUMN {coluna} {ImageHelper.COLUMNS[coluna]}"
+                ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return True
+
+    @staticmethod
+    def is_available():
+        """Indica se o Pillow está instalado"""
+        return Image is not None
+
+    # ----------------------------------------
+    # Armazenamento por hash do conteúdo
+    # ----------------------------------------
+
+    @staticmethod
+    def content_name(digest, nome_original):
+        """Nome de arquivo a partir do hash e da extensão do nome original"""
+        extensao = os.path.splitext(secure_filename(nome_original or ''))[1].lower()
+        return f"{digest[:ImageHelper.HASH_LENGTH]}{extensao}"
+
+    @staticmethod
+    def save_upload(arquivo, upload_folder):
+        """
+        Grava um upload (FileStorage) com nome = hash do conteúdo.
+
+        O hash é calculado enquanto o arquivo é gravado em um temporário
+        na mesma pasta, que depois é renomeado (atômico). Se já existir um
+        arquivo com o mesmo conteúdo, ele é reaproveitado.
+
+        Returns:
+            str: nome do arquivo salvo (ex: '9f86d081884c7d659a2feaa0c55ad015.jpg')
+        """
+        os.makedirs(upload_folder, exist_ok=True)
+        digest = hashlib.sha256()
+
+        fd, temporario = tempfile.mkstemp(dir=upload_folder, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                while True:
+                    bloco = arquivo.stream.read(ImageHelper.CHUNK_SIZE)
+                    if not bloco:
+                        break
+                    digest.update(bloco)
+                    destino.write(bloco)
+
+            nome = ImageHelper.content_name(digest.hexdigest(), arquivo.filename)
+            caminho = os.path.join(upload_folder, nome)
+            if os.path.exists(caminho):
+                os.remove(temporario)  # mesmo conteúdo já armazenado
+            else:
+                os.chmod(temporario, 0o644)
+                os.replace(temporario, caminho)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+        return nome
+
+    @staticmethod
+    def file_digest(caminho):
+        """sha256 de um arquivo já gravado (lido em blocos)"""
+        digest = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(ImageHelper.CHUNK_SIZE), b''):
+                digest.update(bloco)
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_content_addressed(path):
+        """Indica se a URL é de uma imagem com hash no nome (original ou derivado)"""
+        return bool(ImageHelper._CONTENT_ADDRESSED.match(path))
+
+    # ----------------------------------------
+    # Derivados
+    # ----------------------------------------
+
+    @staticmethod
+    def target_widths(largura_original):
+        """Larguras a gerar: as de WIDTHS menores que a original, mais a original se couber"""
+        larguras = [w for w in ImageHelper.WIDTHS if w < largura_original]
+        if len(larguras) < len(ImageHelper.WIDTHS):
+            larguras.append(largura_original)
+        return larguras
+
+    @staticmethod
+    def generate_derivatives(upload_folder, nome_arquivo):
+        """
+        Gera os derivados de uma imagem já salva em upload_folder.
+
+        Returns:
+            list | None: derivados (maior primeiro em cada formato) ou None
+            se o Pillow não estiver disponível
+        """
+        resultado = ImageHelper.process_image(upload_folder, nome_arquivo)
+        return resultado['imagens'] if resultado else None
+
+    @staticmethod
+    def process_image(upload_folder, nome_arquivo):
+        """
+        Derivados + placeholder de uma imagem, decodificando o original uma vez só.
+
+        Returns:
+            dict | None: {"imagens", "cor_dominante", "miniatura"} (mesmos nomes
+            das colunas de Product) ou None se o Pillow não estiver disponível
+        """
+        if not ImageHelper.is_available():
+            return None
+
+        origem = os.path.join(upload_folder, nome_arquivo)
+        destino = os.path.join(upload_folder, ImageHelper.DERIVATIVES_DIR)
+        os.makedirs(destino, exist_ok=True)
+        base = os.path.splitext(os.path.basename(nome_arquivo))[0]
+
+        with Image.open(origem) as img:
+            # JPEG grande: decodifica já reduzido (muito mais rápido que abrir inteiro)
+            img.draft('RGB', (ImageHelper.WIDTHS[-1], ImageHelper.WIDTHS[-1]))
+            img = ImageOps.exif_transpose(img)
+            tem_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            img = img.convert('RGBA' if tem_alpha else 'RGB')
+
+            derivados = []
+            for largura in sorted(ImageHelper.target_widths(img.width), reverse=True):
+                altura = max(1, round(img.height * largura / img.width))
+                redimensionada = img if largura == img.width else img.resize((largura, altura), Image.LANCZOS)
+
+                for extensao, tipo, opcoes in ImageHelper.FORMATS:
+                    saida = redimensionada
+                    if extensao == 'jpg' and tem_alpha:
+                        saida = ImageHelper._flatten(redimensionada)
+
+                    nome = f"{base}-{largura}.{extensao}"
+                    saida.save(os.path.join(destino, nome), **opcoes)
+                    derivados.append({
+                        "src": f"{ImageHelper.DERIVATIVES_DIR}/{nome}",
+                        "largura": largura,
+                        "altura": altura,
+                        "tipo": tipo
+                    })
+
+            # Placeholder a partir do menor derivado (já está em memória)
+            menor = ImageHelper._flatten(redimensionada) if tem_alpha else redimensionada
+            cor_dominante, miniatura = ImageHelper.placeholder(menor)
+
+        return {"imagens": derivados, "cor_dominante": cor_dominante, "miniatura": miniatura}
+
+    @staticmethod
+    def _flatten(img):
+        """RGBA -> RGB sobre fundo branco (JPEG não tem transparência)"""
+        fundo = Image.new('RGB', img.size, (255, 255, 255))
+        fundo.paste(img, mask=img.getchannel('A'))
+        return fundo
+
+    # ----------------------------------------
+    # Placeholder (LQIP)
+    # ----------------------------------------
+
+    # Miniatura embutida no JSON: ~16px de largura, algumas centenas de bytes
+    PLACEHOLDER_WIDTH = 16
+    PLACEHOLDER_QUALITY = 40
+
+    @staticmethod
+    def placeholder(img):
+        """
+        Cor dominante + miniatura em data URI de uma imagem RGB já aberta.
+
+        A cor preenche o espaço da imagem na hora; a miniatura, ampliada
+        pelo navegador, dá uma prévia borrada até o derivado carregar.
+
+        Returns:
+            tuple: ('#rrggbb', 'data:image/webp;base64,...')
+        """
+        # Cor mais frequente após reduzir a paleta (média daria um marrom "sujo")
+        amostra = img.resize((64, 64), Image.BILINEAR).quantize(colors=5)
+        _, indice = max(amostra.getcolors())
+        r, g, b = amostra.getpalette()[indice * 3:indice * 3 + 3]
+        cor_dominante = f"#{r:02x}{g:02x}{b:02x}"
+
+        largura = ImageHelper.PLACEHOLDER_WIDTH
+        altura = max(1, round(img.height * largura / img.width))
+        buffer = io.BytesIO()
+        img.resize((largura, altura), Image.BILINEAR).save(
+            buffer, 'WEBP', quality=ImageHelper.PLACEHOLDER_QUALITY
+        )
+        miniatura = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+        return cor_dominante, miniatura
+
+    @staticmethod
+    def srcset(imagens, tipo='image/webp'):
+        """Valor do atributo srcset para um formato (filtro de template)"""
+        return ', '.join(
+            f"/static/imagens/{i['src']} {i['largura']}w"
+            for i in (imagens or []) if i.get('tipo') == tipo
+        )
@@ -0,0 +1,358 @@
+# ============================================
+# helpers/review_helper.py — Helper de Avaliações
+# ============================================
+
+from collections import namedtuple
+from datetime import datetime
+
+from .catalog_helper import CatalogHelper
+from .change_feed import ChangeFeed
+
+# Linha de avaliação extraída do resultado combinado de product_detail
+ReviewRow = namedtuple('ReviewRow', ['id', 'nome', 'nota', 'comentario', 'created_at'])
+
+
+class ReviewHelper:
+    """Helper para consultas de avaliações de produtos"""
+
+    PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 50
+    COUNTER_COLUMNS = ('n_reviews', 'soma_notas', 'notas_1', 'notas_2', 'notas_3', 'notas_4', 'notas_5')
+    UNIQUE_INDEX = 'uq_review_user_product'
+
+    @staticmethod
+    def ensure_columns(db, Product, Review):
+        """
+        Cria em product as colunas de contadores que faltarem (idempotente).
+
+        create_all() não altera tabelas existentes: bancos anteriores aos
+        contadores ganham as colunas aqui, e os contadores são recalculados
+        a partir de review logo em seguida.
+
+        Returns:
+            bool: True se alguma coluna foi criada
+        """
+        existentes = {c['name'] for c in db.inspect(db.engine).get_columns('product')}
+        faltando = [c for c in ReviewHelper.COUNTER_COLUMNS if c not in existentes]
+        if not faltando:
+            return False
+        try:
+            for coluna in faltando:
+                db.session.execute(db.text(
+                    f"ALTER TABLE product ADD COLUMN {coluna} INTEGER NOT NULL DEFAULT 0"
+                ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        ReviewHelper.rebuild_counters(db, Product, Review, record_changes=True)
+        return True
+
+    @staticmethod
+    def ensure_unique_reviews(db, Product, Review):
+        """
+        Garante uma avaliação por (user_id, product_id) em review (idempotente).
+
+        Bancos criados antes do índice único podem ter avaliações repetidas
+        (duplo envio): fica a mais recente de cada usuário/produto, as demais
+        são removidas, o índice é criado e os contadores recalculados (os
+        produtos alterados vão para o feed de alterações).
+
+        Returns:
+            int: avaliações repetidas removidas (0 se o índice já existia)
+        """
+        indices = db.inspect(db.engine).get_indexes(Review.__tablename__)
+        if any(i['name'] == ReviewHelper.UNIQUE_INDEX for i in indices):
+            return 0
+
+        try:
+            repetidas = db.session.execute(db.text(
+                "SELECT 1 FROM review GROUP BY user_id, product_id HAVING COUNT(*) > 1"
+            )).first()
+            removidas = db.session.execute(db.text("""
+                DELETE FROM review WHERE id NOT IN (
+                    SELECT MAX(id) FROM review GROUP BY user_id, product_id
+                )
+            """)).rowcount
+            db.session.execute(db.text(
+                f"CREATE UNIQUE INDEX {ReviewHelper.UNIQUE_INDEX} ON review (user_id, product_id)"
+            ))
+            if repetidas:
+                # Mesma transação: o recálculo registra os produtos alterados e faz o commit
+                ReviewHelper.rebuild_counters(db, Product, Review, record_changes=True)
+            else:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return removidas
+
+    @staticmethod
+    def page_query(db, Review, User, product_id, cursor=None):
+        """
+        Avaliações de um produto, mais recentes primeiro (keyset por created_at, id).
+
+        Args:
+            cursor: (created_at, id) da última avaliação da página anterior
+        """
+        query = (
+            db.session.query(
+                Review.id, Review.nota, Review.comentario, Review.created_at,
+                User.nome.label('nome')
+            )
+            .join(User, Review.user_id == User.id)
+            .filter(Review.product_id == product_id)
+        )
+
+        if cursor is not None:
+            created_at, ultimo_id = cursor
+            query = query.filter(db.or_(
+                Review.created_at < created_at,
+                db.and_(Review.created_at == created_at, Review.id < ultimo_id)
+            ))
+
+        return query.order_by(Review.created_at.desc(), Review.id.desc())
+
+    @staticmethod
+    def encode_cursor(created_at, review_id):
+        """Cursor opaco da posição de uma avaliação"""
+        return CatalogHelper.encode_cursor('reviews', created_at.isoformat(), review_id)
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Raises:
+            ValueError: cursor inválido
+        """
+        valor, review_id = CatalogHelper.decode_cursor(cursor, 'reviews')
+        try:
+            return datetime.fromisoformat(valor), review_id
+        except (TypeError, ValueError):
+            raise ValueError("Cursor inválido")
+
+    @staticmethod
+    def serialize_row(row):
+        """Converte uma linha de avaliação no formato da API"""
+        return {
+            "id": row.id,
+            "nome": row.nome,
+            "nota": row.nota,
+            "comentario": row.comentario,
+            "created_at": row.created_at
+        }
+
+    @staticmethod
+    def paginate(rows, limit):
+        """
+        Monta uma página a partir de até limit+1 linhas.
+
+        Returns:
+            tuple: (reviews: list, proximo_cursor: str | None)
+        """
+        reviews = [ReviewHelper.serialize_row(r) for r in rows[:limit]]
+        proximo = None
+        if len(rows) > limit:
+            ultimo = rows[limit - 1]
+            proximo = ReviewHelper.encode_cursor(ultimo.created_at, ultimo.id)
+        return reviews, proximo
+
+    @staticmethod
+    def page_reviews(db, Review, User, product_id, limit=PAGE_SIZE, cursor=None):
+        """
+        Página de avaliações no formato da API.
+
+        Returns:
+            tuple: (reviews: list, proximo_cursor: str | None)
+
+        Raises:
+            ValueError: cursor inválido
+        """
+        posicao = ReviewHelper.decode_cursor(cursor) if cursor else None
+        rows = ReviewHelper.page_query(db, Review, User, product_id, posicao).limit(limit + 1).all()
+        return ReviewHelper.paginate(rows, limit)
+
+    @staticmethod
+    def product_detail(db, Product, Review, User, product_id, limit=PAGE_SIZE):
+        """
+        Detalhe do produto + histograma de notas + 1ª página de avaliações
+        em um único statement.
+
+        Média e histograma vêm dos contadores do produto; o produto é
+        combinado (LEFT JOIN) com a subquery da 1ª página de avaliações,
+        então cada linha do resultado é uma avaliação, com os dados do
+        produto repetidos.
+
+        Returns:
+            dict | None: None se o produto não existir
+        """
+        pagina = ReviewHelper.page_query(db, Review, User, product_id).limit(limit + 1).subquery('pagina')
+
+        rows = (
+            db.session.query(
+                Product.id, Product.titulo, Product.descricao, Product.preco,
+                Product.imagem, Product.imagens, Product.cor_dominante, Product.miniatura,
+                Product.estoque, Product.n_reviews, Product.soma_notas,
+                *[getattr(Product, f'notas_{nota}') for nota in range(1, 6)],
+                pagina.c.id.label('review_id'), pagina.c.nome, pagina.c.nota,
+                pagina.c.comentario, pagina.c.created_at
+            )
+            .outerjoin(pagina, db.true())
+            .filter(Product.id == product_id)
+            .order_by(pagina.c.created_at.desc(), pagina.c.id.desc())
+            .all()
+        )
+
+        if not rows:
+            return None
+
+        p = rows[0]
+        review_rows = [
+            ReviewRow(r.review_id, r.nome, r.nota, r.comentario, r.created_at)
+            for r in rows if r.review_id is not None
+        ]
+        reviews, proximo = ReviewHelper.paginate(review_rows, limit)
+
+        return {
+            "id": p.id,
+            "titulo": p.titulo,
+            "descricao": p.descricao,
+            "preco": p.preco,
+            "imagem": p.imagem,
+            "imagens": p.imagens or [],
+            "cor_dominante": p.cor_dominante,
+            "miniatura": p.miniatura,
+            "estoque": p.estoque,
+            "media": round(p.soma_notas / p.n_reviews, 2) if p.n_reviews else 0,
+            "n_reviews": p.n_reviews,
+            "histograma": {str(nota): getattr(p, f'notas_{nota}') for nota in range(1, 6)},
+            "reviews": reviews,
+            "reviews_proximo_cursor": proximo
+        }
+
+    # ----------------------------------------
+    # Escrita (mantém os contadores do produto)
+    # ----------------------------------------
+
+    @staticmethod
+    def _counter_delta(Product, nota, sinal):
+        """Incremento (sinal=1) ou decremento (sinal=-1) dos contadores para uma nota"""
+        estrela = getattr(Product, f'notas_{nota}')
+        return {
+            Product.n_reviews: Product.n_reviews + sinal,
+            Product.soma_notas: Product.soma_notas + sinal * nota,
+            estrela: estrela + sinal
+        }
+
+    @staticmethod
+    def _update_counters(db, Product, product_id, valores):
+        # UPDATE relativo (col = col + n): seguro com vários workers gravando ao mesmo tempo
+        db.session.execute(
+            db.update(Product).where(Product.id == product_id).values(valores),
+            execution_options={"synchronize_session": False}
+        )
+
+    @staticmethod
+    def create_review(db, Product, Review, user_id, product_id, nota, comentario=None):
+        """
+        Cria uma avaliação e atualiza os contadores do produto na mesma transação.
+
+        Returns:
+            Review criada
+        """
+        review = Review(user_id=user_id, product_id=product_id, nota=nota, comentario=comentario)
+        try:
+            db.session.add(review)
+            db.session.flush()
+            ReviewHelper._update_counters(db, Product, product_id,
+                                          ReviewHelper._counter_delta(Product, nota, 1))
+            ChangeFeed.record(db, [product_id])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return review
+
+    @staticmethod
+    def update_review(db, Product, review, nota, comentario=None):
+        """Altera nota/comentário; se a nota mudou, move a contagem entre as estrelas"""
+        nota_anterior = review.nota
+        try:
+            review.nota = nota
+            review.comentario = comentario
+            if nota != nota_anterior:
+                antes = getattr(Product, f'notas_{nota_anterior}')
+                depois = getattr(Product, f'notas_{nota}')
+                ReviewHelper._update_counters(db, Product, review.product_id, {
+                    Product.soma_notas: Product.soma_notas + (nota - nota_anterior),
+                    antes: antes - 1,
+                    depois: depois + 1
+                })
+                ChangeFeed.record(db, [review.product_id])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return review
+
+    @staticmethod
+    def delete_review(db, Product, review):
+        """Remove a avaliação e desconta dos contadores do produto"""
+        try:
+            ReviewHelper._update_counters(db, Product, review.product_id,
+                                          ReviewHelper._counter_delta(Product, review.nota, -1))
+            db.session.delete(review)
+            ChangeFeed.record(db, [review.product_id])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def rebuild_counters(db, Product, Review, record_changes=False):
+        """
+        Recalcula os contadores de todos os produtos a partir da tabela review.
+
+        Uma consulta agrupada + um UPDATE em lote; produtos sem avaliação
+        voltam a zero. Com record_changes, os produtos cujos contadores
+        mudaram vão para o feed de alterações na mesma transação.
+
+        Returns:
+            int: número de produtos com avaliações
+        """
+        estatisticas = (
+            db.session.query(
+                Review.product_id.label('pid'),
+                db.func.count(Review.id).label('n_reviews'),
+                db.func.sum(Review.nota).label('soma_notas'),
+                *[
+                    db.func.sum(db.case((Review.nota == nota, 1), else_=0)).label(f'notas_{nota}')
+                    for nota in range(1, 6)
+                ]
+            )
+            .group_by(Review.product_id)
+            .all()
+        )
+
+        zeros = {'n_reviews': 0, 'soma_notas': 0, **{f'notas_{nota}': 0 for nota in range(1, 6)}}
+        try:
+            if record_changes:
+                colunas = [getattr(Product, k) for k in zeros]
+                antes = {r[0]: tuple(r[1:]) for r in
+                         db.session.query(Product.id, *colunas).filter(Product.n_reviews != 0)}
+                depois = {r.pid: tuple(int(getattr(r, k) or 0) for k in zeros) for r in estatisticas}
+                ChangeFeed.record(db, sorted(
+                    pid for pid in antes.keys() | depois.keys() if antes.get(pid) != depois.get(pid)
+                ))
+            db.session.execute(db.update(Product).values(**zeros),
+                               execution_options={"synchronize_session": False})
+            if estatisticas:
+                # UPDATE em lote (executemany) pela chave primária
+                db.session.execute(db.update(Product), [
+                    {"id": r.pid, **{k: int(getattr(r, k) or 0) for k in zeros}}
+                    for r in estatisticas
+                ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(estatisticas)
@@ -0,0 +1,334 @@
+# ============================================
+# helpers/search_index.py — Índice de Busca Textual
+# ============================================
+
+import re
+import time
+import unicodedata
+
+from sqlalchemy import event, inspect as sa_inspect, text
+
+
+class SearchIndex:
+    """
+    Índice de busca textual de produtos.
+
+    - SQLite: tabela virtual FTS5 `product_fts` (rowid = product.id), ranking bm25
+    - PostgreSQL: tabela `product_search` com tsvector + índice GIN, ranking ts_rank
+
+    O texto é normalizado em Python (minúsculas, sem acentos) antes de ir
+    para o índice e para a consulta, então "laranjeira" encontra "laranjéira".
+    O título tem peso maior que a descrição no ranking.
+
+    Busca aproximada (erros de digitação) por similaridade de trigramas no
+    título: pg_trgm (índice GIN em product_search.titulo) no PostgreSQL,
+    índice invertido em memória (app.utils.trigram_index) nos demais.
+    """
+
+    # Bancos (URL do engine) em que o índice existe (criado por este ou outro processo)
+    _available = set()
+    # Última verificação (time.monotonic) dos bancos ainda sem índice
+    _last_check = {}
+    # Intervalo (s) entre novas verificações nas buscas enquanto não há índice
+    RECHECK_INTERVAL = 60
+    # Bancos PostgreSQL com pg_trgm + índice de trigramas
+    _trigram_available = set()
+
+    # Similaridade mínima (0-1) e máximo de resultados da busca aproximada
+    FUZZY_THRESHOLD = 0.4
+    FUZZY_LIMIT = 100
+
+    # Pesos do ranking: título vale 10x a descrição no SQLite (bm25);
+    # no PostgreSQL o título é peso 'A' (1.0) e a descrição peso 'B' (0.4)
+    FTS_WEIGHTS = (10.0, 1.0)
+    TS_CONFIG = 'portuguese'
+
+    @staticmethod
+    def normalize(text):
+        """Minúsculas e sem acentos ("Laranjéira" -> "laranjeira")"""
+        if not text:
+            return ''
+        decomposed = unicodedata.normalize('NFKD', text.lower())
+        return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+    @staticmethod
+    def tokens(text):
+        """Palavras normalizadas de um texto"""
+        return re.findall(r'\w+', SearchIndex.normalize(text))
+
+    @staticmethod
+    def is_available(db):
+        """
+        Indica se o índice existe no banco atual.
+
+        Se não existia, verifica de novo a cada RECHECK_INTERVAL: o índice
+        pode ter sido criado por outro worker ou pelo script de reconstrução.
+        """
+        url = str(db.engine.url)
+        if url in SearchIndex._available:
+            return True
+        agora = time.monotonic()
+        if agora - SearchIndex._last_check.get(url, float('-inf')) < SearchIndex.RECHECK_INTERVAL:
+            return False
+        SearchIndex._last_check[url] = agora
+        return SearchIndex._detect(db.engine)
+
+    @staticmethod
+    def _detect(bind):
+        """Marca o índice como disponível se a tabela já existe no banco de `bind`"""
+        tabela = 'product_fts' if bind.dialect.name == 'sqlite' else 'product_search'
+        if not sa_inspect(bind).has_table(tabela):
+            return False
+        SearchIndex._available.add(str(bind.engine.url))
+        return True
+
+    # ----------------------------------------
+    # Criação / manutenção
+    # ----------------------------------------
+
+    @staticmethod
+    def init_app(db, Product, logger=None):
+        """
+        Cria o índice se necessário e registra os eventos que o mantêm
+        sincronizado com create/edit/delete de produtos.
+
+        Os eventos são registrados mesmo se a criação falhar (ex.: outro
+        worker criando ao mesmo tempo): só escrevem quando a tabela do
+        índice existe, então as edições deste processo não ficam de fora.
+        """
+        if not event.contains(Product, 'after_insert', SearchIndex._after_insert):
+            event.listen(Product, 'after_insert', SearchIndex._after_insert)
+            event.listen(Product, 'after_update', SearchIndex._after_update)
+            event.listen(Product, 'after_delete', SearchIndex._after_delete)
+
+        try:
+            SearchIndex.ensure(db, Product)
+        except Exception as e:
+            db.session.rollback()
+            if SearchIndex._detect(db.engine):
+                if logger:
+                    logger.info(f"✅ Índice de busca criado por outro processo ({db.engine.dialect.name})")
+                return True
+            if logger:
+                logger.error(f"❌ Índice de busca indisponível, usando LIKE: {e}")
+            return False
+
+        if logger:
+            logger.info(f"✅ Índice de busca pronto ({db.engine.dialect.name})")
+        return True
+
+    @staticmethod
+    def ensure(db, Product):
+        """Cria as estruturas do índice (idempotente) e popula se acabou de criar"""
+        dialect = db.engine.dialect.name
+        existing = sa_inspect(db.engine).get_table_names()
+
+        if dialect == 'sqlite':
+            created = 'product_fts' not in existing
+            if created:
+                db.session.execute(db.text(
+                    "CREATE VIRTUAL TABLE product_fts USING fts5("
+                    "titulo, descricao, tokenize = 'unicode61 remove_diacritics 2')"
+                ))
+        elif dialect == 'postgresql':
+            created = 'product_search' not in existing
+            if created:
+                db.session.execute(db.text(
+                    "CREATE TABLE product_search ("
+                    "product_id INTEGER PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE, "
+                    "documento TSVECTOR NOT NULL, "
+                    "titulo TEXT NOT NULL DEFAULT '')"
+                ))
+                db.session.execute(db.text(
+                    "CREATE INDEX ix_product_search_documento ON product_search USING GIN (documento)"
+                ))
+            elif 'titulo' not in {c['name'] for c in sa_inspect(db.engine).get_columns('product_search')}:
+                # Índice criado antes da busca aproximada: ganha a coluna e é repopulado
+                db.session.execute(db.text(
+                    "ALTER TABLE product_search ADD COLUMN titulo TEXT NOT NULL DEFAULT ''"
+                ))
+                created = True
+        else:
+            raise RuntimeError(f"Banco '{dialect}' sem suporte a índice de busca")
+
+        db.session.commit()
+        SearchIndex._available.add(str(db.engine.url))
+
+        if dialect == 'postgresql':
+            SearchIndex._ensure_trigram(db)
+
+        if created:
+            SearchIndex.rebuild(db, Product)
+
+    @staticmethod
+    def _ensure_trigram(db):
+        """pg_trgm + índice GIN de trigramas; sem permissão para a extensão usa o índice em memória"""
+        try:
+            db.session.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            db.session.execute(db.text(
+                "CREATE INDEX IF NOT EXISTS ix_product_search_titulo_trgm "
+                "ON product_search USING GIN (titulo gin_trgm_ops)"
+            ))
+            db.session.commit()
+            SearchIndex._trigram_available.add(str(db.engine.url))
+        except Exception:
+            db.session.rollback()
+
+    @staticmethod
+    def rebuild(db, Product):
+        """Reconstrói o índice inteiro a partir da tabela product"""
+        rows = db.session.query(Product.id, Product.titulo, Product.descricao).all()
+        conn = db.session.connection()
+
+        if db.engine.dialect.name == 'sqlite':
+            conn.execute(db.text("DELETE FROM product_fts"))
+        else:
+            conn.execute(db.text("DELETE FROM product_search"))
+
+        if rows:
+            sql, _ = SearchIndex._upsert_sql(conn)
+            conn.execute(sql, [SearchIndex._params(r.id, r.titulo, r.descricao) for r in rows])
+
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def _params(product_id, titulo, descricao):
+        return {
+            "id": product_id,
+            "titulo": SearchIndex.normalize(titulo),
+            "descricao": SearchIndex.normalize(descricao)
+        }
+
+    @staticmethod
+    def _upsert_sql(conn):
+        """SQL de inserção/atualização de um produto no índice"""
+        if conn.dialect.name == 'sqlite':
+            return text(
+                "INSERT INTO product_fts (rowid, titulo, descricao) VALUES (:id, :titulo, :descricao)"
+            ), text("DELETE FROM product_fts WHERE rowid = :id")
+
+        return text(
+            f"INSERT INTO product_search (product_id, documento, titulo) VALUES (:id, "
+            f"setweight(to_tsvector('{SearchIndex.TS_CONFIG}', :titulo), 'A') || "
+            f"setweight(to_tsvector('{SearchIndex.TS_CONFIG}', :descricao), 'B'), :titulo) "
+            f"ON CONFLICT (product_id) DO UPDATE SET documento = EXCLUDED.documento, titulo = EXCLUDED.titulo"
+        ), text("DELETE FROM product_search WHERE product_id = :id")
+
+    @staticmethod
+    def _write(conn, target):
+        insert_sql, delete_sql = SearchIndex._upsert_sql(conn)
+        if conn.dialect.name == 'sqlite':
+            conn.execute(delete_sql, {"id": target.id})
+        conn.execute(insert_sql, SearchIndex._params(target.id, target.titulo, target.descricao))
+
+    # Eventos do ORM: rodam na mesma transação do flush do produto.
+    # Sem índice no banco não fazem nada (a tabela pode surgir depois,
+    # criada por outro processo: a verificação é refeita a cada escrita)
+
+    @staticmethod
+    def _indexed(conn):
+        return str(conn.engine.url) in SearchIndex._available or SearchIndex._detect(conn)
+
+    @staticmethod
+    def _after_insert(mapper, conn, target):
+        if SearchIndex._indexed(conn):
+            SearchIndex._write(conn, target)
+
+    @staticmethod
+    def _after_update(mapper, conn, target):
+        state = sa_inspect(target)
+        if state.attrs.titulo.history.has_changes() or state.attrs.descricao.history.has_changes():
+            if SearchIndex._indexed(conn):
+                SearchIndex._write(conn, target)
+
+    @staticmethod
+    def _after_delete(mapper, conn, target):
+        if not SearchIndex._indexed(conn):
+            return
+        _, delete_sql = SearchIndex._upsert_sql(conn)
+        conn.execute(delete_sql, {"id": target.id})
+
+    # ----------------------------------------
+    # Consulta
+    # ----------------------------------------
+
+    @staticmethod
+    def match_subquery(db, q):
+        """
+        CTE (product_id, rank) com os produtos que casam com `q`.
+
+        Cada palavra é tratada como prefixo e todas precisam aparecer.
+        Retorna None se o índice não estiver disponível ou não houver palavras.
+        """
+        palavras = SearchIndex.tokens(q)
+        if not palavras or not SearchIndex.is_available(db):
+            return None
+
+        if db.engine.dialect.name == 'sqlite':
+            peso_titulo, peso_descricao = SearchIndex.FTS_WEIGHTS
+            sql = db.text(
+                f"SELECT rowid AS product_id, -bm25(product_fts, {peso_titulo}, {peso_descricao}) AS rank "
+                f"FROM product_fts WHERE product_fts MATCH :termo"
+            ).bindparams(termo=' AND '.join(f'"{p}"*' for p in palavras))
+        else:
+            sql = db.text(
+                f"SELECT product_id, "
+                f"ts_rank(documento, to_tsquery('{SearchIndex.TS_CONFIG}', :termo))::double precision AS rank "
+                f"FROM product_search WHERE documento @@ to_tsquery('{SearchIndex.TS_CONFIG}', :termo)"
+            ).bindparams(termo=' & '.join(f'{p}:*' for p in palavras))
+
+        # CTE materializada: o SQLite não pode "achatar" a subquery no JOIN
+        # (bm25 só funciona dentro da consulta FTS). No PostgreSQL o rank vira
+        # double precision: ts_rank devolve real, e o valor do cursor (float
+        # do Python) não seria igual ao da coluna na página seguinte
+        return sql.columns(
+            db.column('product_id', db.Integer),
+            db.column('rank', db.Float)
+        ).cte('busca').prefix_with('MATERIALIZED')
+
+    @staticmethod
+    def fuzzy_subquery(db, Product, q):
+        """
+        Subquery (product_id, rank) dos produtos com título parecido com `q`.
+
+        rank é a similaridade de trigramas (0-1), já cortada em
+        FUZZY_THRESHOLD. No PostgreSQL usa o operador <% do pg_trgm (índice
+        GIN); nos demais bancos, o índice de trigramas em memória do worker.
+        Retorna None se não houver palavras ou nenhum produto parecido.
+        """
+        palavras = SearchIndex.tokens(q)
+        if not palavras:
+            return None
+
+        if str(db.engine.url) in SearchIndex._trigram_available:
+            # Limiar do operador <% (vale só para a transação atual)
+            db.session.execute(
+                db.text("SELECT set_config('pg_trgm.word_similarity_threshold', :limiar, true)"),
+                {"limiar": str(SearchIndex.FUZZY_THRESHOLD)}
+            )
+            sql = db.text(
+                "SELECT product_id, word_similarity(:termo, titulo)::double precision AS rank "
+                "FROM product_search WHERE :termo <% titulo "
+                "ORDER BY rank DESC LIMIT :limite"
+            ).bindparams(termo=' '.join(palavras), limite=SearchIndex.FUZZY_LIMIT)
+            return sql.columns(
+                db.column('product_id', db.Integer),
+                db.column('rank', db.Float)
+            ).cte('aproximada')
+
+        from app.utils.catalog_cache import catalog_version
+        from app.utils.trigram_index import trigram_index
+
+        trigram_index.ensure(
+            catalog_version.current(),
+            lambda: db.session.query(Product.id, Product.titulo).all()
+        )
+        encontrados = trigram_index.search(q, SearchIndex.FUZZY_THRESHOLD, SearchIndex.FUZZY_LIMIT)
+        if not encontrados:
+            return None
+        return db.values(
+            db.column('product_id', db.Integer),
+            db.column('rank', db.Float),
+            name='aproximada'
+        ).data(encontrados).cte('aproximada')
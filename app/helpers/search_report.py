@@ -0,0 +1,74 @@
+# ============================================
+# helpers/search_report.py — Relatórios de Buscas
+# ============================================
+
+
+class SearchReport:
+    """
+    Consultas agregadas sobre search_event (gravada em lote pelo
+    SearchAnalytics): termos mais buscados e buscas sem resultado.
+
+    Só a primeira página de cada busca é registrada, então cada linha é
+    uma busca feita por um cliente. Buscas sem texto (só filtros) ficam
+    de fora dos relatórios por termo.
+    """
+
+    MAX_LINHAS = 100
+
+    @staticmethod
+    def top_queries(db, SearchEvent, desde, limit=20):
+        """
+        Termos mais buscados desde `desde` (datetime).
+
+        Returns:
+            list: [{"termo", "buscas", "media_resultados", "latencia_media_ms", "aproximadas"}]
+        """
+        limit = min(limit, SearchReport.MAX_LINHAS)
+        buscas = db.func.count(SearchEvent.id)
+        rows = (
+            db.session.query(
+                SearchEvent.termo,
+                buscas.label('buscas'),
+                db.func.avg(SearchEvent.resultados).label('media_resultados'),
+                db.func.avg(SearchEvent.latencia_ms).label('latencia_media_ms'),
+                db.func.sum(db.case((SearchEvent.aproximada, 1), else_=0)).label('aproximadas')
+            )
+            .filter(SearchEvent.created_at >= desde, SearchEvent.termo != '')
+            .group_by(SearchEvent.termo)
+            .order_by(buscas.desc(), SearchEvent.termo)
+            .limit(limit)
+            .all()
+        )
+        return [{
+            "termo": r.termo,
+            "buscas": r.buscas,
+            "media_resultados": round(float(r.media_resultados), 1),
+            "latencia_media_ms": round(float(r.latencia_media_ms), 1),
+            "aproximadas": int(r.aproximadas or 0)
+        } for r in rows]
+
+    @staticmethod
+    def zero_results(db, SearchEvent, desde, limit=20):
+        """
+        Termos que não trouxeram nenhum produto (nem pela busca aproximada)
+        desde `desde`, dos mais frequentes para os menos.
+
+        Returns:
+            list: [{"termo", "buscas", "ultima"}]
+        """
+        limit = min(limit, SearchReport.MAX_LINHAS)
+        buscas = db.func.count(SearchEvent.id)
+        rows = (
+            db.session.query(
+                SearchEvent.termo,
+                buscas.label('buscas'),
+                db.func.max(SearchEvent.created_at).label('ultima')
+            )
+            .filter(SearchEvent.created_at >= desde, SearchEvent.termo != '',
+                    SearchEvent.resultados == 0)
+            .group_by(SearchEvent.termo)
+            .order_by(buscas.desc(), SearchEvent.termo)
+            .limit(limit)
+            .all()
+        )
+        return [{"termo": r.termo, "buscas": r.buscas, "ultima": r.ultima} for r in rows]
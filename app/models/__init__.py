@@ -9,6 +9,9 @@ from .review import create_review_model
 from .cart import create_cart_model
 from .address import create_address_model
 from .payment_method import create_payment_method_model
+from .image_job import create_image_job_model
+from .catalog_change import create_catalog_change_model
+from .search_event import create_search_event_model
 
 # Importar db do app_new para criar os models
 # Será sobrescrito quando importado de app_new
@@ -20,10 +23,13 @@ Review = None
 CartItem = None
 Address = None
 PaymentMethod = None
+ImageJob = None
+CatalogChange = None
+SearchEvent = None
 
 def init_models(db):
     """Inicializa todos os models com a instância do db"""
-    global User, Product, Order, OrderItem, Review, CartItem, Address, PaymentMethod
+    global User, Product, Order, OrderItem, Review, CartItem, Address, PaymentMethod, ImageJob, CatalogChange, SearchEvent
     
     User = create_user_model(db)
     Product = create_product_model(db)
@@ -32,6 +38,10 @@ def init_models(db):
     CartItem = create_cart_model(db)
     Address = create_address_model(db)
     PaymentMethod = create_payment_method_model(db)
+    # Modelos internos (sem entrada na tupla): importar de app.models após init_models
+    ImageJob = create_image_job_model(db)
+    CatalogChange = create_catalog_change_model(db)
+    SearchEvent = create_search_event_model(db)
     
     return User, Product, Order, OrderItem, Review, CartItem, Address, PaymentMethod
 
@@ -44,5 +54,8 @@ __all__ = [
     'CartItem',
     'Address',
     'PaymentMethod',
+    'ImageJob',
+    'CatalogChange',
+    'SearchEvent',
     'init_models'
 ]
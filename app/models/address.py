@@ -58,7 +58,7 @@ def create_address_model(db):
                 'telefone': self.telefone,
                 'is_default': self.is_default,
                 'endereco_completo': self.get_endereco_completo(),
-                'created_at': self.created_at.isoformat() if self.created_at else None
+                'created_at': self.created_at
             }
         
         def get_endereco_completo(self):
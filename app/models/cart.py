@@ -8,6 +8,10 @@ def create_cart_model(db):
     class CartItem(db.Model):
         """Item do carrinho de compras"""
         __tablename__ = 'cart_item'
+        # Uma linha por produto no carrinho: alvo do INSERT ... ON CONFLICT do CartHelper
+        __table_args__ = (
+            db.Index('uq_cart_item_user_product', 'user_id', 'product_id', unique=True),
+        )
         
         id = db.Column(db.Integer, primary_key=True)
         user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
@@ -0,0 +1,34 @@
+# ============================================
+# models/catalog_change.py — Modelo do Feed de Alterações do Catálogo
+# ============================================
+
+from datetime import datetime
+
+def create_catalog_change_model(db):
+    """Factory para criar o modelo CatalogChange com a instância db correta."""
+
+    class CatalogChange(db.Model):
+        """Alteração de um produto no catálogo (seq crescente, lido por /api/products/changes)"""
+        __tablename__ = 'catalog_change'
+        # AUTOINCREMENT no SQLite: seq nunca é reaproveitado, mesmo após limpeza
+        __table_args__ = {'sqlite_autoincrement': True}
+
+        seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+        # Sem FK: a linha do produto removido continua valendo como tombstone
+        product_id = db.Column(db.Integer, nullable=False, index=True)
+        deleted = db.Column(db.Boolean, default=False, nullable=False)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+        def __repr__(self):
+            return f'<CatalogChange {self.seq}: Product {self.product_id}{" (removido)" if self.deleted else ""}>'
+
+        def to_dict(self):
+            """Converte para dicionário"""
+            return {
+                'seq': self.seq,
+                'product_id': self.product_id,
+                'deleted': self.deleted,
+                'created_at': self.created_at
+            }
+
+    return CatalogChange
@@ -0,0 +1,39 @@
+# ============================================
+# models/image_job.py — Modelo de Processamento de Imagem
+# ============================================
+
+from datetime import datetime
+
+def create_image_job_model(db):
+    """Factory para criar o modelo ImageJob com a instância db correta."""
+    
+    class ImageJob(db.Model):
+        """Processamento pendente de uma imagem enviada (derivados), executado em background"""
+        __tablename__ = 'image_job'
+        
+        id = db.Column(db.Integer, primary_key=True)
+        product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+        arquivo = db.Column(db.String(256), nullable=False)  # Nome em static/imagens
+        status = db.Column(db.String(20), default='pendente', nullable=False, index=True)  # pendente, processando, concluido, erro
+        tentativas = db.Column(db.Integer, default=0, nullable=False)
+        erro = db.Column(db.Text)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+        
+        def __repr__(self):
+            return f'<ImageJob {self.id}: Product {self.product_id} - {self.status}>'
+        
+        def to_dict(self):
+            """Converte para dicionário"""
+            return {
+                'id': self.id,
+                'product_id': self.product_id,
+                'arquivo': self.arquivo,
+                'status': self.status,
+                'tentativas': self.tentativas,
+                'erro': self.erro,
+                'created_at': self.created_at,
+                'updated_at': self.updated_at
+            }
+    
+    return ImageJob
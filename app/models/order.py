@@ -48,7 +48,7 @@ def create_order_model(db):
                     'cidade': self.endereco_cidade,
                     'telefone': self.telefone
                 },
-                'created_at': self.created_at.isoformat() if self.created_at else None
+                'created_at': self.created_at
             }
             
             if include_items:
@@ -55,7 +55,7 @@ def create_payment_method_model(db):
                 'is_default': self.is_default,
                 'card_display': self.get_card_display(),
                 'is_expired': self.is_expired(),
-                'created_at': self.created_at.isoformat() if self.created_at else None
+                'created_at': self.created_at
             }
         
         def get_card_display(self):
@@ -16,9 +16,22 @@ def create_product_model(db):
         descricao = db.Column(db.Text)
         preco = db.Column(db.Float, nullable=False)
         imagem = db.Column(db.String(256))
+        imagens = db.Column(db.JSON(none_as_null=True))  # Derivados redimensionados (ImageHelper)
+        cor_dominante = db.Column(db.String(7))  # Placeholder: '#rrggbb'
+        miniatura = db.Column(db.Text)  # Placeholder: data URI de ~16px
         estoque = db.Column(db.Integer, default=0, nullable=False)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         
+        # Contadores de avaliações (desnormalizados, mantidos pelo ReviewHelper
+        # na mesma transação da avaliação; recalcular: scripts/database/recalcular_avaliacoes.py)
+        n_reviews = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        soma_notas = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        notas_1 = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        notas_2 = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        notas_3 = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        notas_4 = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        notas_5 = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+        
         # Relacionamentos
         order_items = db.relationship('OrderItem', backref='product', lazy=True)
         reviews = db.relationship('Review', backref='product', lazy=True)
@@ -27,6 +40,11 @@ def create_product_model(db):
         def __repr__(self):
             return f'<Product {self.id}: {self.titulo}>'
         
+        @property
+        def media(self):
+            """Média das avaliações (0 se não houver)"""
+            return round(self.soma_notas / self.n_reviews, 2) if self.n_reviews else 0
+        
         def to_dict(self, include_reviews=False):
             """Converte para dicionário"""
             data = {
@@ -35,8 +53,13 @@ def create_product_model(db):
                 'descricao': self.descricao,
                 'preco': self.preco,
                 'imagem': self.imagem,
+                'imagens': self.imagens or [],
+                'cor_dominante': self.cor_dominante,
+                'miniatura': self.miniatura,
                 'estoque': self.estoque,
-                'created_at': self.created_at.isoformat() if self.created_at else None
+                'media': self.media,
+                'n_reviews': self.n_reviews,
+                'created_at': self.created_at
             }
             
             if include_reviews:
@@ -10,6 +10,10 @@ def create_review_model(db):
     class Review(db.Model):
         """Modelo de avaliação de produto"""
         __tablename__ = 'review'
+        # Uma avaliação por usuário e produto (duplo envio / requisições simultâneas)
+        __table_args__ = (
+            db.Index('uq_review_user_product', 'user_id', 'product_id', unique=True),
+        )
         
         id = db.Column(db.Integer, primary_key=True)
         user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
@@ -29,7 +33,7 @@ def create_review_model(db):
                 'product_id': self.product_id,
                 'comentario': self.comentario,
                 'nota': self.nota,
-                'created_at': self.created_at.isoformat() if self.created_at else None
+                'created_at': self.created_at
             }
     
     return Review
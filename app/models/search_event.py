@@ -0,0 +1,43 @@
+# ============================================
+# models/search_event.py — Modelo das Buscas Registradas
+# ============================================
+
+from datetime import datetime
+
+def create_search_event_model(db):
+    """Factory para criar o modelo SearchEvent com a instância db correta."""
+
+    class SearchEvent(db.Model):
+        """Busca feita em /api/products/search (gravada em lote pelo SearchAnalytics)"""
+        __tablename__ = 'search_event'
+
+        id = db.Column(db.Integer, primary_key=True)
+        termo = db.Column(db.String(200), nullable=False, index=True)  # Normalizado (minúsculas, espaços únicos)
+        preco_min = db.Column(db.Float)
+        preco_max = db.Column(db.Float)
+        ordenar = db.Column(db.String(20))
+        resultados = db.Column(db.Integer, nullable=False)  # Itens na primeira página
+        aproximada = db.Column(db.Boolean, default=False, nullable=False)
+        cache = db.Column(db.Boolean, default=False, nullable=False)
+        latencia_ms = db.Column(db.Float, nullable=False)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+        def __repr__(self):
+            return f'<SearchEvent {self.id}: "{self.termo}" - {self.resultados} resultados>'
+
+        def to_dict(self):
+            """Converte para dicionário"""
+            return {
+                'id': self.id,
+                'termo': self.termo,
+                'preco_min': self.preco_min,
+                'preco_max': self.preco_max,
+                'ordenar': self.ordenar,
+                'resultados': self.resultados,
+                'aproximada': self.aproximada,
+                'cache': self.cache,
+                'latencia_ms': self.latencia_ms,
+                'created_at': self.created_at
+            }
+
+    return SearchEvent
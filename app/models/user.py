@@ -39,7 +39,7 @@ def create_user_model(db):
                 'nome': self.nome,
                 'email': self.email,
                 'is_admin': self.is_admin,
-                'created_at': self.created_at.isoformat() if self.created_at else None
+                'created_at': self.created_at
             }
     
     return User
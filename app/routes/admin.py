@@ -3,10 +3,12 @@
 # ============================================
 
 from flask import Blueprint, request, render_template, session, redirect, url_for
-from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from sqlalchemy import extract
-import os
+
+from app.utils.catalog_cache import catalog_version
+from app.helpers import ImageHelper, ChangeFeed, SearchReport
+from app.utils.image_worker import image_worker
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -16,18 +18,22 @@ User = None
 Product = None
 Order = None
 OrderItem = None
+ImageJob = None
+SearchEvent = None
 logger = None
 email_service = None
 UPLOAD_FOLDER = None
 
 def init_admin(database, models_dict, log, email_svc, upload_folder):
     """Inicializa o blueprint com dependências"""
-    global db, User, Product, Order, OrderItem, logger, email_service, UPLOAD_FOLDER
+    global db, User, Product, Order, OrderItem, ImageJob, SearchEvent, logger, email_service, UPLOAD_FOLDER
     db = database
     User = models_dict['User']
     Product = models_dict['Product']
     Order = models_dict['Order']
     OrderItem = models_dict['OrderItem']
+    ImageJob = models_dict.get('ImageJob')
+    SearchEvent = models_dict.get('SearchEvent')
     logger = log
     email_service = email_svc
     UPLOAD_FOLDER = upload_folder
@@ -111,6 +117,31 @@ def admin_dashboard():
 # GESTÃO DE PRODUTOS
 # ============================================
 
+def agendar_processamento(p, nome_arquivo):
+    """
+    Troca a imagem do produto e agenda os derivados em background.
+    
+    O produto usa a imagem original até o job terminar. Se o mesmo
+    conteúdo (mesmo hash) já foi processado para outro produto, os
+    derivados são reaproveitados e nenhum job é criado.
+    
+    Returns:
+        ImageJob | None: job a enfileirar depois do commit
+    """
+    p.imagem = f"imagens/{nome_arquivo}"
+    existente = db.session.query(Product.imagens, Product.cor_dominante, Product.miniatura).filter(
+        Product.imagem == p.imagem, Product.id != p.id, Product.imagens.isnot(None)
+    ).first()
+    if existente:
+        p.imagens, p.cor_dominante, p.miniatura = existente
+        return None
+    
+    p.imagens = p.cor_dominante = p.miniatura = None
+    job = ImageJob(product_id=p.id, arquivo=nome_arquivo)
+    db.session.add(job)
+    return job
+
+
 @admin_bp.route("/novo", methods=["GET", "POST"])
 @admin_required
 def admin_novo_produto():
@@ -137,8 +168,7 @@ def admin_novo_produto():
             imagem_file = request.files.get("imagem")
             nome_arquivo = None
             if imagem_file and imagem_file.filename:
-                nome_arquivo = secure_filename(imagem_file.filename)
-                imagem_file.save(os.path.join(UPLOAD_FOLDER, nome_arquivo))
+                nome_arquivo = ImageHelper.save_upload(imagem_file, UPLOAD_FOLDER)
             
             # Criar produto
             p = Product(
@@ -146,10 +176,16 @@ def admin_novo_produto():
                 descricao=data['descricao'],
                 preco=float(data['preco']),
                 estoque=int(data['estoque']),
-                imagem=f"imagens/{nome_arquivo}" if nome_arquivo else ""
+                imagem=""
             )
             db.session.add(p)
+            db.session.flush()
+            job = agendar_processamento(p, nome_arquivo) if nome_arquivo else None
+            ChangeFeed.record(db, [p.id])
             db.session.commit()
+            catalog_version.bump()
+            if job:
+                image_worker.submit(job.id)
             
             logger.info(f"Produto criado - ID: {p.id} ({p.titulo}) - Admin: {session.get('user_id')}")
             return redirect("/admin")
@@ -195,11 +231,16 @@ def admin_editar_produto(pid):
             # Processar nova imagem se enviada
             imagem_file = request.files.get("imagem")
             if imagem_file and imagem_file.filename:
-                nome_arquivo = secure_filename(imagem_file.filename)
-                imagem_file.save(os.path.join(UPLOAD_FOLDER, nome_arquivo))
-                p.imagem = f"imagens/{nome_arquivo}"
+                nome_arquivo = ImageHelper.save_upload(imagem_file, UPLOAD_FOLDER)
+                job = agendar_processamento(p, nome_arquivo)
+            else:
+                job = None
             
+            ChangeFeed.record(db, [pid])
             db.session.commit()
+            catalog_version.bump()
+            if job:
+                image_worker.submit(job.id)
             
             logger.info(f"Produto editado - ID: {pid} ({p.titulo}) - Admin: {session.get('user_id')}")
             return redirect("/admin")
@@ -221,7 +262,9 @@ def admin_remover_produto(pid):
         titulo = p.titulo
         
         db.session.delete(p)
+        ChangeFeed.record(db, [pid], deleted=True)
         db.session.commit()
+        catalog_version.bump()
         
         logger.info(f"Produto removido - ID: {pid} ({titulo}) - Admin: {session.get('user_id')}")
         return redirect("/admin")
@@ -322,3 +365,31 @@ def admin_pedido_status(pedido_id):
         db.session.rollback()
         logger.error(f"Erro ao atualizar status do pedido {pedido_id}: {str(e)}", exc_info=True)
         return "Erro ao atualizar status", 500
+
+
+# ============================================
+# RELATÓRIOS DE BUSCA
+# ============================================
+
+@admin_bp.route("/buscas")
+@admin_required
+def admin_buscas():
+    """Termos mais buscados e buscas sem resultado dos últimos N dias"""
+    from app.utils.search_analytics import search_analytics
+    
+    try:
+        dias = min(max(request.args.get("dias", 30, type=int), 1), 365)
+        desde = datetime.utcnow() - timedelta(days=dias)
+        
+        logger.info(f"Relatório de buscas acessado - Admin: {session.get('user_id')}")
+        return render_template(
+            "admin_buscas.html",
+            dias=dias,
+            mais_buscados=SearchReport.top_queries(db, SearchEvent, desde),
+            sem_resultado=SearchReport.zero_results(db, SearchEvent, desde),
+            pendentes=search_analytics.pending
+        )
+        
+    except Exception as e:
+        logger.error(f"Erro no relatório de buscas: {str(e)}", exc_info=True)
+        return render_template("erro.html", mensagem="Erro ao carregar relatório de buscas"), 500
@@ -91,6 +91,16 @@ def login_page():
                 session["is_admin"] = user.is_admin
                 session.permanent = True
                 
+                # Carrinho montado como visitante passa para a conta
+                try:
+                    from app.models import CartItem, Product
+                    from app.helpers import CartHelper
+                    juntados = CartHelper.merge_session_cart(db, CartItem, Product, user.id)
+                    if juntados:
+                        logger.info(f"🛒 Carrinho da sessão juntado - User: {user.id}, {juntados} produtos")
+                except Exception as e:
+                    logger.error(f"Erro ao juntar carrinho da sessão - User: {user.id}: {e}", exc_info=True)
+                
                 logger.info(f"✅ Login OK - User: {user.id} ({user.email}) - Admin: {user.is_admin} - IP: {request.remote_addr}")
                 logger.info(f"🔐 Session after: {dict(session)}")
                 
@@ -75,8 +75,8 @@ def diagnostico():
     
     # 3. Verificar diretórios
     try:
-        instance_dir = Path(app_config.INSTANCE_DIR)
-        static_dir = Path(app_config.UPLOAD_FOLDER)
+        instance_dir = Path(app_config['INSTANCE_DIR'])
+        static_dir = Path(app_config['UPLOAD_FOLDER'])
         
         resultado["checks"]["diretorios"] = {
             "instance": "✅ existe" if instance_dir.exists() else "❌ faltando",
@@ -90,11 +90,17 @@ def diagnostico():
     
     # 4. Verificar configurações críticas
     resultado["checks"]["config"] = {
-        "SECRET_KEY": "✅ configurada" if app_config.SECRET_KEY else "❌ faltando",
-        "CSRF": "✅ habilitado" if app_config.WTF_CSRF_ENABLED else "⚠️  desabilitado",
-        "SESSION_SECURE": "✅ sim" if app_config.SESSION_COOKIE_SECURE else "⚠️  não (dev only)"
+        "SECRET_KEY": "✅ configurada" if app_config.get('SECRET_KEY') else "❌ faltando",
+        "CSRF": "✅ habilitado" if app_config.get('WTF_CSRF_ENABLED') else "⚠️  desabilitado",
+        "SESSION_SECURE": "✅ sim" if app_config.get('SESSION_COOKIE_SECURE') else "⚠️  não (dev only)"
     }
     
+    # 5. Caches em memória (contadores do worker que atendeu)
+    from app.utils.catalog_cache import search_cache
+    from app.utils.search_analytics import search_analytics
+    resultado["checks"]["cache_busca"] = search_cache.stats()
+    resultado["checks"]["registro_buscas"] = search_analytics.stats()
+    
     # Determinar status final
     if resultado["status"] != "ERRO":
         if any("❌" in str(v) for v in resultado["checks"].values()):
@@ -116,7 +122,7 @@ def diagnostico_usuarios():
                     "email": u.email,
                     "nome": u.nome,
                     "admin": u.is_admin,
-                    "criado_em": u.created_at.isoformat() if u.created_at else None
+                    "criado_em": u.created_at
                 }
                 for u in users
             ]
@@ -5,6 +5,9 @@
 from flask import Blueprint, request, jsonify, render_template, session, redirect
 import stripe
 
+from app.utils.catalog_cache import catalog_version
+from app.helpers import ChangeFeed
+
 payment_bp = Blueprint('payment', __name__)
 
 # Variáveis globais (serão injetadas)
@@ -39,11 +42,8 @@ def checkout():
         session['redirect_after_login'] = "/checkout"
         return redirect("/login")
 
-    carrinho_itens = CartHelper.snapshot_cart_for_checkout(
-        db, 
-        db.session.query(type('CartItem', (), {})).first().__class__, 
-        Product
-    )
+    from app.models import CartItem
+    carrinho_itens = CartHelper.snapshot_cart_for_checkout(db, CartItem, Product)
     
     if not carrinho_itens:
         return redirect("/carrinho")
@@ -166,6 +166,7 @@ def processar_pagamento():
                         produto.estoque -= item["quantidade"]
                         if produto.estoque < 0:
                             produto.estoque = 0
+                ChangeFeed.record(db, [item["product_id"] for item in carrinho_itens])
                 
                 # Criar pedido
                 from app.models import User, OrderItem
@@ -182,6 +183,7 @@ def processar_pagamento():
                 pedido.endereco_cidade = endereco.get('cidade')
                 pedido.telefone = endereco.get('telefone')
                 db.session.commit()
+                catalog_version.bump()  # Estoque mudou
                 
                 # Salvar endereço se solicitado (e não estava usando um salvo)
                 if save_address and not saved_address_id:
@@ -2,7 +2,8 @@
 # products.py — Blueprint de Produtos e Carrinho
 # ============================================
 
-from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for
+from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for, current_app
+from sqlalchemy.exc import IntegrityError
 
 products_bp = Blueprint('products', __name__)
 
@@ -14,11 +15,12 @@ User = None
 CartItem = None
 Order = None
 OrderItem = None
+CatalogChange = None
 logger = None
 
 def init_products(database, models_dict, log):
     """Inicializa o blueprint com dependências"""
-    global db, Product, Review, User, CartItem, Order, OrderItem, logger
+    global db, Product, Review, User, CartItem, Order, OrderItem, CatalogChange, logger
     db = database
     Product = models_dict['Product']
     Review = models_dict['Review']
@@ -26,9 +28,17 @@ def init_products(database, models_dict, log):
     CartItem = models_dict['CartItem']
     Order = models_dict['Order']
     OrderItem = models_dict['OrderItem']
+    CatalogChange = models_dict.get('CatalogChange')
     logger = log
 
 
+@products_bp.app_template_filter('srcset')
+def srcset_filter(imagens, tipo='image/webp'):
+    """srcset dos derivados de uma imagem (Product.imagens) no formato pedido"""
+    from app.helpers import ImageHelper
+    return ImageHelper.srcset(imagens, tipo)
+
+
 # ============================================
 # PÁGINAS DE PRODUTOS (HTML)
 # ============================================
@@ -94,137 +104,492 @@ def perfil_page():
 # API DE PRODUTOS (JSON)
 # ============================================
 
+def parse_page_args():
+    """
+    Lê os parâmetros de paginação/projeção das APIs de produtos.
+
+    - fields: campos a retornar (ex: id,titulo,preco,imagem)
+    - limit: tamanho da página (máx. CatalogHelper.MAX_PAGE_SIZE)
+    - cursor: cursor opaco da página anterior
+
+    Returns:
+        tuple: (fields, limit, cursor) — limit é None quando não há paginação
+
+    Raises:
+        ValueError: parâmetros inválidos
+    """
+    from app.helpers import CatalogHelper
+    
+    fields = CatalogHelper.parse_fields(request.args.get('fields'))
+    cursor = request.args.get('cursor') or None
+    limit = request.args.get('limit')
+    
+    if limit is None and cursor is None:
+        return fields, None, None
+    
+    try:
+        limit = int(limit) if limit is not None else CatalogHelper.MAX_PAGE_SIZE
+    except ValueError:
+        raise ValueError("limit deve ser um número inteiro")
+    if limit < 1:
+        raise ValueError("limit deve ser maior que zero")
+    
+    return fields, min(limit, CatalogHelper.MAX_PAGE_SIZE), cursor
+
+
+def page_payload(itens, limit, proximo_cursor):
+    """Lista simples sem paginação; com limit, envelope com o próximo cursor"""
+    if limit is None:
+        return itens
+    return {"itens": itens, "proximo_cursor": proximo_cursor}
+
+
+def page_response(itens, limit, proximo_cursor):
+    """Resposta JSON de page_payload"""
+    return jsonify(page_payload(itens, limit, proximo_cursor))
+
+
 @products_bp.route("/api/products")
 def api_products():
-    """API que retorna todos os produtos com suas avaliações"""
+    """
+    API que retorna todos os produtos com suas avaliações.
+    
+    Aceita fields=, limit= e cursor= (paginação keyset por id), ou
+    ids=1,2,3 para buscar só esses produtos (mesmo formato da listagem).
+    """
+    from app.helpers import CatalogHelper
+    from app.utils.catalog_cache import catalog_version, catalog_cache
+    
     try:
-        prods = Product.query.all()
-        data = []
+        if request.args.get('ids') is not None:
+            fields = CatalogHelper.parse_fields(request.args.get('fields'))
+            ids = CatalogHelper.parse_ids(request.args.get('ids'))
+            return jsonify(CatalogHelper.products_by_ids(db, Product, ids, fields))
         
-        for p in prods:
-            # Calcular média de avaliações
-            avg = db.session.query(db.func.avg(Review.nota)).filter(Review.product_id == p.id).scalar() or 0
-            count = Review.query.filter_by(product_id=p.id).count()
-            
-            # Limpar caminho da imagem
-            imagem = p.imagem.replace('imagens/', '') if p.imagem and p.imagem.startswith('imagens/') else (p.imagem or '')
-            
-            data.append({
-                "id": p.id,
-                "titulo": p.titulo,
-                "descricao": p.descricao,
-                "preco": p.preco,
-                "imagem": imagem,
-                "estoque": p.estoque,
-                "media": round(float(avg), 2),
-                "n_reviews": count
-            })
+        fields, limit, cursor = parse_page_args()
         
-        return jsonify(data)
+        if fields or limit:
+            itens, proximo = CatalogHelper.page_products(
+                db, Product, ordenar='id', fields=fields, limit=limit, cursor=cursor
+            )
+            return page_response(itens, limit, proximo)
+        
+        # JSON serializado fica em cache por versão do catálogo;
+        # If-None-Match com o ETag atual vira 304 sem consultar o banco
+        body, etag = catalog_cache.get_or_build(
+            'products',
+            catalog_version.current(),
+            lambda: current_app.json.dumps(CatalogHelper.list_products(db, Product)).encode('utf-8')
+        )
         
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar produtos: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao carregar produtos"}), 500
 
 
+@products_bp.route("/api/products", methods=["POST"])
+def api_products_batch():
+    """
+    Versão POST de /api/products?ids= para listas longas.
+    
+    Corpo JSON: {"ids": [1, 2, 3], "fields": "id,titulo,preco"} (fields opcional).
+    """
+    from app.helpers import CatalogHelper
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        fields = CatalogHelper.parse_fields(data.get('fields') or request.args.get('fields'))
+        ids = CatalogHelper.parse_ids(data.get('ids'))
+        return jsonify(CatalogHelper.products_by_ids(db, Product, ids, fields))
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao buscar produtos em lote: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao carregar produtos"}), 500
+
+
+@products_bp.route("/api/products/changes")
+def api_products_changes():
+    """
+    Feed incremental do catálogo: produtos alterados/removidos depois de since=.
+    
+    Sem since, retorna só o seq atual (ponto de partida do cliente).
+    Aceita fields= e limit=; com "mais": true, chamar de novo com o novo seq.
+    410 se as alterações depois de since já foram limpas (recarregar /api/products).
+    """
+    from app.helpers import CatalogHelper, ChangeFeed
+    
+    try:
+        fields = CatalogHelper.parse_fields(request.args.get('fields'))
+        since = request.args.get('since')
+        if since is None:
+            return jsonify({"seq": ChangeFeed.current_seq(db, CatalogChange),
+                            "itens": [], "removidos": [], "mais": False})
+        
+        try:
+            since = int(since)
+            limit = int(request.args.get('limit', ChangeFeed.MAX_CHANGES))
+        except ValueError:
+            raise ValueError("since e limit devem ser números inteiros")
+        if since < 0 or limit < 1:
+            raise ValueError("since deve ser >= 0 e limit maior que zero")
+        
+        return jsonify(ChangeFeed.changes_since(db, Product, CatalogChange, since, fields, limit))
+    
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 410
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao listar alterações do catálogo: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao carregar alterações"}), 500
+
+
+@products_bp.route("/api/products/suggest")
+def api_products_suggest():
+    """
+    Autocompletar da busca: títulos que começam com q= (ou com uma palavra dele).
+    
+    Responde de um índice em memória do worker, reconstruído só quando a
+    versão do catálogo muda; as teclas não chegam ao banco.
+    """
+    from app.utils.catalog_cache import catalog_version
+    from app.utils.suggest_index import suggest_index
+    
+    try:
+        limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+        suggest_index.ensure(
+            catalog_version.current(),
+            lambda: db.session.query(Product.id, Product.titulo).all()
+        )
+        return jsonify(suggest_index.suggest(request.args.get('q', ''), limit))
+    
+    except Exception as e:
+        logger.error(f"Erro ao sugerir produtos: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao carregar sugestões"}), 500
+
+
+def sse_event(evento, dados):
+    """Formata um evento Server-Sent Events com dados JSON"""
+    return f"event: {evento}\ndata: {current_app.json.dumps(dados)}\n\n"
+
+
+@products_bp.route("/api/products/stream")
+def api_products_stream():
+    """
+    SSE com estoque e preço dos produtos em ids= (até CatalogHelper.MAX_PAGE_SIZE).
+    
+    Envia o estado atual e depois um evento 'estoque' por alteração
+    ({"id", "preco", "estoque"} ou {"id", "removido": true}). A conexão
+    fecha após STOCK_STREAM_TTL segundos e o EventSource reconecta; 503
+    quando o processo já atingiu STOCK_STREAM_MAX_CLIENTS conexões.
+    """
+    import queue
+    import time
+    from app.helpers import CatalogHelper
+    from app.utils.stock_stream import stock_stream
+    
+    try:
+        ids = CatalogHelper.parse_ids(request.args.get('ids', ''))
+        if len(ids) > CatalogHelper.MAX_PAGE_SIZE:
+            raise ValueError(f"Máximo de {CatalogHelper.MAX_PAGE_SIZE} ids por conexão")
+        
+        # Assina antes de ler o estado atual: nada se perde entre os dois
+        fila = stock_stream.subscribe(ids)
+        if fila is None:
+            return jsonify({"error": "Muitas conexões abertas"}), 503, {"Retry-After": "30"}
+        try:
+            atual = CatalogHelper.products_by_ids(db, Product, ids, stock_stream.FIELDS)
+            existentes = {p['id'] for p in atual}
+            atual += [{"id": pid, "removido": True} for pid in ids if pid not in existentes]
+            abertura = "retry: 5000\n\n" + "".join(sse_event('estoque', p) for p in atual)
+        except Exception:
+            stock_stream.unsubscribe(fila)
+            raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao abrir stream de estoque: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao abrir stream"}), 500
+    
+    ttl = current_app.config.get('STOCK_STREAM_TTL', 300)
+    json_dumps = current_app.json.dumps
+    
+    # O gerador roda depois do fim da requisição (sem app context):
+    # a sessão do banco já foi devolvida ao pool
+    def eventos():
+        try:
+            yield abertura
+            fim = time.monotonic() + ttl
+            while time.monotonic() < fim:
+                try:
+                    evento = fila.get(timeout=min(15, max(fim - time.monotonic(), 0.1)))
+                except queue.Empty:
+                    yield ": ping\n\n"  # mantém proxies e detecta cliente desconectado
+                    continue
+                yield f"event: estoque\ndata: {json_dumps(evento)}\n\n"
+        finally:
+            stock_stream.unsubscribe(fila)
+    
+    return current_app.response_class(eventos(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @products_bp.route("/api/product/<int:product_id>")
 def api_product_detail(product_id):
-    """API que retorna detalhes de um produto específico"""
+    """
+    API que retorna detalhes de um produto específico.
+    
+    Inclui média, histograma de notas (1-5) e a 1ª página de avaliações;
+    as demais páginas vêm de /api/product/<id>/reviews.
+    """
+    from app.helpers import ReviewHelper
+    
     try:
-        p = Product.query.get_or_404(product_id)
-        
-        # Buscar reviews com informações do usuário
-        reviews = (
-            Review.query.filter_by(product_id=p.id)
-            .join(User, Review.user_id == User.id)
-            .add_columns(User.nome, Review.nota, Review.comentario, Review.created_at)
-            .all()
-        )
+        data = ReviewHelper.product_detail(db, Product, Review, User, product_id)
+        if data is None:
+            return jsonify({"error": "Produto não encontrado"}), 404
         
-        revs = [
-            {
-                "nome": r.nome,
-                "nota": r.nota,
-                "comentario": r.comentario,
-                "created_at": r.created_at.isoformat()
-            }
-            for r in reviews
-        ]
-        
-        return jsonify({
-            "id": p.id,
-            "titulo": p.titulo,
-            "descricao": p.descricao,
-            "preco": p.preco,
-            "imagem": p.imagem,
-            "estoque": p.estoque,
-            "reviews": revs
-        })
+        return jsonify(data)
         
     except Exception as e:
         logger.error(f"Erro ao carregar produto {product_id}: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao carregar produto"}), 500
 
 
+@products_bp.route("/api/product/<int:product_id>/reviews")
+def api_product_reviews(product_id):
+    """Avaliações paginadas de um produto (limit=, cursor=), mais recentes primeiro"""
+    from app.helpers import ReviewHelper
+    
+    try:
+        limit = request.args.get('limit', ReviewHelper.PAGE_SIZE, type=int)
+        limit = max(1, min(limit, ReviewHelper.MAX_PAGE_SIZE))
+        
+        reviews, proximo = ReviewHelper.page_reviews(
+            db, Review, User, product_id, limit, request.args.get('cursor') or None
+        )
+        return jsonify({"reviews": reviews, "proximo_cursor": proximo})
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao carregar avaliações do produto {product_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao carregar avaliações"}), 500
+
+
+def review_payload():
+    """
+    Lê e valida nota/comentário do corpo JSON.
+
+    Returns:
+        tuple: (nota, comentario, erros)
+    """
+    from app.utils import Validator
+    
+    data = request.get_json(silent=True) or {}
+    is_valid, errors = Validator.validate_review_data(data)
+    if not is_valid:
+        return None, None, errors
+    
+    comentario = Validator.sanitize_string(data.get('comentario'), 1000) or None
+    return int(data['nota']), comentario, []
+
+
+@products_bp.route("/api/product/<int:product_id>/reviews", methods=["POST"])
+def api_create_review(product_id):
+    """Cria a avaliação do usuário logado para o produto (uma por usuário)"""
+    from app.helpers import ReviewHelper
+    from app.utils.catalog_cache import catalog_version
+    
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Não autenticado"}), 401
+    
+    try:
+        nota, comentario, errors = review_payload()
+        if errors:
+            return jsonify({"error": "; ".join(errors)}), 400
+        
+        if not db.session.query(Product.id).filter_by(id=product_id).first():
+            return jsonify({"error": "Produto não encontrado"}), 404
+        
+        if db.session.query(Review.id).filter_by(user_id=user_id, product_id=product_id).first():
+            return jsonify({"error": "Você já avaliou este produto"}), 409
+        
+        review = ReviewHelper.create_review(db, Product, Review, user_id, product_id, nota, comentario)
+        catalog_version.bump()
+        
+        logger.info(f"Avaliação criada - User: {user_id}, Produto: {product_id}, Nota: {nota}")
+        return jsonify(review.to_dict()), 201
+    
+    except IntegrityError:
+        # Envio simultâneo passou pela verificação acima: o índice único barra a segunda
+        return jsonify({"error": "Você já avaliou este produto"}), 409
+    except Exception as e:
+        logger.error(f"Erro ao criar avaliação - User: {user_id}, Produto: {product_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao salvar avaliação"}), 500
+
+
+@products_bp.route("/api/reviews/<int:review_id>", methods=["PUT"])
+def api_update_review(review_id):
+    """Edita uma avaliação (apenas o autor)"""
+    from app.helpers import ReviewHelper
+    from app.utils.catalog_cache import catalog_version
+    
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Não autenticado"}), 401
+    
+    try:
+        review = Review.query.get(review_id)
+        if not review:
+            return jsonify({"error": "Avaliação não encontrada"}), 404
+        if review.user_id != user_id:
+            return jsonify({"error": "Acesso negado"}), 403
+        
+        nota, comentario, errors = review_payload()
+        if errors:
+            return jsonify({"error": "; ".join(errors)}), 400
+        
+        ReviewHelper.update_review(db, Product, review, nota, comentario)
+        catalog_version.bump()
+        
+        logger.info(f"Avaliação {review_id} editada - User: {user_id}, Nota: {nota}")
+        return jsonify(review.to_dict())
+    
+    except Exception as e:
+        logger.error(f"Erro ao editar avaliação {review_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao salvar avaliação"}), 500
+
+
+@products_bp.route("/api/reviews/<int:review_id>", methods=["DELETE"])
+def api_delete_review(review_id):
+    """Remove uma avaliação (autor ou admin)"""
+    from app.helpers import ReviewHelper
+    from app.utils.catalog_cache import catalog_version
+    
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Não autenticado"}), 401
+    
+    try:
+        review = Review.query.get(review_id)
+        if not review:
+            return jsonify({"error": "Avaliação não encontrada"}), 404
+        if review.user_id != user_id:
+            user = User.query.get(user_id)
+            if not user or not user.is_admin:
+                return jsonify({"error": "Acesso negado"}), 403
+        
+        ReviewHelper.delete_review(db, Product, review)
+        catalog_version.bump()
+        
+        logger.info(f"Avaliação {review_id} removida - User: {user_id}")
+        return jsonify({"success": True})
+    
+    except Exception as e:
+        logger.error(f"Erro ao remover avaliação {review_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao remover avaliação"}), 500
+
+
 @products_bp.route("/api/products/search")
 def api_products_search():
-    """Busca e filtra produtos com parâmetros de query"""
+    """
+    Busca e filtra produtos com parâmetros de query.
+    
+    Aceita fields=, limit= e cursor= (paginação keyset pela ordenação ativa).
+    Com facetas=1 a resposta vem sempre no envelope, com "facetas" (contagens
+    por faixa de preço, disponibilidade e avaliação do conjunto filtrado).
+    
+    Se o texto não encontra nada, repete a busca por similaridade de
+    trigramas ("eucalipito" -> "eucalipto") e marca a resposta com o
+    header X-Busca-Aproximada: 1.
+    
+    Respostas ficam no cache de busca do worker (LRU + TTL) pelos
+    parâmetros normalizados e pela versão do catálogo: buscas repetidas
+    não tocam o banco nem serializam de novo.
+    
+    A primeira página de cada busca vai para o SearchAnalytics (termo,
+    filtros, resultados, latência), só em memória: a gravação no banco é
+    em lote, fora da requisição.
+    """
+    import time
+    from app.helpers import CatalogHelper
+    from app.utils.catalog_cache import catalog_version, search_cache
+    from app.utils.search_analytics import search_analytics
+    
+    inicio = time.perf_counter()
     try:
         query = request.args.get('q', '').strip()
         preco_min = request.args.get('preco_min', type=float)
         preco_max = request.args.get('preco_max', type=float)
-        ordenar = request.args.get('ordenar', 'nome')  # nome, preco_asc, preco_desc, estoque
+        ordenar = request.args.get('ordenar', 'relevancia' if query else 'nome')
+        if ordenar not in CatalogHelper.SORT_OPTIONS:
+            raise ValueError(f"ordenar deve ser um de: {', '.join(CatalogHelper.SORT_OPTIONS)}")
+        facetas = request.args.get('facetas') in ('1', 'true')
         
-        # Query base
-        produtos = Product.query
+        fields, limit, cursor = parse_page_args()
         
-        # Filtro de busca por título ou descrição
-        if query:
-            produtos = produtos.filter(
-                db.or_(
-                    Product.titulo.ilike(f'%{query}%'),
-                    Product.descricao.ilike(f'%{query}%')
-                )
-            )
+        chave = search_cache.make_key(query, preco_min, preco_max, ordenar,
+                                      fields=fields, limit=limit, cursor=cursor, facetas=facetas)
+        versao = catalog_version.current()
+        resultado = search_cache.get(chave, versao)
+        do_cache = resultado is not None
         
-        # Filtros de preço
-        if preco_min is not None:
-            produtos = produtos.filter(Product.preco >= preco_min)
-        if preco_max is not None:
-            produtos = produtos.filter(Product.preco <= preco_max)
-        
-        # Ordenação
-        if ordenar == 'preco_asc':
-            produtos = produtos.order_by(Product.preco.asc())
-        elif ordenar == 'preco_desc':
-            produtos = produtos.order_by(Product.preco.desc())
-        elif ordenar == 'estoque':
-            produtos = produtos.order_by(Product.estoque.desc())
-        else:  # nome
-            produtos = produtos.order_by(Product.titulo.asc())
-        
-        produtos = produtos.all()
-        data = []
-        
-        for p in produtos:
-            avg = db.session.query(db.func.avg(Review.nota)).filter(Review.product_id == p.id).scalar() or 0
-            count = Review.query.filter_by(product_id=p.id).count()
-            imagem = p.imagem.replace('imagens/', '') if p.imagem and p.imagem.startswith('imagens/') else (p.imagem or '')
+        if resultado is None:
+            data, proximo = CatalogHelper.page_products(
+                db, Product, query, preco_min, preco_max, ordenar,
+                fields=fields, limit=limit, cursor=cursor
+            )
             
-            data.append({
-                "id": p.id,
-                "titulo": p.titulo,
-                "descricao": p.descricao,
-                "preco": p.preco,
-                "imagem": imagem,
-                "estoque": p.estoque,
-                "media": round(float(avg), 2),
-                "n_reviews": count
-            })
+            # Nada com o texto exato: tenta tolerando erros de digitação
+            aproximada = bool(query) and not data
+            if aproximada:
+                data, proximo = CatalogHelper.page_products(
+                    db, Product, query, preco_min, preco_max, ordenar,
+                    fields=fields, limit=limit, cursor=cursor, fuzzy=True
+                )
+            
+            if facetas:
+                payload = {
+                    "itens": data,
+                    "proximo_cursor": proximo,
+                    "facetas": CatalogHelper.facets(db, Product, query, preco_min, preco_max, aproximada)
+                }
+            else:
+                payload = page_payload(data, limit, proximo)
+            
+            resultado = (current_app.json.dumps(payload).encode('utf-8'), len(data), aproximada)
+            search_cache.set(chave, versao, resultado)
         
-        logger.info(f"Busca de produtos - Query: '{query}' - {len(data)} resultados")
-        return jsonify(data)
+        body, total, aproximada = resultado
+        logger.info(f"Busca de produtos - Query: '{query}' - {total} resultados"
+                    f"{' (aproximada)' if aproximada else ''}")
+        
+        # Páginas seguintes são a mesma busca: registra só a primeira
+        if cursor is None:
+            search_analytics.record(query, preco_min, preco_max, ordenar, total,
+                                    (time.perf_counter() - inicio) * 1000,
+                                    aproximada=aproximada, cache=do_cache)
         
+        response = current_app.response_class(body, mimetype='application/json')
+        if aproximada:
+            response.headers['X-Busca-Aproximada'] = '1'
+        return response
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao buscar produtos: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao buscar produtos"}), 500
@@ -237,9 +602,21 @@ def api_products_search():
 @products_bp.route('/carrinho/add/<int:id>', methods=['POST'])
 def carrinho_add(id):
     """Adiciona produto ao carrinho"""
-    from app.utils import Validator
+    from app.helpers import CartHelper
     
     try:
+        if 'user_id' in session:
+            # Usuário logado - um único INSERT ... ON CONFLICT com trava de estoque
+            user_id = session['user_id']
+            sucesso, mensagem = CartHelper.add_quantity(db, CartItem, Product, user_id, id)
+            if not sucesso:
+                logger.warning(f"Produto não adicionado ao carrinho (DB) - User: {user_id}, Produto: {id}: {mensagem}")
+                return mensagem, 404 if mensagem == "Produto não encontrado" else 400
+            
+            db.session.commit()
+            logger.info(f"Produto adicionado ao carrinho (DB) - User: {user_id}, Produto: {id}")
+            return "OK (db)", 200
+        
         produto = Product.query.get(id)
         if not produto:
             logger.warning(f"Tentativa de adicionar produto inexistente ao carrinho: ID {id}")
@@ -250,39 +627,22 @@ def carrinho_add(id):
             logger.warning(f"Tentativa de adicionar produto esgotado: ID {id}")
             return "Produto esgotado", 400
 
-        if 'user_id' in session:
-            # Usuário logado - salva no banco
-            user_id = session['user_id']
-            item = CartItem.query.filter_by(user_id=user_id, product_id=id).first()
-            
-            quantidade_atual = item.quantity if item else 0
-            if quantidade_atual + 1 > produto.estoque:
-                return "Estoque insuficiente", 400
-            
-            if item:
-                item.quantity += 1
-            else:
-                db.session.add(CartItem(user_id=user_id, product_id=id, quantity=1))
-            
-            db.session.commit()
-            logger.info(f"Produto adicionado ao carrinho (DB) - User: {user_id}, Produto: {id}")
-            return "OK (db)", 200
-        else:
-            # Visitante - salva na sessão
-            carrinho = session.get('cart', {})
-            quantidade_atual = carrinho.get(str(id), 0)
-            
-            if quantidade_atual + 1 > produto.estoque:
-                return "Estoque insuficiente", 400
-            
-            carrinho[str(id)] = quantidade_atual + 1
-            session['cart'] = carrinho
-            session.modified = True
-            
-            logger.info(f"Produto adicionado ao carrinho (sessão) - Produto: {id}")
-            return "OK (sessão)", 200
+        # Visitante - salva na sessão
+        carrinho = session.get('cart', {})
+        quantidade_atual = carrinho.get(str(id), 0)
+        
+        if quantidade_atual + 1 > produto.estoque:
+            return "Estoque insuficiente", 400
+        
+        carrinho[str(id)] = quantidade_atual + 1
+        session['cart'] = carrinho
+        session.modified = True
+        
+        logger.info(f"Produto adicionado ao carrinho (sessão) - Produto: {id}")
+        return "OK (sessão)", 200
             
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Erro ao adicionar produto {id} ao carrinho: {str(e)}", exc_info=True)
         return "Erro ao adicionar ao carrinho", 500
 
@@ -290,41 +650,24 @@ def carrinho_add(id):
 @products_bp.route("/carrinho")
 def ver_carrinho():
     """Página do carrinho de compras"""
+    from app.helpers import CartHelper
+    
     try:
         produtos, total = [], 0
         
-        if 'user_id' in session:
-            # Carrinho do banco de dados
-            user_id = session['user_id']
-            for item in CartItem.query.filter_by(user_id=user_id).all():
-                p = item.product
-                if p:
-                    subtotal = p.preco * item.quantity
-                    total += subtotal
-                    produtos.append({
-                        "id": p.id,
-                        "titulo": p.titulo,
-                        "preco": p.preco,
-                        "quantidade": item.quantity,
-                        "subtotal": subtotal,
-                        "imagem": p.imagem
-                    })
-        else:
-            # Carrinho da sessão
-            carrinho = session.get('cart', {})
-            for pid, qtd in carrinho.items():
-                p = Product.query.get(int(pid))
-                if p:
-                    subtotal = p.preco * qtd
-                    total += subtotal
-                    produtos.append({
-                        "id": p.id,
-                        "titulo": p.titulo,
-                        "preco": p.preco,
-                        "quantidade": qtd,
-                        "subtotal": subtotal,
-                        "imagem": p.imagem
-                    })
+        # Banco (logado) ou sessão (visitante): produtos numa única consulta
+        for p, qtd in CartHelper.cart_lines(db, CartItem, Product):
+            subtotal = p.preco * qtd
+            total += subtotal
+            produtos.append({
+                "id": p.id,
+                "titulo": p.titulo,
+                "preco": p.preco,
+                "quantidade": qtd,
+                "subtotal": subtotal,
+                "imagem": p.imagem,
+                "imagens": p.imagens or []
+            })
         
         logger.info(f"Carrinho visualizado - Total: R$ {total:.2f} - {len(produtos)} itens")
         return render_template("carrinho.html", produtos=produtos, total=total)
@@ -337,20 +680,18 @@ def ver_carrinho():
 @products_bp.route('/carrinho/update/<int:id>/<string:acao>', methods=['POST'])
 def carrinho_update(id, acao):
     """Atualiza quantidade de produto no carrinho"""
+    from app.helpers import CartHelper
+    
     try:
         if 'user_id' in session:
             user_id = session['user_id']
-            item = CartItem.query.filter_by(user_id=user_id, product_id=id).first()
             
             if acao == 'add':
-                if item:
-                    item.quantity += 1
-                else:
-                    db.session.add(CartItem(user_id=user_id, product_id=id, quantity=1))
-            elif acao == 'sub' and item:
-                item.quantity -= 1
-                if item.quantity <= 0:
-                    db.session.delete(item)
+                sucesso, mensagem = CartHelper.add_quantity(db, CartItem, Product, user_id, id)
+                if not sucesso:
+                    return mensagem, 404 if mensagem == "Produto não encontrado" else 400
+            elif acao == 'sub':
+                CartHelper.subtract_quantity(db, CartItem, user_id, id)
             
             db.session.commit()
             logger.info(f"Carrinho atualizado (DB) - User: {user_id}, Produto: {id}, Ação: {acao}")
@@ -373,6 +714,7 @@ def carrinho_update(id, acao):
             return "OK", 200
             
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Erro ao atualizar carrinho - Produto: {id}, Ação: {acao}: {str(e)}", exc_info=True)
         return "Erro ao atualizar carrinho", 500
 
@@ -401,24 +743,66 @@ def carrinho_remove(id):
         return "Erro ao remover do carrinho", 500
 
 
+def cart_state():
+    """Carrinho atual no formato de /api/carrinho (uma consulta)"""
+    from app.helpers import CartHelper
+    
+    itens, total = [], 0
+    for p, qtd in CartHelper.cart_lines(db, CartItem, Product):
+        itens.append({"produto_id": p.id, "quantidade": qtd})
+        total += p.preco * qtd
+    return {"itens": itens, "total": round(total, 2)}
+
+
 @products_bp.route("/api/carrinho")
 def api_carrinho():
-    """API que retorna o conteúdo atual do carrinho"""
+    """
+    API que retorna o conteúdo atual do carrinho.
+    
+    Produtos que saíram do catálogo não aparecem (o carrinho é conferido
+    com uma única consulta).
+    """
     try:
-        if 'user_id' in session:
-            user_id = session['user_id']
-            itens = CartItem.query.filter_by(user_id=user_id).all()
-            return jsonify({
-                "itens": [
-                    {"produto_id": i.product_id, "quantidade": i.quantity}
-                    for i in itens
-                ]
-            })
-        else:
-            carrinho = session.get("cart", {})
-            itens = [{"produto_id": int(k), "quantidade": v} for k, v in carrinho.items()]
-            return jsonify({"itens": itens})
+        return jsonify(cart_state())
             
     except Exception as e:
         logger.error(f"Erro ao obter carrinho via API: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao carregar carrinho"}), 500
+
+
+@products_bp.route("/api/carrinho/batch", methods=["POST"])
+def api_carrinho_batch():
+    """
+    Aplica várias alterações ao carrinho numa única transação.
+    
+    Corpo: {"operacoes": [{"produto_id": 1, "acao": "set|add|sub|remove",
+    "quantidade": 2}, ...]}, aplicadas na ordem enviada. O estoque de todos
+    os produtos é conferido com uma consulta; se algum ficaria acima do
+    estoque nada é aplicado (409, detalhes em "produtos"). Responde com o
+    carrinho atualizado, no formato de GET /api/carrinho.
+    
+    Feito para a página do carrinho acumular cliques e enviar uma vez.
+    """
+    from app.helpers import CartHelper
+    
+    try:
+        dados = request.get_json(silent=True) or {}
+        operacoes = CartHelper.parse_batch(dados.get('operacoes'))
+        
+        erros = CartHelper.apply_batch(db, CartItem, Product, operacoes)
+        if erros:
+            db.session.rollback()
+            logger.warning(f"Carrinho em lote recusado - User: {session.get('user_id')}: {erros}")
+            return jsonify({"error": "Estoque insuficiente para a alteração", "produtos": erros}), 409
+        
+        db.session.commit()
+        logger.info(f"Carrinho atualizado em lote - User: {session.get('user_id')}, "
+                    f"{len(operacoes)} operações")
+        return jsonify(cart_state())
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao atualizar carrinho em lote: {str(e)}", exc_info=True)
+        return jsonify({"error": "Erro ao atualizar carrinho"}), 500
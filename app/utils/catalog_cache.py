@@ -0,0 +1,172 @@
+# ============================================
+# catalog_cache.py — Versão e Cache do Catálogo
+# ============================================
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class CatalogVersion:
+    """
+    Contador de versão do catálogo compartilhado entre workers.
+
+    A versão é o tamanho de um arquivo em instance/: cada alteração do
+    catálogo acrescenta 1 byte (append é atômico entre processos), então
+    o contador só cresce e ler a versão custa um os.stat(), sem banco.
+    """
+
+    def __init__(self, path=None):
+        self.path = None
+        self._local = 0  # Fallback em memória quando não há arquivo configurado
+        if path:
+            self.configure(path)
+
+    def configure(self, path):
+        """Define o arquivo de versão (cria o diretório se necessário)"""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def current(self):
+        """Retorna a versão atual do catálogo"""
+        if self.path is None:
+            return self._local
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        """Incrementa a versão. Chamar DEPOIS do commit da alteração."""
+        if self.path is None:
+            self._local += 1
+            return
+        with open(self.path, 'ab') as f:
+            f.write(b'.')
+
+
+class CatalogCache:
+    """
+    Cache em memória (por worker) de respostas JSON já serializadas.
+
+    Cada entrada guarda a versão do catálogo em que foi gerada; se a versão
+    mudou, a entrada é descartada e reconstruída.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Retorna (body, etag) se houver entrada para esta versão"""
+        entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            return entry[1], entry[2]
+        return None
+
+    def get_or_build(self, key, version, builder):
+        """
+        Retorna (body, etag) da versão atual, gerando com builder() se preciso.
+
+        Args:
+            builder: função sem argumentos que retorna os bytes do JSON
+        """
+        cached = self.get(key, version)
+        if cached:
+            return cached
+
+        body = builder()
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self._entries[key] = (version, body, etag)
+        return body, etag
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._entries.clear()
+
+
+class SearchCache:
+    """
+    Cache LRU + TTL (por worker) de respostas da busca já serializadas.
+
+    A chave são os parâmetros normalizados da busca; cada entrada guarda a
+    versão do catálogo em que foi gerada e vale até `ttl` segundos. Acima
+    de `max_entries`, sai a menos usada. Contadores de acertos/faltas vão
+    para /diagnostico.
+    """
+
+    def __init__(self, max_entries=256, ttl=60):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.configure(max_entries, ttl)
+
+    def configure(self, max_entries, ttl):
+        """Define tamanho máximo (0 desliga o cache) e validade em segundos"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clear()
+
+    @staticmethod
+    def make_key(q, preco_min, preco_max, ordenar, **extra):
+        """
+        Chave normalizada: texto em minúsculas com espaços colapsados,
+        preços como float e os demais parâmetros (página, fields...) ordenados.
+        """
+        texto = ' '.join((q or '').lower().split())
+        precos = tuple(None if p is None else float(p) for p in (preco_min, preco_max))
+        return (texto, precos, ordenar, tuple(sorted(extra.items())))
+
+    def get(self, key, version):
+        """Retorna o valor guardado para esta versão do catálogo (ou None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                del self._entries[key]  # versão antiga ou expirada
+            self.misses += 1
+            return None
+
+    def set(self, key, version, value):
+        """Guarda um valor; descarta a entrada menos usada se passar do limite"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Contadores do worker atual"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._entries),
+                "max_entradas": self.max_entries,
+                "ttl": self.ttl,
+                "acertos": self.hits,
+                "faltas": self.misses,
+                "descartes": self.evictions,
+                "taxa_acerto": round(self.hits / total, 3) if total else 0
+            }
+
+    def clear(self):
+        """Remove todas as entradas e zera os contadores"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+# Instâncias compartilhadas (configuradas no application.py)
+catalog_version = CatalogVersion()
+catalog_cache = CatalogCache()
+search_cache = SearchCache()
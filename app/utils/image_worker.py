@@ -0,0 +1,186 @@
+# ============================================
+# image_worker.py — Processamento de Imagens em Background
+# ============================================
+
+"""
+Pool limitado de threads que processa os uploads de imagem (ImageJob)
+fora da requisição do admin.
+
+O admin grava o original, cria o ImageJob na mesma transação do produto
+e só então enfileira o id. O job é "reservado" com um UPDATE condicional
+(status pendente -> processando), então vários workers do gunicorn podem
+retomar os mesmos pendentes sem processar duas vezes.
+
+O pool é criado sob demanda em cada processo: com `gunicorn --preload`
+o app é importado antes do fork e threads não sobrevivem ao fork.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+class ImageWorker:
+    """Executor de ImageJobs (um pool por processo)"""
+
+    MAX_TENTATIVAS = 3
+    # Job em 'processando' há mais tempo que isso é de um processo que morreu
+    STALE_AFTER = timedelta(minutes=10)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._futures = set()
+        self.app = None
+
+    def configure(self, app, db, Product, ImageJob, upload_folder, logger=None, max_workers=2):
+        """Define as dependências; o pool só é criado no primeiro uso"""
+        self.app = app
+        self.db = db
+        self.Product = Product
+        self.ImageJob = ImageJob
+        self.upload_folder = upload_folder
+        self.logger = logger
+        self.max_workers = max_workers
+
+    @property
+    def configured(self):
+        return self.app is not None
+
+    # ----------------------------------------
+    # Pool
+    # ----------------------------------------
+
+    def _pool(self):
+        """Pool do processo atual; na 1ª chamada do processo retoma os pendentes"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._executor, False
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='image-worker')
+            self._pid = os.getpid()
+            self._futures = set()
+            return self._executor, True
+
+    def ensure_started(self):
+        """Garante o pool neste processo (e retoma jobs pendentes na 1ª vez)"""
+        if not self.configured:
+            return
+        _, novo = self._pool()
+        if novo:
+            self.resume_pending()
+
+    def submit(self, job_id):
+        """Enfileira um ImageJob já gravado no banco"""
+        executor, novo = self._pool()
+        future = executor.submit(self._run, job_id)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        if novo:
+            self.resume_pending()
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def wait(self, timeout=None):
+        """Aguarda os jobs enfileirados neste processo (scripts e testes)"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def resume_pending(self):
+        """Enfileira jobs pendentes, com erro (com tentativas restantes) ou travados"""
+        ImageJob = self.ImageJob
+        with self.app.app_context():
+            try:
+                # Volta para a fila quem falhou (com tentativas restantes) ou travou;
+                # o UPDATE é condicional para não reabrir jobs que terminaram agora
+                limite = datetime.utcnow() - self.STALE_AFTER
+                self.db.session.query(ImageJob).filter(
+                    self.db.or_(
+                        self.db.and_(ImageJob.status == 'erro',
+                                     ImageJob.tentativas < self.MAX_TENTATIVAS),
+                        self.db.and_(ImageJob.status == 'processando',
+                                     ImageJob.updated_at < limite)
+                    )
+                ).update({ImageJob.status: 'pendente'}, synchronize_session=False)
+                self.db.session.commit()
+
+                ids = [
+                    job_id for (job_id,) in self.db.session.query(ImageJob.id)
+                    .filter(ImageJob.status == 'pendente').order_by(ImageJob.id)
+                ]
+            except Exception as e:
+                self.db.session.rollback()
+                if self.logger:
+                    self.logger.error(f"❌ Erro ao retomar processamento de imagens: {e}")
+                return 0
+
+        for job_id in ids:
+            self.submit(job_id)
+        if ids and self.logger:
+            self.logger.info(f"🖼️ {len(ids)} processamentos de imagem retomados")
+        return len(ids)
+
+    # ----------------------------------------
+    # Execução
+    # ----------------------------------------
+
+    def _run(self, job_id):
+        from app.helpers import ImageHelper, ChangeFeed
+        from app.utils.catalog_cache import catalog_version
+
+        db, ImageJob, Product = self.db, self.ImageJob, self.Product
+        with self.app.app_context():
+            try:
+                # Reserva o job: só um worker/processo consegue mudar de 'pendente'
+                reservado = db.session.query(ImageJob).filter(
+                    ImageJob.id == job_id, ImageJob.status == 'pendente'
+                ).update({
+                    ImageJob.status: 'processando',
+                    ImageJob.tentativas: ImageJob.tentativas + 1,
+                    ImageJob.updated_at: datetime.utcnow()
+                }, synchronize_session=False)
+                db.session.commit()
+                if not reservado:
+                    return
+
+                job = db.session.get(ImageJob, job_id)
+                resultado = ImageHelper.process_image(self.upload_folder, job.arquivo) or {}
+
+                # Só aplica se o produto ainda usa esta imagem (pode ter sido trocada)
+                atualizados = db.session.query(Product).filter(
+                    Product.id == job.product_id, Product.imagem == f"imagens/{job.arquivo}"
+                ).update({
+                    Product.imagens: resultado.get('imagens'),
+                    Product.cor_dominante: resultado.get('cor_dominante'),
+                    Product.miniatura: resultado.get('miniatura')
+                }, synchronize_session=False)
+                if atualizados:
+                    ChangeFeed.record(db, [job.product_id])
+                job.status = 'concluido'
+                job.erro = None
+                db.session.commit()
+
+                if atualizados:
+                    catalog_version.bump()
+                if self.logger:
+                    self.logger.info(f"🖼️ Imagem processada - Job {job_id}, Produto {job.product_id}")
+            except Exception as e:
+                db.session.rollback()
+                db.session.query(ImageJob).filter(ImageJob.id == job_id).update(
+                    {ImageJob.status: 'erro', ImageJob.erro: str(e)[:1000]}, synchronize_session=False
+                )
+                db.session.commit()
+                if self.logger:
+                    self.logger.error(f"❌ Erro ao processar imagem - Job {job_id}: {e}", exc_info=True)
+
+
+# Instância única por processo
+image_worker = ImageWorker()
@@ -0,0 +1,57 @@
+# ============================================
+# json_provider.py — Serialização JSON da Aplicação
+# ============================================
+
+"""
+Provider JSON do Flask (jsonify, request.get_json, app.json.dumps).
+
+Usa o orjson quando instalado e cai no json da stdlib caso contrário.
+Nos dois casos datas/datetimes saem em ISO 8601, então os to_dict dos
+models podem devolver os objetos datetime direto.
+"""
+
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider com orjson (se disponível) e datas em ISO 8601"""
+
+    # Chaves na ordem de inserção: os dicts das APIs já saem montados na ordem certa
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        """Tipos que o json não serializa sozinho"""
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    @property
+    def backend(self):
+        """Nome do encoder em uso ('orjson' ou 'json')"""
+        return 'orjson' if orjson is not None else 'json'
+
+    def dumps(self, obj, **kwargs):
+        # indent (modo debug) e outras opções ficam com a stdlib
+        if orjson is not None and set(kwargs) <= {'separators'}:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+            except TypeError:
+                pass  # ex: inteiro maior que 64 bits — a stdlib resolve
+
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
@@ -0,0 +1,159 @@
+# ============================================
+# search_analytics.py — Registro das Buscas em Lote
+# ============================================
+
+"""
+Captura estruturada das buscas de /api/products/search (termo, filtros,
+resultados, latência) sem gravar no banco durante a requisição.
+
+A rota só acrescenta o evento a um buffer em memória do processo. Uma
+thread por processo grava o buffer na tabela search_event com um único
+INSERT em lote, a cada `interval` segundos ou assim que o buffer chega a
+`flush_size` eventos. Se o banco ficar fora do ar o buffer é limitado a
+`max_buffer` eventos (os mais antigos são descartados): analytics nunca
+derruba nem atrasa a busca.
+
+Como o pool de imagens, a thread é criada sob demanda em cada processo
+(com `gunicorn --preload` threads não sobrevivem ao fork).
+"""
+
+import atexit
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class SearchAnalytics:
+    """Buffer de eventos de busca com gravação em lote (uma thread por processo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer = deque()
+        self._pid = None
+        self._descartados = 0
+        self.app = None
+
+    def configure(self, app, db, SearchEvent, logger=None, interval=10.0, flush_size=200, max_buffer=10000):
+        """Define as dependências; a thread só é criada no primeiro evento"""
+        self.app = app
+        self.db = db
+        self.SearchEvent = SearchEvent
+        self.logger = logger
+        self.interval = interval
+        self.flush_size = flush_size
+        with self._lock:
+            self._buffer = deque(self._buffer, maxlen=max_buffer)
+
+    @property
+    def configured(self):
+        return self.app is not None
+
+    @staticmethod
+    def normalize(q):
+        """Termo como agrupado nos relatórios ("  Mel  Silvestre" -> "mel silvestre")"""
+        return ' '.join(q.lower().split())[:200]
+
+    # ----------------------------------------
+    # Captura (caminho da requisição: só memória)
+    # ----------------------------------------
+
+    def record(self, q, preco_min, preco_max, ordenar, resultados, latencia_ms,
+               aproximada=False, cache=False):
+        """Acrescenta uma busca ao buffer (sem acesso ao banco)"""
+        if not self.configured:
+            return
+        evento = {
+            "termo": self.normalize(q),
+            "preco_min": preco_min,
+            "preco_max": preco_max,
+            "ordenar": (ordenar or '')[:20],  # cabe em String(20): não derruba o lote
+            "resultados": resultados,
+            "aproximada": aproximada,
+            "cache": cache,
+            "latencia_ms": round(latencia_ms, 2),
+            "created_at": datetime.utcnow()
+        }
+        self._ensure_thread()
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._descartados += 1
+            self._buffer.append(evento)
+            cheio = len(self._buffer) >= self.flush_size
+        if cheio:
+            self._wake.set()
+
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    def stats(self):
+        """Eventos aguardando gravação e descartados (buffer cheio) neste processo"""
+        return {"pendentes": len(self._buffer), "descartados": self._descartados}
+
+    # ----------------------------------------
+    # Gravação em lote
+    # ----------------------------------------
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._buffer.clear()
+            threading.Thread(target=self._loop, name='search-analytics', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"❌ Erro ao gravar buscas: {e}", exc_info=True)
+
+    def flush(self):
+        """
+        Grava todo o buffer com um INSERT em lote.
+
+        Se a gravação falha os eventos são descartados (e logados): o
+        buffer não cresce sem limite enquanto o banco está fora.
+
+        Returns:
+            int: eventos gravados
+        """
+        with self._lock:
+            if not self._buffer or not self.configured:
+                return 0
+            eventos = list(self._buffer)
+            self._buffer.clear()
+
+        with self.app.app_context():
+            try:
+                # INSERT do Core: um único executemany (o bulk do ORM separa
+                # as linhas por filtros nulos/preenchidos)
+                self.db.session.execute(self.SearchEvent.__table__.insert(), eventos)
+                self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                self._descartados += len(eventos)
+                if self.logger:
+                    self.logger.error(f"❌ {len(eventos)} buscas não gravadas: {e}", exc_info=True)
+                return 0
+        return len(eventos)
+
+    def clear(self):
+        """Descarta os eventos pendentes e a configuração (testes)"""
+        with self._lock:
+            self._buffer.clear()
+            self._descartados = 0
+            self.app = None
+
+
+# Instância única por processo
+search_analytics = SearchAnalytics()
+
+# Grava o que sobrou quando o processo (worker) termina normalmente
+atexit.register(search_analytics.flush)
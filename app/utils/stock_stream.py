@@ -0,0 +1,170 @@
+# ============================================
+# stock_stream.py — Pub/Sub de Estoque e Preço (SSE)
+# ============================================
+
+"""
+Distribui alterações de estoque/preço para as conexões SSE abertas
+(/api/products/stream) de um processo.
+
+Uma única thread por processo acompanha o feed de alterações do catálogo
+(ChangeFeed) e repassa para a fila de cada assinante. O canal entre os
+workers do gunicorn é o próprio banco + o arquivo de versão do catálogo:
+a cada tick a thread só faz os.stat() na versão e consulta o feed quando
+ela mudou. Assinantes não usam conexão com o banco enquanto esperam.
+
+Como o pool de imagens, a thread é criada sob demanda em cada processo
+(com `gunicorn --preload` threads não sobrevivem ao fork).
+"""
+
+import os
+import queue
+import threading
+import time
+
+
+class StockStream:
+    """Assinaturas de estoque/preço por produto (uma thread de polling por processo)"""
+
+    FIELDS = ('id', 'preco', 'estoque')
+    QUEUE_SIZE = 100  # Eventos pendentes por assinante; cliente lento perde os excedentes
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # fila -> set(product_id)
+        self._pid = None
+        self._seq = None
+        self._versao = None
+        self.app = None
+
+    def configure(self, app, db, Product, CatalogChange, logger=None, interval=2.0, max_clients=2):
+        """Define as dependências; a thread só é criada na primeira assinatura"""
+        self.app = app
+        self.db = db
+        self.Product = Product
+        self.CatalogChange = CatalogChange
+        self.logger = logger
+        self.interval = interval
+        self.max_clients = max_clients
+
+    @property
+    def configured(self):
+        return self.app is not None
+
+    # ----------------------------------------
+    # Assinaturas
+    # ----------------------------------------
+
+    def subscribe(self, product_ids):
+        """
+        Registra um assinante para os produtos (chamar dentro do app context).
+
+        Returns:
+            queue.Queue | None: fila de eventos, ou None se o processo já
+            atingiu max_clients
+        """
+        from app.helpers import ChangeFeed
+
+        self._ensure_thread()
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            if self._seq is None:
+                # Ponto de partida: o que mudar a partir de agora
+                self._versao = self._catalog_version()
+                self._seq = ChangeFeed.current_seq(self.db, self.CatalogChange)
+            fila = queue.Queue(maxsize=self.QUEUE_SIZE)
+            self._subscribers[fila] = set(product_ids)
+            return fila
+
+    def unsubscribe(self, fila):
+        """Remove o assinante; sem assinantes a thread para de consultar o feed"""
+        with self._lock:
+            self._subscribers.pop(fila, None)
+            if not self._subscribers:
+                self._seq = None
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, eventos):
+        """Entrega cada evento ({"id", ...}) às filas inscritas naquele produto"""
+        with self._lock:
+            assinantes = list(self._subscribers.items())
+        for fila, ids in assinantes:
+            for evento in eventos:
+                if evento['id'] in ids:
+                    try:
+                        fila.put_nowait(evento)
+                    except queue.Full:
+                        pass
+
+    # ----------------------------------------
+    # Polling do feed
+    # ----------------------------------------
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._subscribers = {}
+            self._seq = None
+            threading.Thread(target=self._loop, name='stock-stream', daemon=True).start()
+
+    def _catalog_version(self):
+        from app.utils.catalog_cache import catalog_version
+        return catalog_version.current()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"❌ Erro ao acompanhar estoque: {e}", exc_info=True)
+
+    def poll(self):
+        """
+        Um tick: se a versão do catálogo mudou, lê o feed desde o último seq
+        e publica estoque/preço dos produtos alterados.
+
+        Returns:
+            int: eventos publicados
+        """
+        from app.helpers import ChangeFeed
+
+        with self._lock:
+            seq = self._seq
+        if seq is None:
+            return 0
+        versao = self._catalog_version()
+        if versao == self._versao:
+            return 0
+
+        eventos = []
+        with self.app.app_context():
+            try:
+                mais = True
+                while mais:
+                    lote = ChangeFeed.changes_since(self.db, self.Product, self.CatalogChange,
+                                                    seq, fields=self.FIELDS)
+                    eventos += lote['itens']
+                    eventos += [{"id": pid, "removido": True} for pid in lote['removidos']]
+                    seq, mais = lote['seq'], lote['mais']
+            except LookupError:
+                # Feed limpo no meio do caminho: recomeça do seq atual
+                seq = ChangeFeed.current_seq(self.db, self.CatalogChange)
+
+        with self._lock:
+            if self._seq is None:  # todos saíram durante a consulta
+                return 0
+            self._seq, self._versao = seq, versao
+
+        self.publish(eventos)
+        return len(eventos)
+
+
+# Instância única por processo
+stock_stream = StockStream()
@@ -0,0 +1,102 @@
+# ============================================
+# suggest_index.py — Índice de Prefixos para Autocompletar
+# ============================================
+
+"""
+Índice em memória (por worker) dos títulos de produtos para
+/api/products/suggest.
+
+Cada título normalizado (minúsculas, sem acentos) entra uma vez por
+início de palavra — "mel silvestre" gera "mel silvestre" e "silvestre" —
+numa lista ordenada. Um prefixo vira um bisect + varredura das chaves
+que começam com ele: nada de banco a cada tecla.
+
+O índice guarda a versão do catálogo em que foi montado e só é
+reconstruído quando ela muda (ler a versão custa um os.stat()).
+"""
+
+import bisect
+import threading
+
+
+class SuggestIndex:
+    """Lista ordenada de (chave, produto) com busca por prefixo"""
+
+    MAX_SCAN = 200  # Chaves examinadas por consulta (prefixos muito curtos)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (chaves ordenadas, entradas (id, titulo, posição da palavra) alinhadas);
+        # trocado inteiro a cada rebuild para leitores sem lock
+        self._dados = ([], [])
+
+    @staticmethod
+    def normalize(text):
+        """Palavras sem acento, separadas por um espaço ("Mel  Silvéstre" -> "mel silvestre")"""
+        from app.helpers import SearchIndex
+        return ' '.join(SearchIndex.tokens(text))
+
+    def build(self, produtos):
+        """Monta o índice a partir de (id, titulo)"""
+        itens = []
+        for product_id, titulo in produtos:
+            palavras = self.normalize(titulo).split(' ')
+            for posicao in range(len(palavras)):
+                chave = ' '.join(palavras[posicao:])
+                if chave:
+                    itens.append((chave, product_id, titulo, posicao))
+        itens.sort()
+        self._dados = ([i[0] for i in itens], [i[1:] for i in itens])
+
+    def ensure(self, version, loader):
+        """
+        Reconstrói com loader() se o índice é de outra versão do catálogo.
+
+        Args:
+            loader: função sem argumentos que retorna [(id, titulo)]
+        """
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self.build(loader())
+                self._version = version
+
+    def suggest(self, q, limit=8):
+        """
+        Produtos cujo título (ou alguma palavra dele em diante) começa com q.
+
+        Títulos que começam com o prefixo vêm antes; depois ordem alfabética.
+
+        Returns:
+            list: [{"id", "titulo"}]
+        """
+        prefixo = self.normalize(q)
+        if not prefixo:
+            return []
+
+        chaves, entradas = self._dados
+        inicio = bisect.bisect_left(chaves, prefixo)
+        fim = min(len(chaves), inicio + self.MAX_SCAN)
+
+        encontrados = {}
+        for i in range(inicio, fim):
+            if not chaves[i].startswith(prefixo):
+                break
+            product_id, titulo, posicao = entradas[i]
+            if product_id not in encontrados or posicao < encontrados[product_id][1]:
+                encontrados[product_id] = (titulo, posicao)
+
+        ordenados = sorted(encontrados.items(), key=lambda e: (e[1][1] > 0, e[1][0].lower(), e[0]))
+        return [{"id": product_id, "titulo": titulo} for product_id, (titulo, _) in ordenados[:limit]]
+
+    def clear(self):
+        """Descarta o índice (reconstruído na próxima consulta)"""
+        with self._lock:
+            self._version = None
+            self._dados = ([], [])
+
+
+# Instância compartilhada pelas threads do worker
+suggest_index = SuggestIndex()
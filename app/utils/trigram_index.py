@@ -0,0 +1,115 @@
+# ============================================
+# trigram_index.py — Índice de Trigramas (busca aproximada)
+# ============================================
+
+"""
+Índice invertido de trigramas em memória (por worker) das palavras dos
+títulos, usado na busca tolerante a erros de digitação quando o banco
+não tem pg_trgm (SQLite/desenvolvimento).
+
+Como no pg_trgm, cada palavra vira o conjunto de trigramas de
+"  palavra " e a similaridade é |comuns| / |união|. Só as palavras que
+compartilham algum trigrama com a consulta são examinadas (listas
+invertidas), nunca o catálogo inteiro.
+
+Reconstruído só quando a versão do catálogo muda, como o SuggestIndex.
+"""
+
+import threading
+from collections import Counter, defaultdict
+
+
+class TrigramIndex:
+    """Trigrama -> palavras -> produtos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (postings trigrama -> [palavra], trigramas por palavra, produtos por palavra);
+        # trocado inteiro a cada rebuild para leitores sem lock
+        self._dados = ({}, {}, {})
+
+    @staticmethod
+    def trigrams(palavra):
+        """Trigramas no formato do pg_trgm ("mel" -> {"  m", " me", "mel", "el "})"""
+        texto = f"  {palavra} "
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    def build(self, produtos):
+        """Monta o índice a partir de (id, titulo)"""
+        from app.helpers import SearchIndex
+
+        produtos_por_palavra = defaultdict(set)
+        for product_id, titulo in produtos:
+            for palavra in SearchIndex.tokens(titulo):
+                produtos_por_palavra[palavra].add(product_id)
+
+        postings = defaultdict(list)
+        trigramas = {}
+        for palavra in produtos_por_palavra:
+            trigramas[palavra] = TrigramIndex.trigrams(palavra)
+            for trigrama in trigramas[palavra]:
+                postings[trigrama].append(palavra)
+
+        self._dados = (dict(postings), trigramas, dict(produtos_por_palavra))
+
+    def ensure(self, version, loader):
+        """Reconstrói com loader() -> [(id, titulo)] se o índice é de outra versão"""
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self.build(loader())
+                self._version = version
+
+    def search(self, q, limiar, limit):
+        """
+        Produtos parecidos com q, do mais para o menos parecido.
+
+        Como na busca exata, toda palavra da consulta precisa casar (com
+        similaridade >= limiar) com alguma palavra do título; a nota do
+        produto é a média dessas similaridades.
+
+        Returns:
+            list: [(product_id, similaridade)] com similaridade >= limiar
+        """
+        from app.helpers import SearchIndex
+
+        palavras = SearchIndex.tokens(q)
+        if not palavras:
+            return []
+        postings, trigramas, produtos_por_palavra = self._dados
+
+        notas = defaultdict(float)
+        casadas = Counter()
+        for palavra in palavras:
+            consulta = TrigramIndex.trigrams(palavra)
+            comuns = Counter(p for t in consulta for p in postings.get(t, ()))
+
+            melhor = {}
+            for candidata, n in comuns.items():
+                similaridade = n / (len(consulta) + len(trigramas[candidata]) - n)
+                if similaridade < limiar:
+                    continue
+                for product_id in produtos_por_palavra[candidata]:
+                    if similaridade > melhor.get(product_id, 0):
+                        melhor[product_id] = similaridade
+            for product_id, similaridade in melhor.items():
+                notas[product_id] += similaridade / len(palavras)
+                casadas[product_id] += 1
+
+        encontrados = [
+            (pid, round(nota, 4)) for pid, nota in notas.items() if casadas[pid] == len(palavras)
+        ]
+        encontrados.sort(key=lambda e: (-e[1], e[0]))
+        return encontrados[:limit]
+
+    def clear(self):
+        """Descarta o índice (reconstruído na próxima consulta)"""
+        with self._lock:
+            self._version = None
+            self._dados = ({}, {}, {})
+
+
+# Instância compartilhada pelas threads do worker
+trigram_index = TrigramIndex()
@@ -226,6 +226,37 @@ class Validator:
         
         return len(errors) == 0, errors
     
+    @staticmethod
+    def validate_review_data(data: Dict[str, Any]) -> Tuple[bool, List[str]]:
+        """
+        Valida dados de avaliação.
+        
+        Args:
+            data: Dicionário com 'nota' (1 a 5) e 'comentario' (opcional)
+        
+        Returns:
+            Tupla (is_valid, lista_de_erros)
+        """
+        errors = []
+        
+        nota = data.get('nota')
+        if isinstance(nota, bool) or not isinstance(nota, (int, str)):
+            errors.append("Nota é obrigatória")
+        else:
+            try:
+                if int(nota) < 1 or int(nota) > 5:
+                    errors.append("Nota deve ser entre 1 e 5")
+            except ValueError:
+                errors.append("Nota deve ser um número inteiro")
+        
+        comentario = data.get('comentario')
+        if comentario is not None and not isinstance(comentario, str):
+            errors.append("Comentário inválido")
+        elif comentario and len(comentario.strip()) > 1000:
+            errors.append("Comentário muito longo (máx. 1000 caracteres)")
+        
+        return len(errors) == 0, errors
+    
     @staticmethod
     def sanitize_string(texto: str, max_length: int = None) -> str:
         """
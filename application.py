@@ -32,6 +32,10 @@ config_class = get_config(env)
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.config.from_object(config_class)
 
+# Serialização JSON (orjson se instalado, senão stdlib; datas em ISO 8601)
+from app.utils.json_provider import JSONProvider
+app.json = JSONProvider(app)
+
 # Garantir que SECRET_KEY está configurada
 if not app.config.get('SECRET_KEY'):
     import secrets
@@ -115,6 +119,14 @@ except Exception as e:
 from app.models import init_models
 
 User, Product, Order, OrderItem, Review, CartItem, Address, PaymentMethod = init_models(db)
+from app.models import ImageJob, CatalogChange, SearchEvent
+
+# ============================================
+# IMPORTAR E CONFIGURAR HELPERS
+# ============================================
+
+# Antes das tabelas: a inicialização abaixo usa os helpers (colunas novas, índices)
+from app.helpers import CartHelper, ImageHelper, OrderHelper, ReviewHelper, SearchIndex
 
 # ============================================
 # CRIAR TABELAS AUTOMATICAMENTE
@@ -154,19 +166,76 @@ with app.app_context():
             except Exception as e:
                 logger.error(f"❌ Erro ao criar admin: {e}")
         else:
+            # Cria só as tabelas novas (ex: image_job, catalog_change); colunas novas: abaixo
+            db.create_all()
             logger.info("ℹ️ Tabelas já existem no banco de dados")
     except Exception as e:
         logger.error(f"❌ Erro ao verificar/criar tabelas: {e}")
 
+# Colunas novas em tabelas existentes (create_all não altera tabelas). Antes do
+# índice de busca e de qualquer consulta que leia Product
+with app.app_context():
+    try:
+        if ImageHelper.ensure_columns(db):
+            logger.info("✅ Colunas de derivados de imagem criadas em product")
+        if ReviewHelper.ensure_columns(db, Product, Review):
+            logger.info("✅ Contadores de avaliações criados em product e recalculados")
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar colunas novas em product: {e}")
+
+# Uma avaliação por usuário e produto (bancos antigos: remove repetidas e cria o índice único)
+with app.app_context():
+    try:
+        removidas = ReviewHelper.ensure_unique_reviews(db, Product, Review)
+        if removidas:
+            logger.info(f"✅ Avaliações: {removidas} repetidas removidas e contadores recalculados")
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar índice único de avaliações: {e}")
+
+# Índice de busca textual (FTS5 no SQLite, tsvector/GIN no PostgreSQL)
+with app.app_context():
+    SearchIndex.init_app(db, Product, logger)
+
+# Uma linha por produto no carrinho (bancos antigos: junta repetidas e cria o índice único)
+with app.app_context():
+    try:
+        removidas = CartHelper.ensure_unique_lines(db, CartItem)
+        if removidas:
+            logger.info(f"✅ Carrinho: {removidas} linhas repetidas unificadas")
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar índice único do carrinho: {e}")
+
 # Configurar diretório de upload
 UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# ============================================
-# IMPORTAR E CONFIGURAR HELPERS
-# ============================================
-
-from app.helpers import CartHelper, OrderHelper
+# Versão do catálogo (invalida caches de todos os workers)
+from app.utils.catalog_cache import catalog_version, search_cache
+catalog_version.configure(app.config['CATALOG_VERSION_FILE'])
+search_cache.configure(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'])
+
+# Processamento de imagens em background (pool criado por processo, no 1º request)
+from app.utils.image_worker import image_worker
+image_worker.configure(app, db, Product, ImageJob, UPLOAD_FOLDER, logger,
+                       max_workers=app.config['IMAGE_WORKERS'])
+
+# Estoque/preço ao vivo via SSE (thread de polling criada por processo, na 1ª assinatura)
+from app.utils.stock_stream import stock_stream
+stock_stream.configure(app, db, Product, CatalogChange, logger,
+                       interval=app.config['STOCK_STREAM_INTERVAL'],
+                       max_clients=app.config['STOCK_STREAM_MAX_CLIENTS'])
+
+# Registro das buscas em lote (thread de gravação criada por processo, no 1º evento)
+from app.utils.search_analytics import search_analytics
+search_analytics.configure(app, db, SearchEvent, logger,
+                           interval=app.config['SEARCH_ANALYTICS_INTERVAL'],
+                           flush_size=app.config['SEARCH_ANALYTICS_FLUSH_SIZE'],
+                           max_buffer=app.config['SEARCH_ANALYTICS_MAX_BUFFER'])
+
+@app.before_request
+def start_image_worker():
+    """Retoma jobs de imagem pendentes (1ª requisição de cada processo)"""
+    image_worker.ensure_started()
 
 # ============================================
 # IMPORTAR SERVIÇO DE EMAIL
@@ -196,7 +265,10 @@ models_dict = {
     'Review': Review,
     'CartItem': CartItem,
     'Address': Address,
-    'PaymentMethod': PaymentMethod
+    'PaymentMethod': PaymentMethod,
+    'ImageJob': ImageJob,
+    'CatalogChange': CatalogChange,
+    'SearchEvent': SearchEvent
 }
 
 # Auth Blueprint
@@ -240,6 +312,14 @@ def security_headers(response):
     """Adiciona headers de segurança otimizados"""
     return apply_security_headers(response, app.config)
 
+
+@app.after_request
+def immutable_images(response):
+    """Imagens com hash do conteúdo no nome nunca mudam: cache de 1 ano"""
+    if response.status_code in (200, 304) and ImageHelper.is_content_addressed(request.path):
+        response.headers['Cache-Control'] = ImageHelper.IMMUTABLE_CACHE
+    return response
+
 # ============================================
 # EXECUÇÃO
 # ============================================
@@ -78,6 +78,28 @@ class Config:
     BACKUP_INCLUDE_LOGS = False  # Incluir logs (desabilitado por padrão)
     BACKUP_AUTO_CLEANUP = True  # Limpeza automática de backups antigos
     
+    # Catálogo (versão compartilhada entre workers para invalidar caches)
+    CATALOG_VERSION_FILE = INSTANCE_DIR / "catalog.version"
+    
+    # Cache de resultados da busca (por worker): entradas (0 desliga) e validade em segundos
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "60"))
+    
+    # Registro das buscas (buffer por worker gravado em lote na tabela search_event)
+    SEARCH_ANALYTICS_INTERVAL = float(os.getenv("SEARCH_ANALYTICS_INTERVAL", "10"))  # segundos entre gravações
+    SEARCH_ANALYTICS_FLUSH_SIZE = int(os.getenv("SEARCH_ANALYTICS_FLUSH_SIZE", "200"))  # grava antes ao atingir
+    SEARCH_ANALYTICS_MAX_BUFFER = int(os.getenv("SEARCH_ANALYTICS_MAX_BUFFER", "10000"))
+    
+    # Processamento de imagens em background (threads por processo)
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+    
+    # SSE de estoque/preço (/api/products/stream). Cada conexão ocupa uma
+    # thread do gunicorn até fechar: o limite por processo preserva as demais.
+    # Acima do limite (503) a página do produto faz polling de /api/products/changes
+    STOCK_STREAM_INTERVAL = float(os.getenv("STOCK_STREAM_INTERVAL", "2"))  # segundos entre ticks
+    STOCK_STREAM_MAX_CLIENTS = int(os.getenv("STOCK_STREAM_MAX_CLIENTS", "2"))
+    STOCK_STREAM_TTL = int(os.getenv("STOCK_STREAM_TTL", "300"))  # o navegador reconecta sozinho
+    
     # Rate Limiting (padrão)
     RATELIMIT_STORAGE_URL = "memory://"
     RATELIMIT_STRATEGY = "fixed-window"
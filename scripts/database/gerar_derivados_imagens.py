@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+gerar_derivados_imagens.py — Derivados de Imagens
+============================================
+
+Adiciona as colunas 'product.imagens', 'product.cor_dominante' e
+'product.miniatura' (se ainda não existirem; a aplicação também faz
+isso ao iniciar) e gera as versões redimensionadas (WebP + JPEG) e o
+placeholder (cor dominante + miniatura) das imagens de produtos já
+cadastrados. Produtos que já têm derivados e placeholder são pulados,
+a não ser com --todos.
+
+Requer Pillow (pip install Pillow).
+
+Uso:
+    python scripts/database/gerar_derivados_imagens.py
+    python scripts/database/gerar_derivados_imagens.py --todos
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from application import app, db, Product, UPLOAD_FOLDER
+from app.helpers import CatalogHelper, ChangeFeed, ImageHelper
+from app.utils.catalog_cache import catalog_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera derivados das imagens de produtos")
+    parser.add_argument("--todos", action="store_true", help="Regerar também quem já tem derivados")
+    args = parser.parse_args()
+
+    if not ImageHelper.is_available():
+        print("❌ Pillow não instalado (pip install Pillow)")
+        sys.exit(1)
+
+    print("🔄 Gerando derivados das imagens de produtos...")
+
+    with app.app_context():
+        try:
+            if ImageHelper.ensure_columns(db):
+                print("✅ Colunas de derivados criadas em 'product'")
+
+            query = Product.query.filter(Product.imagem.isnot(None), Product.imagem != '')
+            if not args.todos:
+                query = query.filter(db.or_(Product.imagens.is_(None), Product.miniatura.is_(None)))
+
+            gerados = 0
+            for p in query.all():
+                nome_arquivo = CatalogHelper.clean_image_path(p.imagem)
+                if not os.path.exists(os.path.join(UPLOAD_FOLDER, nome_arquivo)):
+                    print(f"⚠️  Produto {p.id}: arquivo não encontrado ({nome_arquivo})")
+                    continue
+                try:
+                    resultado = ImageHelper.process_image(UPLOAD_FOLDER, nome_arquivo)
+                    p.imagens = resultado['imagens']
+                    p.cor_dominante = resultado['cor_dominante']
+                    p.miniatura = resultado['miniatura']
+                except Exception as e:
+                    print(f"⚠️  Produto {p.id}: erro ao processar {nome_arquivo}: {e}")
+                    continue
+                # Clientes do feed (/api/products/changes) recebem os derivados novos
+                ChangeFeed.record(db, [p.id])
+                db.session.commit()
+                gerados += 1
+                print(f"✅ Produto {p.id}: {len(p.imagens)} derivados")
+
+            if gerados:
+                catalog_version.bump()
+            print(f"✅ {gerados} produtos processados")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erro ao gerar derivados: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+migrar_carrinho_unico.py — Uma Linha por Produto no Carrinho
+============================================
+
+Junta as linhas repetidas de cart_item (mesmo usuário e produto, criadas
+por duplo clique ou abas em paralelo) somando as quantidades na mais
+antiga, e cria o índice único (user_id, product_id) usado pelo
+INSERT ... ON CONFLICT do carrinho.
+
+A aplicação faz o mesmo ao iniciar; o script permite rodar antes do
+deploy e ver quantas linhas foram unificadas. Idempotente.
+
+Uso:
+    python scripts/database/migrar_carrinho_unico.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from application import app, db, CartItem
+from app.helpers import CartHelper
+
+
+def main():
+    print("🔄 Unificando linhas repetidas do carrinho...")
+
+    with app.app_context():
+        try:
+            removidas = CartHelper.ensure_unique_lines(db, CartItem)
+            print(f"✅ {removidas} linhas repetidas unificadas; índice {CartHelper.UNIQUE_INDEX} pronto")
+        except Exception as e:
+            print(f"❌ Erro ao migrar carrinho: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+migrar_imagens_hash.py — Imagens por Hash do Conteúdo
+============================================
+
+Migra as imagens dos produtos antigos (nome original do upload) para o
+armazenamento por hash do conteúdo usado nos novos uploads. Arquivos
+iguais passam a ser um arquivo só, e as URLs podem ir para cache
+imutável. Os derivados e o placeholder são regerados com o novo nome
+(se o Pillow estiver instalado).
+
+Rode antes scripts/database/gerar_derivados_imagens.py (cria as colunas
+de derivados/placeholder). Os arquivos antigos não são apagados; use
+--remover-antigos para removê-los quando nenhum produto os usar mais.
+Arquivos citados em templates/ ou static/ (ex.: imagens da página
+inicial e do "Sobre") nunca são removidos.
+
+Uso:
+    python scripts/database/migrar_imagens_hash.py
+    python scripts/database/migrar_imagens_hash.py --remover-antigos
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from application import app, db, Product, UPLOAD_FOLDER
+from app.helpers import CatalogHelper, ChangeFeed, ImageHelper
+from app.utils.catalog_cache import catalog_version
+
+# Arquivos de texto onde imagens podem ser referenciadas pelo nome
+EXTENSOES_REFERENCIA = ('.html', '.js', '.css', '.json', '.txt', '.svg', '.webmanifest')
+
+
+def referenciados_em_assets(nomes):
+    """Nomes de arquivo citados em algum template ou asset estático"""
+    citados = set()
+    for pasta in (ROOT_DIR / "templates", ROOT_DIR / "static"):
+        for arquivo in pasta.rglob("*"):
+            if not arquivo.is_file() or arquivo.suffix.lower() not in EXTENSOES_REFERENCIA:
+                continue
+            conteudo = arquivo.read_text(encoding="utf-8", errors="ignore")
+            citados.update(n for n in nomes if n in conteudo)
+    return citados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra imagens de produtos para nomes por hash")
+    parser.add_argument("--remover-antigos", action="store_true",
+                        help="Apagar os arquivos antigos que ficaram sem uso")
+    args = parser.parse_args()
+
+    print("🔄 Migrando imagens para armazenamento por hash...")
+
+    with app.app_context():
+        try:
+            antigos, migrados = set(), []
+            processados = {}
+
+            for p in Product.query.filter(Product.imagem.isnot(None), Product.imagem != '').all():
+                nome_antigo = CatalogHelper.clean_image_path(p.imagem)
+                if ImageHelper.is_content_addressed(f"/static/imagens/{nome_antigo}"):
+                    continue
+
+                caminho_antigo = os.path.join(UPLOAD_FOLDER, nome_antigo)
+                if not os.path.exists(caminho_antigo):
+                    print(f"⚠️  Produto {p.id}: arquivo não encontrado ({nome_antigo})")
+                    continue
+
+                nome = ImageHelper.content_name(ImageHelper.file_digest(caminho_antigo), nome_antigo)
+                caminho = os.path.join(UPLOAD_FOLDER, nome)
+                if not os.path.exists(caminho):
+                    shutil.copyfile(caminho_antigo, caminho)
+
+                if nome not in processados:
+                    try:
+                        processados[nome] = ImageHelper.process_image(UPLOAD_FOLDER, nome) or {}
+                    except Exception as e:
+                        print(f"⚠️  Produto {p.id}: erro ao gerar derivados de {nome}: {e}")
+                        processados[nome] = {}
+
+                p.imagem = f"imagens/{nome}"
+                p.imagens = processados[nome].get('imagens')
+                p.cor_dominante = processados[nome].get('cor_dominante')
+                p.miniatura = processados[nome].get('miniatura')
+                antigos.add(nome_antigo)
+                migrados.append(p.id)
+                print(f"✅ Produto {p.id}: {nome_antigo} → {nome}")
+
+            # Clientes do feed (/api/products/changes) recebem as URLs novas
+            ChangeFeed.record(db, migrados)
+            db.session.commit()
+            if migrados:
+                catalog_version.bump()
+            print(f"✅ {len(migrados)} produtos migrados ({len(processados)} arquivos distintos)")
+
+            if args.remover_antigos:
+                em_uso = {CatalogHelper.clean_image_path(i) for (i,) in db.session.query(Product.imagem)}
+                sem_produto = antigos - em_uso
+                em_templates = referenciados_em_assets(sem_produto)
+                for nome_antigo in sorted(em_templates):
+                    print(f"📌 Mantido (usado em templates/static): {nome_antigo}")
+                for nome_antigo in sorted(sem_produto - em_templates):
+                    os.remove(os.path.join(UPLOAD_FOLDER, nome_antigo))
+                    print(f"🗑️  Removido: {nome_antigo}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erro ao migrar imagens: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
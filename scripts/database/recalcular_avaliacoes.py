@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+recalcular_avaliacoes.py — Contadores de Avaliações
+============================================
+
+Adiciona as colunas de contadores de avaliações à tabela 'product'
+e o índice único (user_id, product_id) em 'review', removendo avaliações
+repetidas (se ainda não existirem; a aplicação também faz isso ao
+iniciar), e recalcula todos os contadores a partir da tabela 'review'.
+Necessário se avaliações forem alteradas direto no banco, fora da
+aplicação.
+
+Uso:
+    python scripts/database/recalcular_avaliacoes.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from application import app, db, Product, Review
+from app.helpers import ReviewHelper
+from app.utils.catalog_cache import catalog_version
+
+
+def main():
+    print("🔄 Recalculando contadores de avaliações...")
+
+    with app.app_context():
+        try:
+            if ReviewHelper.ensure_columns(db, Product, Review):
+                print("✅ Colunas de contadores criadas em 'product'")
+            removidas = ReviewHelper.ensure_unique_reviews(db, Product, Review)
+            if removidas:
+                print(f"✅ {removidas} avaliações repetidas removidas")
+
+            # Produtos com contadores corrigidos vão para o feed (/api/products/changes)
+            total = ReviewHelper.rebuild_counters(db, Product, Review, record_changes=True)
+            # Workers descartam o /api/products em cache com as notas antigas
+            catalog_version.bump()
+            print(f"✅ Contadores recalculados ({total} produtos com avaliações)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erro ao recalcular avaliações: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
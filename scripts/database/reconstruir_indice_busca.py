@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+reconstruir_indice_busca.py — Índice de Busca
+============================================
+
+Reconstrói o índice de busca textual dos produtos (FTS5 no SQLite,
+tsvector/GIN no PostgreSQL). Necessário apenas se produtos foram
+alterados direto no banco, fora da aplicação.
+
+Uso:
+    python scripts/database/reconstruir_indice_busca.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from application import app, db, Product
+from app.helpers import SearchIndex
+
+
+def main():
+    print("🔄 Reconstruindo índice de busca...")
+
+    with app.app_context():
+        try:
+            SearchIndex.ensure(db, Product)
+            total = SearchIndex.rebuild(db, Product)
+            print(f"✅ {total} produtos indexados ({db.engine.dialect.name})")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erro ao reconstruir índice: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+benchmark_json.py — Benchmark de Serialização JSON
+============================================
+
+Compara os encoders do JSONProvider (stdlib x orjson) serializando um
+payload no formato de /api/products e uma listagem de pedidos com datas.
+
+Uso:
+    python scripts/maintenance/benchmark_json.py
+    python scripts/maintenance/benchmark_json.py --produtos 5000 --repeticoes 50
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from flask import Flask
+
+from app.utils import json_provider
+from app.utils.json_provider import JSONProvider
+
+
+def payload_catalogo(n):
+    """Lista no formato de CatalogHelper.list_products"""
+    return [
+        {
+            "id": i,
+            "titulo": f"Mel Silvestre {i}",
+            "descricao": "Mel puro de florada silvestre, colhido no interior de Minas Gerais. " * 3,
+            "preco": 29.9 + i % 50,
+            "imagem": f"mel{i}.jpg",
+            "estoque": i % 40,
+            "media": round((i % 5) + 0.5, 2),
+            "n_reviews": i % 120
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def payload_pedidos(n):
+    """Pedidos com itens e datetimes (serializados pelo provider)"""
+    inicio = datetime(2026, 1, 1)
+    return [
+        {
+            "id": i,
+            "status": "Pago",
+            "total": 120.5,
+            "created_at": inicio + timedelta(minutes=i),
+            "items": [
+                {"product_id": j, "quantidade": 2, "preco_unitario": 35.0}
+                for j in range(4)
+            ]
+        }
+        for i in range(n)
+    ]
+
+
+def medir(provider, payload, repeticoes):
+    """Melhor tempo (ms) de uma serialização"""
+    tempos = timeit.repeat(lambda: provider.dumps(payload), number=1, repeat=repeticoes)
+    return min(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialização JSON")
+    parser.add_argument("--produtos", type=int, default=2000)
+    parser.add_argument("--pedidos", type=int, default=1000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    provider = JSONProvider(Flask(__name__))
+    payloads = {
+        f"catálogo ({args.produtos} produtos)": payload_catalogo(args.produtos),
+        f"pedidos ({args.pedidos} pedidos)": payload_pedidos(args.pedidos),
+    }
+
+    orjson = json_provider.orjson
+    if orjson is None:
+        print("⚠️  orjson não instalado: medindo apenas a stdlib (pip install orjson)")
+
+    print(f"\n{'payload':<30} {'KB':>6} {'json (ms)':>10} {'orjson (ms)':>12} {'ganho':>7}")
+    for nome, payload in payloads.items():
+        json_provider.orjson = None
+        stdlib = medir(provider, payload, args.repeticoes)
+        kb = len(provider.dumps(payload).encode('utf-8')) / 1024
+
+        if orjson is not None:
+            json_provider.orjson = orjson
+            rapido = medir(provider, payload, args.repeticoes)
+            print(f"{nome:<30} {kb:>6.0f} {stdlib:>10.2f} {rapido:>12.2f} {stdlib / rapido:>6.1f}x")
+        else:
+            print(f"{nome:<30} {kb:>6.0f} {stdlib:>10.2f} {'-':>12} {'-':>7}")
+
+    json_provider.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
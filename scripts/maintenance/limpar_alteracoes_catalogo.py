@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+============================================
+limpar_alteracoes_catalogo.py — Limpeza do Feed de Alterações
+============================================
+
+Remove do feed (tabela catalog_change) as alterações mais antigas que N
+dias. A última alteração é sempre mantida, para o seq continuar
+crescendo. Clientes que pedirem /api/products/changes com um since
+anterior ao que foi removido recebem 410 e recarregam o catálogo.
+
+Uso:
+    python scripts/maintenance/limpar_alteracoes_catalogo.py
+    python scripts/maintenance/limpar_alteracoes_catalogo.py --dias 7
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adicionar diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from application import app, db, CatalogChange
+from app.helpers import ChangeFeed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove alterações antigas do feed do catálogo")
+    parser.add_argument("--dias", type=int, default=30, help="Manter alterações dos últimos N dias")
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            removidas = ChangeFeed.prune(db, CatalogChange, datetime.utcnow() - timedelta(days=args.dias))
+            print(f"✅ {removidas} alterações removidas (seq atual: {ChangeFeed.current_seq(db, CatalogChange)})")
+        except Exception as e:
+            print(f"❌ Erro ao limpar alterações: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+// static/js/imagens.js — Imagens de produtos (derivados redimensionados + srcset)
+
+// Remove "imagens/" do início se já existir para evitar duplicação
+function caminhoImagem(imagem) {
+  if (!imagem) return '';
+  return imagem.startsWith('imagens/') ? imagem.substring(8) : imagem;
+}
+
+// srcset de um formato a partir de p.imagens ([{src, largura, altura, tipo}])
+function srcsetImagens(imagens, tipo) {
+  return (imagens || [])
+    .filter(i => i.tipo === tipo)
+    .map(i => `/static/imagens/${i.src} ${i.largura}w`)
+    .join(', ');
+}
+
+// Fundo da <img> enquanto ela carrega: cor dominante + miniatura borrada (ampliada)
+function placeholderEstilo(p) {
+  if (!p.cor_dominante && !p.miniatura) return '';
+  const miniatura = p.miniatura ? ` url(${p.miniatura}) center / cover no-repeat` : '';
+  return `background: ${p.cor_dominante || '#f5f5f5'}${miniatura};`;
+}
+
+// <picture> com WebP/JPEG no tamanho certo; sem derivados, usa a imagem original
+function imagemProdutoHTML(p, sizes) {
+  const original = `/static/imagens/${caminhoImagem(p.imagem)}`;
+  const webp = srcsetImagens(p.imagens, 'image/webp');
+  const jpeg = srcsetImagens(p.imagens, 'image/jpeg');
+  const maior = (p.imagens || [])[0];
+  const dimensoes = maior ? `width="${maior.largura}" height="${maior.altura}"` : '';
+  const estilo = placeholderEstilo(p);
+
+  return `<picture>
+      ${webp ? `<source type="image/webp" srcset="${webp}" sizes="${sizes}">` : ''}
+      <img src="${original}" ${jpeg ? `srcset="${jpeg}" sizes="${sizes}"` : ''} ${dimensoes} ${estilo ? `style="${estilo}"` : ''} alt="${p.titulo}" loading="lazy">
+    </picture>`;
+}
@@ -1,13 +1,15 @@
 // Carregar e exibir produtos em destaque
 window.addEventListener('DOMContentLoaded', () => {
-  fetch('/api/products/search?ordenar=nome')
+  // Só os 6 primeiros e só os campos usados no card
+  fetch('/api/products/search?ordenar=nome&limit=6&fields=id,titulo,descricao,preco,imagem,imagens,cor_dominante,miniatura,estoque')
     .then(r => r.json())
-    .then(data => {
+    .then(pagina => {
+      const data = pagina.itens;
       console.log('📦 Produtos carregados:', data.length);
       const wrap = document.getElementById('produtos-destaque');
       if (!wrap) return;
 
-      data.slice(0, 6).forEach(p => {
+      data.forEach(p => {
         const esgotado = p.estoque <= 0;
         const card = document.createElement('div');
         card.className = 'card';
@@ -19,9 +21,8 @@ window.addEventListener('DOMContentLoaded', () => {
           }
         };
         
-        const imagePath = p.imagem.startsWith('imagens/') ? p.imagem.substring(8) : p.imagem;
         card.innerHTML = `
-          <img src="/static/imagens/${imagePath}" alt="${p.titulo}">
+          ${imagemProdutoHTML(p, '(max-width: 768px) 100vw, 300px')}
           <h3>${p.titulo}</h3>
           <p class="desc">${p.descricao}</p>
           <span class="preco">R$ ${p.preco.toFixed(2)}</span>
@@ -5,9 +5,14 @@ function showProduct(p) {
   // Atualiza imagem
   const imgElement = document.getElementById("imagem-produto");
   if (p.imagem) {
-    // Remove "imagens/" do início se já existir para evitar duplicação
-    const imagePath = p.imagem.startsWith('imagens/') ? p.imagem.substring(8) : p.imagem;
-    imgElement.src = "/static/imagens/" + imagePath;
+    // Derivados redimensionados (WebP + JPEG); a original fica como src
+    const sizes = '(max-width: 768px) 100vw, 500px';
+    document.getElementById("imagem-produto-webp").srcset = srcsetImagens(p.imagens, 'image/webp');
+    document.getElementById("imagem-produto-webp").sizes = sizes;
+    imgElement.srcset = srcsetImagens(p.imagens, 'image/jpeg');
+    imgElement.sizes = sizes;
+    imgElement.style.cssText += placeholderEstilo(p);
+    imgElement.src = "/static/imagens/" + caminhoImagem(p.imagem);
     imgElement.onerror = function() {
       console.error('Erro ao carregar imagem:', p.imagem);
       this.src = "/static/imagens/placeholder.jpg";
@@ -15,9 +20,75 @@ function showProduct(p) {
   }
   
   document.getElementById("titulo-produto").textContent = p.titulo;
-  document.getElementById("preco-produto").textContent = "R$ " + p.preco.toFixed(2);
   document.getElementById("descricao-produto").textContent = p.descricao;
+  showStock(p);
 }
+
+// Preço e estoque (carga inicial e atualizações ao vivo)
+function showStock(p) {
+  const estoqueEl = document.getElementById("estoque-produto");
+  const esgotado = p.removido || p.estoque <= 0;
+  
+  if (p.preco !== undefined) {
+    document.getElementById("preco-produto").textContent = "R$ " + p.preco.toFixed(2);
+  }
+  if (p.removido) {
+    estoqueEl.textContent = "Produto indisponível";
+  } else if (p.estoque <= 0) {
+    estoqueEl.textContent = "Esgotado";
+  } else {
+    estoqueEl.textContent = p.estoque < 10 ? `Últimas ${p.estoque} unidades` : "Em estoque";
+  }
+  estoqueEl.classList.toggle("esgotado", esgotado);
+  estoqueEl.classList.toggle("baixo", !esgotado && p.estoque < 10);
+  
+  document.getElementById("btn-add-cart").disabled = esgotado;
+  document.getElementById("btn-finalizar").disabled = esgotado;
+}
+
+// Intervalo do polling do feed de alterações quando não há stream (ms)
+const POLL_ESTOQUE_MS = 15000;
+
+// Estoque/preço ao vivo (SSE); o navegador reconecta sozinho quando a conexão fecha
+function watchStock(productId) {
+  if (!window.EventSource) return pollStock(productId);
+  const fonte = new EventSource(`/api/products/stream?ids=${productId}`);
+  fonte.addEventListener('estoque', e => showStock(JSON.parse(e.data)));
+  fonte.onerror = () => {
+    // 503 (servidor cheio) encerra o EventSource: acompanha pelo feed de alterações
+    if (fonte.readyState === EventSource.CLOSED) pollStock(productId);
+  };
+}
+
+// Polling de /api/products/changes: não ocupa uma conexão do servidor como o stream
+async function pollStock(productId, since = null) {
+  const id = Number(productId);
+  try {
+    if (since === null) {
+      since = (await (await fetch('/api/products/changes')).json()).seq;
+    }
+    let data;
+    do {
+      const r = await fetch(`/api/products/changes?since=${since}&fields=id,preco,estoque`);
+      if (r.status === 410) {
+        // Feed já limpo: recarrega o produto e recomeça do seq atual
+        const atual = await fetch(`/api/product/${id}`);
+        if (atual.ok) showStock(await atual.json());
+        else if (atual.status === 404) showStock({ removido: true });
+        since = null;
+        break;
+      }
+      if (!r.ok) throw new Error(`HTTP ${r.status}`);
+      data = await r.json();
+      since = data.seq;
+      const item = data.itens.find(p => p.id === id);
+      if (item) showStock(item);
+      if (data.removidos.includes(id)) showStock({ removido: true });
+    } while (data.mais);
+  } catch (error) {
+    console.error('Erro ao atualizar estoque:', error);
+  }
+  setTimeout(() => pollStock(productId, since), POLL_ESTOQUE_MS);
 }
 
 // Comprar agora
@@ -58,18 +129,63 @@ async function addToCart(id) {
 }
 
 // Avaliações
-function showReviews(list) {
+function showReviews(data) {
   const c = document.getElementById('produto-reviews');
   c.innerHTML = '<h3>Avaliações</h3>';
-  if (!list || list.length === 0) {
+  if (!data.reviews || data.reviews.length === 0) {
     c.innerHTML += '<p>Nenhuma avaliação ainda.</p>';
     return;
   }
+  
+  // Resumo: média + histograma de notas (5 → 1)
+  const resumo = document.createElement('div');
+  resumo.className = 'reviews-resumo';
+  // Só números entram no innerHTML do resumo
+  resumo.innerHTML = `<strong>${Number(data.media)} ⭐</strong> (${Number(data.n_reviews)} avaliações)`;
+  for (let nota = 5; nota >= 1; nota--) {
+    const qtd = Number(data.histograma[nota]) || 0;
+    const pct = data.n_reviews ? Math.round(qtd * 100 / data.n_reviews) : 0;
+    resumo.innerHTML += `<div class="histograma-linha">${nota} ⭐ <progress max="100" value="${pct}"></progress> ${qtd}</div>`;
+  }
+  c.appendChild(resumo);
+  
+  const lista = document.createElement('div');
+  c.appendChild(lista);
+  appendReviews(lista, data.reviews);
+  
+  // Próximas páginas sob demanda
+  let cursor = data.reviews_proximo_cursor;
+  if (!cursor) return;
+  
+  const btnMais = document.createElement('button');
+  btnMais.className = 'btn-ver-mais-reviews';
+  btnMais.textContent = 'Ver mais avaliações';
+  btnMais.addEventListener('click', () => {
+    fetch(`/api/product/${data.id}/reviews?cursor=${encodeURIComponent(cursor)}`)
+      .then(r => r.json())
+      .then(pagina => {
+        appendReviews(lista, pagina.reviews);
+        cursor = pagina.proximo_cursor;
+        if (!cursor) btnMais.remove();
+      })
+      .catch(error => console.error('Erro ao carregar avaliações:', error));
+  });
+  c.appendChild(btnMais);
+}
+
+// Nome e comentário vêm do usuário: sempre como texto, nunca como HTML
+function appendReviews(container, list) {
   list.forEach(r => {
     const div = document.createElement('div');
     div.className = "comentario";
-    div.innerHTML = `<strong>${r.nome}</strong> • ${r.nota} ⭐<br><span>${r.comentario}</span>`;
-    c.appendChild(div);
+    
+    const nome = document.createElement('strong');
+    nome.textContent = r.nome;
+    const comentario = document.createElement('span');
+    comentario.textContent = r.comentario || '';
+    
+    div.append(nome, ` • ${Number(r.nota)} ⭐`, document.createElement('br'), comentario);
+    container.appendChild(div);
   });
 }
 
@@ -103,7 +219,8 @@ document.addEventListener('DOMContentLoaded', () => {
       .then(data => {
         console.log('Resposta da API:', data);
         showProduct(data);
-        showReviews(data.reviews || []);
+        showReviews(data);
+        watchStock(productId);
       })
       .catch(error => {
         console.error('Erro ao carregar produto:', error);
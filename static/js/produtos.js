@@ -12,13 +12,15 @@ function toggleFiltros() {
   }
 }
 
+// Largura exibida dos cards (o navegador escolhe o derivado pelo srcset)
+const TAMANHO_CARD = '(max-width: 768px) 50vw, 300px';
+
 function renderDesktop(p, card) {
   const esgotado = p.estoque <= 0;
   const estoqueClass = esgotado ? 'esgotado' : (p.estoque < 10 ? 'estoque-baixo' : '');
-  const imagePath = p.imagem.startsWith('imagens/') ? p.imagem.substring(8) : p.imagem;
   
   card.innerHTML = `
-    <img src="/static/imagens/${imagePath}" alt="${p.titulo}">
+    ${imagemProdutoHTML(p, TAMANHO_CARD)}
     <h3>${p.titulo}</h3>
     <p>${p.descricao}</p>
     <span class="preco">R$ ${p.preco.toFixed(2)}</span>
@@ -47,30 +49,41 @@ function renderDesktop(p, card) {
 
 
 function renderMobile(p, card) {
-  const imagePath = p.imagem.startsWith('imagens/') ? p.imagem.substring(8) : p.imagem;
   card.innerHTML = `
     <a href="/produto/${p.id}" class="card-link">
-      <img src="/static/imagens/${imagePath}" alt="${p.titulo}">
+      ${imagemProdutoHTML(p, TAMANHO_CARD)}
       <h3>${p.titulo}</h3>
       <span class="preco">R$ ${p.preco.toFixed(2)}</span>
     </a>
   `;
 }
 
+// Paginação (keyset): cursor da próxima página
+const PAGE_SIZE = 24;
+const CAMPOS_MOBILE = 'id,titulo,preco,imagem,imagens,cor_dominante,miniatura';
+let proximoCursor = null;
+
 // Função para carregar produtos com filtros
-function carregarProdutos() {
+// append=true carrega a próxima página no fim do grid
+function carregarProdutos(append = false) {
   console.log('🔄 Iniciando carregamento de produtos...');
   const busca = document.getElementById('busca').value;
   const precoMin = document.getElementById('preco-min').value;
   const precoMax = document.getElementById('preco-max').value;
   const ordenar = document.getElementById('ordenar').value;
+  const isMobile = window.innerWidth <= 768;
   
   // Construir URL com parâmetros
   const params = new URLSearchParams();
   if (busca) params.append('q', busca);
   if (precoMin) params.append('preco_min', precoMin);
   if (precoMax) params.append('preco_max', precoMax);
-  params.append('ordenar', ordenar);
+  // Sem escolha do usuário a API decide (relevância quando há texto)
+  if (ordenar) params.append('ordenar', ordenar);
+  params.append('limit', PAGE_SIZE);
+  if (isMobile) params.append('fields', CAMPOS_MOBILE);
+  if (append && proximoCursor) params.append('cursor', proximoCursor);
+  if (!append) params.append('facetas', '1');
   
   const url = `/api/products/search?${params.toString()}`;
   console.log('📡 Fazendo request para:', url);
@@ -81,19 +94,25 @@ function carregarProdutos() {
       if (!r.ok) throw new Error(`HTTP ${r.status}`);
       return r.json();
     })
-    .then(data => {
+    .then(pagina => {
+      const data = pagina.itens;
       console.log('📦 Produtos recebidos:', data.length, data);
       const grid = document.getElementById('produtos-grid');
       const semResultados = document.getElementById('sem-resultados');
+      const btnMais = document.getElementById('btn-carregar-mais');
       
       if (!grid) {
         console.error('❌ Elemento produtos-grid não encontrado!');
         return;
       }
       
-      grid.innerHTML = '';
+      proximoCursor = pagina.proximo_cursor;
+      if (pagina.facetas) renderFacetas(pagina.facetas);
+      if (btnMais) btnMais.style.display = proximoCursor ? 'block' : 'none';
+      
+      if (!append) grid.innerHTML = '';
       
-      if (data.length === 0) {
+      if (!append && data.length === 0) {
         console.log('⚠️  Nenhum produto encontrado');
         grid.style.display = 'none';
         semResultados.style.display = 'block';
@@ -102,7 +121,6 @@ function carregarProdutos() {
       
       grid.style.display = 'grid';
       semResultados.style.display = 'none';
-      const isMobile = window.innerWidth <= 768;
       console.log('📱 Mobile?', isMobile);
 
       data.forEach(p => {
@@ -129,17 +147,86 @@ function carregarProdutos() {
     });
 }
 
+// Contagens por faixa de preço, disponibilidade e avaliação
+function renderFacetas(f) {
+  const box = document.getElementById('facetas');
+  if (!box) return;
+  box.innerHTML = '';
+  
+  f.preco.forEach(faixa => {
+    const chip = document.createElement('button');
+    chip.className = 'faceta';
+    chip.textContent = faixa.max === null
+      ? `Acima de R$ ${faixa.min} (${faixa.total})`
+      : `R$ ${faixa.min}–${faixa.max} (${faixa.total})`;
+    chip.disabled = faixa.total === 0;
+    chip.addEventListener('click', () => {
+      document.getElementById('preco-min').value = faixa.min;
+      // Faixa é [min, max): o filtro preco_max é inclusivo
+      document.getElementById('preco-max').value = faixa.max === null ? '' : (faixa.max - 0.01).toFixed(2);
+      carregarProdutos();
+    });
+    box.appendChild(chip);
+  });
+  
+  const d = f.disponibilidade;
+  const resumo = [
+    `✅ ${d.disponivel} disponíveis`,
+    `⚠️ ${d.estoque_baixo} últimas unidades`,
+    `❌ ${d.esgotado} esgotados`,
+    `⭐ ${f.avaliacao['4']} com 4+ estrelas`
+  ];
+  resumo.forEach(texto => {
+    const span = document.createElement('span');
+    span.className = 'faceta';
+    span.textContent = texto;
+    box.appendChild(span);
+  });
+}
+
+// Autocompletar: títulos sugeridos para o texto digitado
+let sugestaoAtual = null;
+function carregarSugestoes() {
+  const termo = document.getElementById('busca').value.trim();
+  const lista = document.getElementById('sugestoes-busca');
+  if (!lista) return;
+  if (!termo) {
+    lista.innerHTML = '';
+    return;
+  }
+  
+  // Ignora respostas de teclas anteriores que chegarem atrasadas
+  const pedido = sugestaoAtual = termo;
+  fetch(`/api/products/suggest?q=${encodeURIComponent(termo)}`)
+    .then(r => r.ok ? r.json() : [])
+    .then(sugestoes => {
+      if (pedido !== sugestaoAtual) return;
+      lista.innerHTML = '';
+      sugestoes.forEach(s => {
+        const opcao = document.createElement('option');
+        opcao.value = s.titulo;
+        lista.appendChild(opcao);
+      });
+    })
+    .catch(error => console.error('Erro ao carregar sugestões:', error));
+}
+
 // Event listeners para busca e filtros
 document.addEventListener('DOMContentLoaded', () => {
-  carregarProdutos();
+  const recarregar = () => carregarProdutos();
+  recarregar();
   
   // Busca em tempo real
-  document.getElementById('busca').addEventListener('input', carregarProdutos);
+  document.getElementById('busca').addEventListener('input', recarregar);
+  document.getElementById('busca').addEventListener('input', carregarSugestoes);
   
   // Filtros
-  document.getElementById('preco-min').addEventListener('change', carregarProdutos);
-  document.getElementById('preco-max').addEventListener('change', carregarProdutos);
-  document.getElementById('ordenar').addEventListener('change', carregarProdutos);
+  document.getElementById('preco-min').addEventListener('change', recarregar);
+  document.getElementById('preco-max').addEventListener('change', recarregar);
+  document.getElementById('ordenar').addEventListener('change', recarregar);
+  
+  // Próxima página
+  document.getElementById('btn-carregar-mais').addEventListener('click', () => carregarProdutos(true));
   
   // Toggle filtros
   document.getElementById('btn-toggle-filtros').addEventListener('click', toggleFiltros);
@@ -152,7 +239,7 @@ function limparFiltros() {
   document.getElementById('busca').value = '';
   document.getElementById('preco-min').value = '';
   document.getElementById('preco-max').value = '';
-  document.getElementById('ordenar').value = 'nome';
+  document.getElementById('ordenar').value = '';
   carregarProdutos();
 }
 
@@ -0,0 +1,1308 @@
+#!/usr/bin/env python3
+# ============================================
+# test_catalog.py — Testes das APIs do Catálogo
+# ============================================
+
+"""
+Testes das APIs de produtos (/api/products e derivadas).
+Execute: python -m pytest tests/test_catalog.py
+"""
+
+import os
+import sys
+import logging
+import tempfile
+from pathlib import Path
+
+if 'EJM_SECRET' not in os.environ:
+    os.environ['EJM_SECRET'] = 'test_secret_key_for_catalog_testing_only_32chars_minimum'
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+
+def criar_app_teste():
+    """Cria uma aplicação mínima com banco em memória e o blueprint de produtos"""
+    from config import TestingConfig
+    from app.models import init_models
+    from app.routes.products import products_bp, init_products
+    from app.helpers import SearchIndex
+    from app.utils.catalog_cache import catalog_version, catalog_cache, search_cache
+    from app.utils.json_provider import JSONProvider
+    from app.utils.suggest_index import suggest_index
+    from app.utils.trigram_index import trigram_index
+    from app.utils.search_analytics import search_analytics
+
+    root = Path(__file__).resolve().parent.parent
+    app = Flask(__name__, template_folder=str(root / "templates"))
+    app.config.from_object(TestingConfig)
+    app.config['SECRET_KEY'] = os.environ['EJM_SECRET']
+    app.json = JSONProvider(app)
+
+    db = SQLAlchemy(app)
+    User, Product, Order, OrderItem, Review, CartItem, Address, PaymentMethod = init_models(db)
+    from app.models import CatalogChange, SearchEvent
+    models = {
+        'User': User, 'Product': Product, 'Order': Order, 'OrderItem': OrderItem,
+        'Review': Review, 'CartItem': CartItem, 'Address': Address, 'PaymentMethod': PaymentMethod,
+        'CatalogChange': CatalogChange, 'SearchEvent': SearchEvent
+    }
+
+    init_products(db, models, logging.getLogger("test_catalog"))
+    app.register_blueprint(products_bp)
+
+    with app.app_context():
+        db.create_all()
+        SearchIndex.init_app(db, Product)
+
+    # Versão do catálogo isolada por teste
+    catalog_version.configure(Path(tempfile.mkdtemp()) / "catalog.version")
+    catalog_cache.clear()
+    search_cache.clear()
+    suggest_index.clear()
+    trigram_index.clear()
+    search_analytics.clear()
+
+    return app, db, models
+
+
+def popular_catalogo(db, models, n_produtos, reviews_por_produto=3):
+    """Cria N produtos, cada um com algumas avaliações (uma por cliente)"""
+    from app.helpers import ReviewHelper
+    User, Product, Review = models['User'], models['Product'], models['Review']
+
+    users = [User(nome=f"Cliente {nota}", email=f"cliente{n_produtos}-{nota}@teste.com", senha_hash="x")
+             for nota in range(1, max(reviews_por_produto, 1) + 1)]
+    db.session.add_all(users)
+    db.session.flush()
+
+    for i in range(n_produtos):
+        p = Product(titulo=f"Mel {i}", descricao=f"Mel número {i}", preco=10.0 + i,
+                    imagem=f"imagens/mel{i}.jpg", estoque=i)
+        db.session.add(p)
+        db.session.flush()
+        for nota, user in enumerate(users[:reviews_por_produto], 1):
+            db.session.add(Review(user_id=user.id, product_id=p.id, nota=nota))
+
+    db.session.commit()
+    # Avaliações inseridas direto na tabela: recalcula os contadores do produto
+    ReviewHelper.rebuild_counters(db, Product, Review)
+
+
+class ContadorQueries:
+    """Conta os statements SQL executados enquanto o contexto está ativo"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def test_api_products_agregados():
+    """/api/products retorna média e contagem corretas"""
+    print("🧪 Testando agregados de /api/products...")
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 2)
+        Product = models['Product']
+        db.session.add(Product(titulo="Sem avaliações", preco=5.0, estoque=1))
+        db.session.commit()
+
+    resp = app.test_client().get("/api/products")
+    assert resp.status_code == 200
+    data = resp.get_json()
+
+    assert len(data) == 3
+    assert data[0]["media"] == 2.0 and data[0]["n_reviews"] == 3
+    assert data[0]["imagem"] == "mel0.jpg"
+    assert data[2]["media"] == 0 and data[2]["n_reviews"] == 0
+    print("  ✅ Agregados OK")
+
+
+def test_api_products_queries_constantes():
+    """O número de queries de /api/products não cresce com o catálogo"""
+    print("\n🧪 Testando número de queries de /api/products...")
+
+    contagens = []
+    for n in (3, 25):
+        app, db, models = criar_app_teste()
+        with app.app_context():
+            popular_catalogo(db, models, n)
+            client = app.test_client()
+            with ContadorQueries(db.engine) as contador:
+                resp = client.get("/api/products")
+            assert resp.status_code == 200
+            assert len(resp.get_json()) == n
+            contagens.append(contador.total)
+
+    assert contagens[0] == contagens[1] == 1, f"Queries por requisição: {contagens}"
+    print(f"  ✅ Queries por requisição: {contagens}")
+
+
+def test_api_products_search_filtros_sql():
+    """/api/products/search filtra e ordena no SQL, com número fixo de queries"""
+    print("\n🧪 Testando /api/products/search...")
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 20)
+        Product = models['Product']
+        db.session.add(Product(titulo="Mel 100% puro", descricao="Florada", preco=33.0, estoque=2))
+        db.session.commit()
+        client = app.test_client()
+
+        with ContadorQueries(db.engine) as contador:
+            resp = client.get("/api/products/search?preco_min=12&preco_max=15&ordenar=preco_desc")
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert [p["preco"] for p in data] == [15.0, 14.0, 13.0, 12.0]
+        assert data[0]["n_reviews"] == 3
+        assert contador.total == 1, f"Queries: {contador.total}"
+
+        data = client.get("/api/products/search?q=mel 1&ordenar=nome").get_json()
+        assert {p["titulo"] for p in data} >= {"Mel 1", "Mel 10", "Mel 19"}
+        assert "Mel 2" not in {p["titulo"] for p in data}
+
+        # Curingas do LIKE são tratados como texto
+        data = client.get("/api/products/search?q=100%25").get_json()
+        assert [p["titulo"] for p in data] == ["Mel 100% puro"]
+    print("  ✅ Busca OK")
+
+
+def test_api_products_cache_etag():
+    """/api/products usa cache por versão e responde 304 com If-None-Match"""
+    print("\n🧪 Testando cache/ETag de /api/products...")
+    from app.utils.catalog_cache import catalog_version
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 3)
+        client = app.test_client()
+
+        primeira = client.get("/api/products")
+        etag = primeira.headers["ETag"]
+        assert primeira.status_code == 200 and etag
+
+        # Mesma versão: nenhuma query, nem para 200 nem para 304
+        with ContadorQueries(db.engine) as contador:
+            assert client.get("/api/products").data == primeira.data
+            resp = client.get("/api/products", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert contador.total == 0, f"Queries: {contador.total}"
+
+        # Alteração do catálogo + bump da versão invalida o cache
+        Product = models['Product']
+        db.session.add(Product(titulo="Mel novo", preco=50.0, estoque=5))
+        db.session.commit()
+        catalog_version.bump()
+
+        resp = client.get("/api/products", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        assert len(resp.get_json()) == 4
+    print("  ✅ Cache/ETag OK")
+
+
+def test_busca_textual_indice():
+    """Busca usa o índice FTS: acentos, prefixos, ranking e sincronização"""
+    print("\n🧪 Testando índice de busca textual...")
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        Product = models['Product']
+        laranjeira = Product(titulo="Mel de Laranjéira", descricao="Florada cítrica", preco=30.0, estoque=3)
+        silvestre = Product(titulo="Mel Silvestre", descricao="Notas de laranjeira e eucalipto", preco=25.0, estoque=3)
+        db.session.add_all([laranjeira, silvestre])
+        db.session.commit()
+        client = app.test_client()
+
+        # Sem acento e por prefixo; título pesa mais que descrição
+        data = client.get("/api/products/search?q=laranj").get_json()
+        assert [p["titulo"] for p in data] == ["Mel de Laranjéira", "Mel Silvestre"]
+
+        data = client.get("/api/products/search?q=CITRICA").get_json()
+        assert [p["titulo"] for p in data] == ["Mel de Laranjéira"]
+
+        # Edição e remoção mantêm o índice sincronizado
+        silvestre.titulo = "Mel de Aroeira"
+        db.session.commit()
+        assert [p["titulo"] for p in client.get("/api/products/search?q=aroeira").get_json()] == ["Mel de Aroeira"]
+        assert client.get("/api/products/search?q=silvestre").get_json() == []
+
+        db.session.delete(laranjeira)
+        db.session.commit()
+        data = client.get("/api/products/search?q=laranjeira").get_json()
+        assert [p["titulo"] for p in data] == ["Mel de Aroeira"]
+    print("  ✅ Índice de busca OK")
+
+
+def test_indice_criado_por_outro_processo():
+    """Sem índice na inicialização: eventos não falham e o índice é detectado depois"""
+    print("\n🧪 Testando índice criado por outro processo...")
+    from app.helpers import SearchIndex
+
+    app, db, models = criar_app_teste()
+    Product = models['Product']
+    with app.app_context():
+        url = str(db.engine.url)
+        # Processo que perdeu a corrida: índice não existe para ele
+        db.session.execute(db.text("DROP TABLE product_fts"))
+        db.session.commit()
+        SearchIndex._available.discard(url)
+        SearchIndex._last_check.pop(url, None)
+        client = app.test_client()
+
+        produto = Product(titulo="Mel Silvestre", descricao="Florada nativa", preco=25.0, estoque=3)
+        db.session.add(produto)
+        db.session.commit()  # evento sem tabela: não escreve nem falha
+        assert [p["titulo"] for p in client.get("/api/products/search?q=silvestre").get_json()] == ["Mel Silvestre"]
+        assert not SearchIndex.is_available(db)  # já verificado há pouco (LIKE)
+
+        # Outro worker cria o índice: edições deste processo passam a ir para ele
+        db.session.execute(db.text(
+            "CREATE VIRTUAL TABLE product_fts USING fts5("
+            "titulo, descricao, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        db.session.commit()
+        produto.titulo = "Mel de Aroeira"
+        db.session.commit()
+        assert SearchIndex.is_available(db)
+        assert [p["titulo"] for p in client.get("/api/products/search?q=aroeira").get_json()] == ["Mel de Aroeira"]
+        assert db.session.execute(db.text("SELECT count(*) FROM product_fts")).scalar() == 1
+
+        # Sem eventos de escrita, a busca verifica de novo após RECHECK_INTERVAL
+        SearchIndex._available.discard(url)
+        SearchIndex._last_check[url] -= SearchIndex.RECHECK_INTERVAL
+        assert SearchIndex.is_available(db)
+    print("  ✅ Índice criado por outro processo OK")
+
+
+def test_paginacao_keyset_e_fields():
+    """limit/cursor percorrem todos os itens sem repetir; fields= limita as colunas do SQL"""
+    print("\n🧪 Testando paginação keyset e projeção de campos...")
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 7)
+        Product = models['Product']
+        # Preços repetidos para exercitar o desempate por id
+        db.session.add_all([Product(titulo=f"Empate {i}", preco=12.0, estoque=1) for i in range(3)])
+        db.session.commit()
+        client = app.test_client()
+
+        esperado = [p["id"] for p in client.get("/api/products/search?ordenar=preco_desc").get_json()]
+
+        vistos, cursor = [], None
+        while True:
+            url = "/api/products/search?ordenar=preco_desc&limit=3"
+            if cursor:
+                url += f"&cursor={cursor}"
+            pagina = client.get(url).get_json()
+            assert len(pagina["itens"]) <= 3
+            vistos += [p["id"] for p in pagina["itens"]]
+            cursor = pagina["proximo_cursor"]
+            if not cursor:
+                break
+        assert vistos == esperado
+
+        # Listagem pagina por id
+        pagina = client.get("/api/products?limit=4").get_json()
+        assert [p["id"] for p in pagina["itens"]] == [1, 2, 3, 4]
+        pagina = client.get(f"/api/products?limit=4&cursor={pagina['proximo_cursor']}").get_json()
+        assert [p["id"] for p in pagina["itens"]] == [5, 6, 7, 8]
+
+        # Projeção: só as colunas pedidas, sem JOIN com review
+        with ContadorQueries(db.engine) as contador:
+            data = client.get("/api/products?fields=id,titulo,preco,imagem").get_json()
+        assert set(data[0].keys()) == {"id", "titulo", "preco", "imagem"}
+        sql = contador.statements[0].lower()
+        assert "descricao" not in sql and "review" not in sql
+
+        # Parâmetros inválidos
+        assert client.get("/api/products?fields=senha").status_code == 400
+        assert client.get("/api/products/search?cursor=xyz&ordenar=nome").status_code == 400
+        cursor_preco = client.get("/api/products/search?ordenar=preco_asc&limit=1").get_json()["proximo_cursor"]
+        assert client.get(f"/api/products/search?ordenar=nome&cursor={cursor_preco}").status_code == 400
+        # Cursor bem formado com valor de outro tipo não chega ao SQL
+        from app.helpers import CatalogHelper
+        for ordenar, valor in [("nome", {"a": 1}), ("nome", [1]), ("nome", 3), ("preco_asc", "12"),
+                               ("preco_asc", True), ("estoque", None), ("relevancia", "x")]:
+            cursor = CatalogHelper.encode_cursor(ordenar, valor, 1)
+            resp = client.get(f"/api/products/search?q=mel&ordenar={ordenar}&limit=2&cursor={cursor}")
+            assert resp.status_code == 400, (ordenar, valor)
+    print("  ✅ Paginação e projeção OK")
+
+
+def test_detalhe_produto_histograma_e_reviews_paginadas():
+    """/api/product/<id> traz histograma + 1ª página em 1 query; o resto vem paginado"""
+    print("\n🧪 Testando detalhe do produto e avaliações paginadas...")
+    from datetime import datetime, timedelta
+    from app.helpers import ReviewHelper
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        User, Product, Review = models['User'], models['Product'], models['Review']
+        notas = [5, 5, 4, 3, 5, 1, 4, 5, 5, 2, 5, 4, 3, 5, 5, 4, 5, 1, 5, 5, 4, 5, 5, 3, 5]
+        users = [User(nome=f"Cliente {i}", email=f"c{i}@teste.com", senha_hash="x") for i in range(len(notas))]
+        p = Product(titulo="Mel de Jataí", preco=80.0, estoque=4)
+        db.session.add_all([*users, p])
+        db.session.flush()
+        inicio = datetime(2026, 1, 1)
+        for i, (nota, user) in enumerate(zip(notas, users)):
+            # Alguns horários repetidos para exercitar o desempate por id
+            db.session.add(Review(user_id=user.id, product_id=p.id, nota=nota,
+                                  comentario=f"c{i}", created_at=inicio + timedelta(minutes=i // 2)))
+        db.session.commit()
+        ReviewHelper.rebuild_counters(db, Product, Review)
+        pid = p.id
+        client = app.test_client()
+
+        with ContadorQueries(db.engine) as contador:
+            data = client.get(f"/api/product/{pid}").get_json()
+        assert contador.total == 1, f"Queries: {contador.total}"
+        assert data["n_reviews"] == 25
+        assert data["histograma"] == {str(n): notas.count(n) for n in range(1, 6)}
+        assert data["media"] == round(sum(notas) / 25, 2)
+        assert len(data["reviews"]) == 10 and data["reviews"][0]["comentario"] == "c24"
+        assert data["reviews"][0]["created_at"] == "2026-01-01T00:12:00"
+
+        vistos = [r["id"] for r in data["reviews"]]
+        cursor = data["reviews_proximo_cursor"]
+        while cursor:
+            pagina = client.get(f"/api/product/{pid}/reviews?limit=4&cursor={cursor}").get_json()
+            vistos += [r["id"] for r in pagina["reviews"]]
+            cursor = pagina["proximo_cursor"]
+        assert sorted(vistos) == sorted(set(vistos)) and len(vistos) == 25
+
+        assert client.get("/api/product/999").status_code == 404
+        sem_reviews = Product(titulo="Novo", preco=1.0, estoque=1)
+        db.session.add(sem_reviews)
+        db.session.commit()
+        data = client.get(f"/api/product/{sem_reviews.id}").get_json()
+        assert data["reviews"] == [] and data["reviews_proximo_cursor"] is None
+        assert data["histograma"]["5"] == 0
+    print("  ✅ Detalhe e avaliações OK")
+
+
+def test_api_avaliacoes_contadores():
+    """Criar/editar/remover avaliação mantém os contadores iguais ao recálculo"""
+    print("\n🧪 Testando API de avaliações e contadores...")
+    from app.helpers import ReviewHelper
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        User, Product, Review = models['User'], models['Product'], models['Review']
+        ana = User(nome="Ana", email="ana@teste.com", senha_hash="x")
+        bia = User(nome="Bia", email="bia@teste.com", senha_hash="x")
+        p = Product(titulo="Mel de Aroeira", preco=40.0, estoque=3)
+        db.session.add_all([ana, bia, p])
+        db.session.commit()
+        ids = {"ana": ana.id, "bia": bia.id, "produto": p.id}
+
+    client = app.test_client()
+    url = f"/api/product/{ids['produto']}/reviews"
+
+    def login(nome):
+        with client.session_transaction() as s:
+            s['user_id'] = ids[nome]
+
+    assert client.post(url, json={"nota": 5}).status_code == 401
+    login("ana")
+    assert client.post(url, json={"nota": 6}).status_code == 400
+    assert client.post("/api/product/999/reviews", json={"nota": 4}).status_code == 404
+    resp = client.post(url, json={"nota": 5, "comentario": "  Ótimo  "})
+    assert resp.status_code == 201 and resp.get_json()["comentario"] == "Ótimo"
+    review_ana = resp.get_json()["id"]
+    assert client.post(url, json={"nota": 4}).status_code == 409
+
+    login("bia")
+    review_bia = client.post(url, json={"nota": 2}).get_json()["id"]
+    assert client.put(f"/api/reviews/{review_ana}", json={"nota": 1}).status_code == 403
+    assert client.put(f"/api/reviews/{review_bia}", json={"nota": 3}).status_code == 200
+
+    data = client.get(f"/api/product/{ids['produto']}").get_json()
+    assert data["n_reviews"] == 2 and data["media"] == 4.0
+    assert data["histograma"] == {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}
+    assert client.get("/api/products").get_json()[0]["media"] == 4.0
+
+    assert client.delete(f"/api/reviews/{review_bia}").status_code == 200
+    data = client.get(f"/api/product/{ids['produto']}").get_json()
+    assert data["n_reviews"] == 1 and data["histograma"]["3"] == 0
+
+    # Recalcular a partir da tabela review chega nos mesmos valores
+    with app.app_context():
+        Product = models['Product']
+        colunas = lambda: db.session.query(
+            Product.n_reviews, Product.soma_notas, Product.notas_3, Product.notas_5
+        ).filter_by(id=ids["produto"]).one()
+        incremental = tuple(colunas())
+        db.session.execute(db.update(Product).values(n_reviews=99, soma_notas=99))
+        db.session.commit()
+        ReviewHelper.rebuild_counters(db, Product, models['Review'])
+        assert tuple(colunas()) == incremental == (1, 5, 0, 1)
+    print("  ✅ Avaliações e contadores OK")
+
+
+def test_json_provider_datas_e_fallback():
+    """Datas saem em ISO 8601 com orjson e com a stdlib"""
+    print("\n🧪 Testando JSONProvider...")
+    from datetime import date, datetime
+    from decimal import Decimal
+    from app.utils import json_provider
+
+    app, _, _ = criar_app_teste()
+    payload = {"criado": datetime(2026, 3, 1, 12, 30), "dia": date(2026, 3, 1),
+               "valor": Decimal("9.90"), 1: "chave int"}
+    esperado = {"criado": "2026-03-01T12:30:00", "dia": "2026-03-01", "valor": "9.90", "1": "chave int"}
+
+    orjson = json_provider.orjson
+    try:
+        for backend in {orjson, None}:
+            json_provider.orjson = backend
+            assert app.json.loads(app.json.dumps(payload)) == esperado
+    finally:
+        json_provider.orjson = orjson
+    print(f"  ✅ JSONProvider OK ({app.json.backend})")
+
+
+def test_derivados_imagem_e_srcset():
+    """Upload vira WebP/JPEG com largura limitada, listados na API para o srcset"""
+    print("\n🧪 Testando derivados de imagem...")
+    from app.helpers import ImageHelper
+
+    if not ImageHelper.is_available():
+        print("  ⚠️ Pillow não instalado, teste ignorado")
+        return
+
+    from PIL import Image
+
+    pasta = tempfile.mkdtemp()
+    Image.new("RGBA", (2000, 1000), (200, 150, 0, 128)).save(os.path.join(pasta, "mel.png"))
+    Image.new("RGB", (500, 400), (200, 150, 0)).save(os.path.join(pasta, "pote.jpg"))
+
+    derivados = ImageHelper.generate_derivatives(pasta, "mel.png")
+    assert [(d["largura"], d["altura"]) for d in derivados if d["tipo"] == "image/webp"] == \
+        [(1280, 640), (640, 320), (320, 160)]
+    for d in derivados:
+        with Image.open(os.path.join(pasta, d["src"])) as img:
+            assert img.size == (d["largura"], d["altura"])
+            assert img.format == ("WEBP" if d["tipo"] == "image/webp" else "JPEG")
+
+    # Imagem pequena não é ampliada
+    pequenos = ImageHelper.generate_derivatives(pasta, "pote.jpg")
+    assert sorted({d["largura"] for d in pequenos}) == [320, 500]
+
+    # Placeholder: cor dominante + miniatura pequena o bastante para ir no JSON
+    Image.new("RGB", (300, 200), (30, 120, 200)).save(os.path.join(pasta, "azul.png"))
+    resultado = ImageHelper.process_image(pasta, "azul.png")
+    r, g, b = (int(resultado["cor_dominante"][i:i + 2], 16) for i in (1, 3, 5))
+    assert abs(r - 30) < 8 and abs(g - 120) < 8 and abs(b - 200) < 8
+    assert resultado["miniatura"].startswith("data:image/webp;base64,")
+    assert len(resultado["miniatura"]) < 600
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        Product = models['Product']
+        db.session.add(Product(titulo="Mel", preco=10.0, estoque=1, imagem="imagens/mel.png", imagens=derivados))
+        db.session.commit()
+
+    data = app.test_client().get("/api/products?fields=id,imagens").get_json()
+    assert data == [{"id": 1, "imagens": derivados}]
+    assert ImageHelper.srcset(derivados, "image/jpeg") == (
+        "/static/imagens/derivados/mel-1280.jpg 1280w, "
+        "/static/imagens/derivados/mel-640.jpg 640w, "
+        "/static/imagens/derivados/mel-320.jpg 320w"
+    )
+    print("  ✅ Derivados OK")
+
+
+def test_upload_por_hash_e_dedupe():
+    """Upload salvo com nome = hash do conteúdo; conteúdo repetido vira o mesmo arquivo"""
+    print("\n🧪 Testando upload por hash...")
+    import hashlib
+    from io import BytesIO
+    from werkzeug.datastructures import FileStorage
+    from app.helpers import ImageHelper
+
+    pasta = tempfile.mkdtemp()
+    conteudo = b"\xff\xd8" + os.urandom(200 * 1024)
+    esperado = hashlib.sha256(conteudo).hexdigest()[:32] + ".jpg"
+
+    nome = ImageHelper.save_upload(FileStorage(BytesIO(conteudo), "mel.JPG"), pasta)
+    assert nome == esperado
+    assert ImageHelper.save_upload(FileStorage(BytesIO(conteudo), "outro nome.jpg"), pasta) == nome
+    outro = ImageHelper.save_upload(FileStorage(BytesIO(b"diferente"), "mel.jpg"), pasta)
+    assert outro != nome
+    assert sorted(os.listdir(pasta)) == sorted([nome, outro])  # sem temporários sobrando
+    with open(os.path.join(pasta, nome), "rb") as f:
+        assert f.read() == conteudo
+
+    assert ImageHelper.is_content_addressed(f"/static/imagens/{nome}")
+    assert ImageHelper.is_content_addressed(f"/static/imagens/derivados/{nome[:32]}-320.webp")
+    assert not ImageHelper.is_content_addressed("/static/imagens/mel.jpg")
+    assert not ImageHelper.is_content_addressed(f"/static/css/{nome}")
+    print("  ✅ Upload por hash OK")
+
+
+def test_worker_imagens_background():
+    """ImageJob processado no pool: derivados aplicados ao produto, pendentes retomados"""
+    print("\n🧪 Testando processamento de imagens em background...")
+    from datetime import datetime, timedelta
+    from app.helpers import ImageHelper
+    from app.utils.image_worker import ImageWorker
+
+    if not ImageHelper.is_available():
+        print("  ⚠️ Pillow não instalado, teste ignorado")
+        return
+
+    from PIL import Image
+
+    pasta = tempfile.mkdtemp()
+    Image.new("RGB", (900, 600), (200, 150, 0)).save(os.path.join(pasta, "a.jpg"))
+    Image.new("RGB", (400, 300), (120, 90, 0)).save(os.path.join(pasta, "b.jpg"))
+
+    app, db, models = criar_app_teste()
+    from app.models import ImageJob  # criado junto com os demais em init_models
+    Product = models['Product']
+    worker = ImageWorker()
+    worker.configure(app, db, Product, ImageJob, pasta, max_workers=2)
+
+    with app.app_context():
+        p1 = Product(titulo="A", preco=1.0, estoque=1, imagem="imagens/a.jpg")
+        p2 = Product(titulo="B", preco=1.0, estoque=1, imagem="imagens/b.jpg")
+        p3 = Product(titulo="C", preco=1.0, estoque=1, imagem="imagens/sumiu.jpg")
+        db.session.add_all([p1, p2, p3])
+        db.session.flush()
+        novo = ImageJob(product_id=p1.id, arquivo="a.jpg")
+        # Job de um processo que morreu no meio do processamento
+        travado = ImageJob(product_id=p2.id, arquivo="b.jpg", status='processando', tentativas=1,
+                           updated_at=datetime.utcnow() - timedelta(hours=1))
+        quebrado = ImageJob(product_id=p3.id, arquivo="sumiu.jpg")
+        db.session.add_all([novo, travado, quebrado])
+        db.session.commit()
+        ids = (novo.id, travado.id, quebrado.id)
+
+    worker.submit(ids[0])  # 1º uso no processo: também retoma os pendentes/travados
+    worker.wait(timeout=30)
+
+    with app.app_context():
+        status = {j.id: (j.status, j.tentativas) for j in ImageJob.query.all()}
+        assert status[ids[0]] == ('concluido', 1)
+        assert status[ids[1]] == ('concluido', 2)
+        assert status[ids[2]][0] == 'erro'
+        larguras = {p.titulo: sorted({d["largura"] for d in p.imagens or []}) for p in Product.query.all()}
+        assert larguras == {"A": [320, 640, 900], "B": [320, 400], "C": []}
+        a = Product.query.filter_by(titulo="A").one()
+        assert a.cor_dominante.startswith("#") and a.miniatura.startswith("data:image/webp")
+    print("  ✅ Worker de imagens OK")
+
+
+def test_api_products_por_ids():
+    """/api/products?ids= e POST em lote: um único IN, ordem pedida, formato da listagem"""
+    print("\n🧪 Testando busca de produtos por ids...")
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 10)
+        client = app.test_client()
+        listagem = {p["id"]: p for p in client.get("/api/products").get_json()}
+
+        with ContadorQueries(db.engine) as contador:
+            resp = client.get("/api/products?ids=7,2,999,2,5")
+        assert resp.status_code == 200
+        assert contador.total == 1
+        assert " IN " in contador.statements[0].upper()
+        assert resp.get_json() == [listagem[7], listagem[2], listagem[5]]
+
+        resp = client.post("/api/products", json={"ids": list(range(1, 11)), "fields": "id,preco"})
+        assert resp.status_code == 200
+        assert resp.get_json() == [{"id": i, "preco": listagem[i]["preco"]} for i in range(1, 11)]
+
+        assert client.get("/api/products?ids=1,x").status_code == 400
+        assert client.post("/api/products", json={"ids": []}).status_code == 400
+        assert client.post("/api/products", json={"ids": [True]}).status_code == 400
+        assert client.post("/api/products", json={"ids": list(range(501))}).status_code == 400
+    print("  ✅ Busca por ids OK")
+
+
+def test_feed_alteracoes_catalogo():
+    """/api/products/changes: só os alterados desde o seq, tombstones e limpeza"""
+    print("\n🧪 Testando feed de alterações do catálogo...")
+    from datetime import datetime, timedelta
+    from app.helpers import ChangeFeed, ReviewHelper
+
+    app, db, models = criar_app_teste()
+    Product, Review, CatalogChange = models['Product'], models['Review'], models['CatalogChange']
+    with app.app_context():
+        popular_catalogo(db, models, 5)
+        novo_cliente = models['User'](nome="Dani", email="dani@teste.com", senha_hash="x")
+        db.session.add_all([Product(titulo="Sem avaliações", preco=5.0, estoque=1), novo_cliente])
+        db.session.commit()
+        client = app.test_client()
+        inicio = client.get("/api/products/changes").get_json()
+        assert inicio == {"seq": 0, "itens": [], "removidos": [], "mais": False}
+
+        # Edição de preço, remoção e nova avaliação (cada uma na sua transação)
+        p2 = db.session.get(Product, 2)
+        p2.preco = 99.0
+        ChangeFeed.record(db, [2])
+        db.session.commit()
+        db.session.delete(db.session.get(Product, 6))
+        ChangeFeed.record(db, [6], deleted=True)
+        db.session.commit()
+        ReviewHelper.create_review(db, Product, Review, novo_cliente.id, 3, 5)
+
+        with ContadorQueries(db.engine) as contador:
+            resp = client.get("/api/products/changes?since=0&fields=preco,media")
+        assert resp.status_code == 200
+        assert contador.total == 2
+        data = resp.get_json()
+        assert data["seq"] == 3 and data["mais"] is False
+        assert data["itens"] == [{"id": 2, "preco": 99.0, "media": 2.0}, {"id": 3, "preco": 12.0, "media": 2.75}]
+        assert data["removidos"] == [6]
+
+        assert client.get("/api/products/changes?since=3").get_json()["itens"] == []
+        parcial = client.get("/api/products/changes?since=0&limit=2").get_json()
+        assert parcial["seq"] == 2 and parcial["mais"] is True and parcial["removidos"] == [6]
+        assert client.get("/api/products/changes?since=x").status_code == 400
+
+        # Limpeza: quem estava antes do que foi removido precisa recarregar tudo
+        assert ChangeFeed.prune(db, CatalogChange, datetime.utcnow() + timedelta(days=1)) == 2
+        assert client.get("/api/products/changes?since=0").status_code == 410
+        assert client.get("/api/products/changes?since=3").status_code == 200
+        assert client.get("/api/products/changes").get_json()["seq"] == 3
+    print("  ✅ Feed de alterações OK")
+
+
+def test_stream_estoque_sse():
+    """SSE de estoque: estado inicial, alteração via feed e limite de conexões"""
+    print("\n🧪 Testando stream de estoque (SSE)...")
+    import json
+    from app.helpers import ChangeFeed
+    from app.utils.catalog_cache import catalog_version
+    from app.utils.stock_stream import stock_stream
+
+    app, db, models = criar_app_teste()
+    Product = models['Product']
+    # Tick manual (poll) no teste: a thread do processo praticamente não roda
+    stock_stream.configure(app, db, Product, models['CatalogChange'], interval=3600, max_clients=1)
+
+    def evento(chunk):
+        linhas = chunk.decode('utf-8').strip().splitlines()
+        assert linhas[0] == "event: estoque"
+        return json.loads(linhas[1][len("data: "):])
+
+    with app.app_context():
+        popular_catalogo(db, models, 3)
+
+    client = app.test_client()
+    resp = client.get("/api/products/stream?ids=2,99")
+    assert resp.status_code == 200 and resp.mimetype == "text/event-stream"
+    stream = resp.response
+    abertura = next(stream).decode('utf-8')
+    assert "retry: 5000" in abertura
+    assert '{"id":2,"preco":11.0,"estoque":1}' in abertura
+    assert '{"id":99,"removido":true}' in abertura
+    assert stock_stream.subscribers == 1
+
+    assert client.get("/api/products/stream?ids=1").status_code == 503
+    assert client.get("/api/products/stream?ids=").status_code == 400
+
+    with app.app_context():
+        assert stock_stream.poll() == 0  # versão do catálogo não mudou: nem consulta
+        for pid, estoque in ((1, 0), (2, 0)):
+            db.session.get(Product, pid).estoque = estoque
+            ChangeFeed.record(db, [pid])
+        db.session.commit()
+        catalog_version.bump()
+        assert stock_stream.poll() == 2
+
+    # Só o produto assinado chega
+    assert evento(next(stream)) == {"id": 2, "preco": 11.0, "estoque": 0}
+
+    resp.close()
+    assert stock_stream.subscribers == 0
+    print("  ✅ Stream de estoque OK")
+
+
+def test_busca_facetas():
+    """facetas=1: contagens de preço, estoque e avaliação em uma consulta extra"""
+    print("\n🧪 Testando facetas da busca...")
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 20)  # preços 10..29, estoque 0..19, média 2.0
+        client = app.test_client()
+
+        with ContadorQueries(db.engine) as contador:
+            resp = client.get("/api/products/search?facetas=1&limit=5")
+        assert resp.status_code == 200
+        assert contador.total == 2, f"Queries: {contador.total}"
+        pagina = resp.get_json()
+        assert len(pagina["itens"]) == 5 and pagina["proximo_cursor"]
+
+        f = pagina["facetas"]
+        assert f["total"] == 20
+        assert [(b["min"], b["max"], b["total"]) for b in f["preco"]] == [
+            (0, 25, 15), (25, 50, 5), (50, 100, 0), (100, 200, 0), (200, None, 0)
+        ]
+        assert f["disponibilidade"] == {"disponivel": 10, "estoque_baixo": 9, "esgotado": 1}
+        assert f["avaliacao"] == {"4": 0, "3": 0, "2": 20, "1": 20}
+
+        # Mesmos filtros da busca (texto + preço)
+        resp = client.get("/api/products/search?facetas=1&q=mel 1&preco_max=15")
+        pagina = resp.get_json()
+        assert [p["titulo"] for p in pagina["itens"]] == ["Mel 1"]  # Mel 10+ custam 20+
+        assert pagina["facetas"]["total"] == 1
+        assert pagina["facetas"]["disponibilidade"] == {"disponivel": 0, "estoque_baixo": 1, "esgotado": 0}
+
+        # Sem facetas o formato da resposta não muda
+        assert isinstance(client.get("/api/products/search").get_json(), list)
+    print("  ✅ Facetas OK")
+
+
+def test_sugestoes_prefixo():
+    """/api/products/suggest: prefixo sem acento, início de palavra e sem banco por tecla"""
+    print("\n🧪 Testando autocompletar...")
+    import time
+    from app.utils.catalog_cache import catalog_version
+    from app.utils.suggest_index import SuggestIndex
+
+    app, db, models = criar_app_teste()
+    Product = models['Product']
+    with app.app_context():
+        for titulo in ("Mel Silvestre", "Mel de Laranjeira", "Própolis Verde", "Silvícola 500g"):
+            db.session.add(Product(titulo=titulo, preco=10.0, estoque=1))
+        db.session.commit()
+        client = app.test_client()
+
+        with ContadorQueries(db.engine) as contador:
+            assert [s["titulo"] for s in client.get("/api/products/suggest?q=silv").get_json()] == [
+                "Silvícola 500g", "Mel Silvestre"
+            ]
+            assert [s["titulo"] for s in client.get("/api/products/suggest?q=PROP").get_json()] == ["Própolis Verde"]
+            assert len(client.get("/api/products/suggest?q=mel").get_json()) == 2
+            assert client.get("/api/products/suggest?q=mel%20de%20lar").get_json()[0]["titulo"] == "Mel de Laranjeira"
+            assert client.get("/api/products/suggest?q=").get_json() == []
+        assert contador.total == 1, f"Queries: {contador.total}"  # só a montagem do índice
+
+        # Catálogo mudou: reconstrói uma vez
+        db.session.add(Product(titulo="Mel Orgânico", preco=10.0, estoque=1))
+        db.session.commit()
+        catalog_version.bump()
+        with ContadorQueries(db.engine) as contador:
+            assert len(client.get("/api/products/suggest?q=mel&limit=5").get_json()) == 3
+            client.get("/api/products/suggest?q=me")
+        assert contador.total == 1
+
+    indice = SuggestIndex()
+    indice.build((i, f"Mel Florada {i} Silvestre") for i in range(5000))
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        assert len(indice.suggest("silvestre", 8)) == 8
+    assert (time.perf_counter() - inicio) / 1000 < 0.005
+    print("  ✅ Autocompletar OK")
+
+
+def test_busca_aproximada_trigramas():
+    """Busca sem resultado exato cai na similaridade de trigramas (com ranking e corte)"""
+    print("\n🧪 Testando busca tolerante a erros de digitação...")
+
+    app, db, models = criar_app_teste()
+    Product = models['Product']
+    with app.app_context():
+        for titulo in ("Mel de Eucalipto", "Eucalipto Puro 1kg", "Mel Silvestre", "Própolis Verde"):
+            db.session.add(Product(titulo=titulo, preco=10.0, estoque=1))
+        db.session.commit()
+        client = app.test_client()
+
+        resp = client.get("/api/products/search?q=mel silvestre")
+        assert "X-Busca-Aproximada" not in resp.headers
+        assert [p["titulo"] for p in resp.get_json()] == ["Mel Silvestre"]
+
+        with ContadorQueries(db.engine) as contador:
+            resp = client.get("/api/products/search?q=silvestri")
+        assert resp.headers["X-Busca-Aproximada"] == "1"
+        assert [p["titulo"] for p in resp.get_json()] == ["Mel Silvestre"]
+        assert contador.total == 3  # busca exata + montagem do índice + busca aproximada
+
+        with ContadorQueries(db.engine) as contador:
+            data = client.get("/api/products/search?q=mel eucalipito").get_json()
+        assert contador.total == 2  # índice já montado: nada de varrer produtos
+        assert [p["titulo"] for p in data] == ["Mel de Eucalipto"]
+
+        # Ranking por similaridade, paginação e facetas sobre o conjunto aproximado
+        pagina = client.get("/api/products/search?q=eucalipito&limit=1&facetas=1").get_json()
+        assert len(pagina["itens"]) == 1 and pagina["proximo_cursor"]
+        assert pagina["facetas"]["total"] == 2
+        resto = client.get(f"/api/products/search?q=eucalipito&limit=1&cursor={pagina['proximo_cursor']}").get_json()
+        assert {pagina["itens"][0]["titulo"], resto["itens"][0]["titulo"]} == {"Mel de Eucalipto", "Eucalipto Puro 1kg"}
+
+        # Abaixo do limiar não aparece
+        resp = client.get("/api/products/search?q=xarope")
+        assert resp.get_json() == [] and resp.headers["X-Busca-Aproximada"] == "1"
+    print("  ✅ Busca aproximada OK")
+
+
+def test_cache_busca():
+    """Cache de busca: chave normalizada, invalidação por versão, LRU e TTL"""
+    print("\n🧪 Testando cache de resultados da busca...")
+    from app.utils.catalog_cache import catalog_version, search_cache, SearchCache
+
+    app, db, models = criar_app_teste()
+    with app.app_context():
+        popular_catalogo(db, models, 20)
+        client = app.test_client()
+
+        primeira = client.get("/api/products/search?q=mel 1&preco_min=12&ordenar=preco_asc")
+        with ContadorQueries(db.engine) as contador:
+            repetida = client.get("/api/products/search?q=MEL   1&preco_min=12.0&ordenar=preco_asc")
+        assert contador.total == 0
+        assert repetida.get_data() == primeira.get_data()
+        assert search_cache.stats()["acertos"] == 1 and search_cache.stats()["faltas"] == 1
+
+        # Outra página/outros parâmetros são outra entrada
+        client.get("/api/products/search?q=mel 1&preco_min=12&ordenar=preco_asc&limit=2")
+        assert search_cache.stats()["faltas"] == 2
+
+        # Catálogo mudou: a entrada antiga não vale mais
+        models['Product'].query.filter_by(titulo="Mel 15").update({"preco": 11.0})
+        db.session.commit()
+        catalog_version.bump()
+        with ContadorQueries(db.engine) as contador:
+            resp = client.get("/api/products/search?q=mel 1&preco_min=12&ordenar=preco_asc")
+        assert contador.total == 1
+        assert "Mel 15" not in {p["titulo"] for p in resp.get_json()}
+
+    # LRU + TTL isolados
+    cache = SearchCache(max_entries=2, ttl=60)
+    for chave in ("a", "b"):
+        cache.set(chave, 1, chave)
+    assert cache.get("a", 1) == "a"  # "a" passa a ser a mais recente
+    cache.set("c", 1, "c")
+    assert cache.get("b", 1) is None and cache.get("a", 1) == "a"
+    assert cache.stats()["descartes"] == 1
+    cache.configure(max_entries=2, ttl=0)
+    cache.set("a", 1, "a")
+    assert cache.get("a", 1) is None
+    print("  ✅ Cache de busca OK")
+
+
+def test_registro_buscas_em_lote():
+    """Buscas vão para o buffer sem tocar o banco e são gravadas num INSERT em lote"""
+    print("\n🧪 Testando registro de buscas em lote...")
+    from datetime import datetime, timedelta
+    from app.helpers import SearchReport
+    from app.utils.search_analytics import search_analytics
+
+    app, db, models = criar_app_teste()
+    SearchEvent = models['SearchEvent']
+    with app.app_context():
+        popular_catalogo(db, models, 5)
+        search_analytics.configure(app, db, SearchEvent, interval=3600, flush_size=1000)
+        client = app.test_client()
+
+        client.get("/api/products/search?q=mel&preco_max=13")
+        with ContadorQueries(db.engine) as contador:
+            client.get("/api/products/search?q=MEL&preco_max=13")  # do cache
+        assert contador.total == 0  # registrar não escreve no banco
+        client.get("/api/products/search?q=Mel  2")
+        client.get("/api/products/search?q=xyzw")
+        client.get("/api/products/search?q=xyzw")
+        # Próxima página é a mesma busca: não conta de novo
+        cursor = client.get("/api/products/search?q=mel&limit=2").get_json()["proximo_cursor"]
+        client.get(f"/api/products/search?q=mel&limit=2&cursor={cursor}")
+        # Ordenação desconhecida: 400, sem evento nem entrada no cache
+        resp = client.get("/api/products/search?q=mel&ordenar=" + "x" * 50)
+        assert resp.status_code == 400 and "ordenar" in resp.get_json()["error"]
+        assert search_analytics.pending == 6
+        assert SearchEvent.query.count() == 0
+
+        with ContadorQueries(db.engine) as contador:
+            assert search_analytics.flush() == 6
+        assert sum(1 for s in contador.statements if s.lstrip().upper().startswith("INSERT")) == 1
+        assert search_analytics.pending == 0 and SearchEvent.query.count() == 6
+
+        evento = SearchEvent.query.filter_by(termo="mel", cache=True).one()
+        assert evento.preco_max == 13 and evento.resultados == 4 and evento.latencia_ms >= 0
+
+        desde = datetime.utcnow() - timedelta(days=1)
+        top = SearchReport.top_queries(db, SearchEvent, desde)
+        assert [(t["termo"], t["buscas"]) for t in top] == [("mel", 3), ("xyzw", 2), ("mel 2", 1)]
+        assert SearchReport.zero_results(db, SearchEvent, desde) == [
+            {"termo": "xyzw", "buscas": 2, "ultima": SearchEvent.query.filter_by(termo="xyzw")
+             .order_by(SearchEvent.id.desc()).first().created_at}
+        ]
+
+    # Buffer limitado: os mais antigos são descartados
+    search_analytics.configure(app, db, SearchEvent, interval=3600, flush_size=1000, max_buffer=2)
+    for termo in ("a", "b", "c"):
+        search_analytics.record(termo, None, None, "relevancia", 1, 1.0)
+    assert search_analytics.stats() == {"pendentes": 2, "descartados": 1}
+    search_analytics.record("d", None, None, "x" * 50, 0, 1.0)
+    assert len(search_analytics._buffer[-1]["ordenar"]) == 20
+    search_analytics.clear()
+    print("  ✅ Registro de buscas OK")
+
+
+def test_carrinho_visitante_uma_consulta():
+    """Carrinho da sessão: página, /api/carrinho e checkout resolvem os produtos num único IN"""
+    print("\n🧪 Testando carrinho do visitante em lote...")
+    from flask import session
+    from app.helpers import CartHelper
+
+    app, db, models = criar_app_teste()
+    app.jinja_env.globals['csrf_token'] = lambda: ''
+    Product = models['Product']
+    with app.app_context():
+        popular_catalogo(db, models, 15, reviews_por_produto=0)
+        ids = [p.id for p in Product.query.order_by(Product.id)]
+        carrinho = {str(pid): 2 for pid in ids}
+        carrinho["9999"] = 1  # produto que saiu do catálogo
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['cart'] = carrinho
+
+        with ContadorQueries(db.engine) as contador:
+            pagina = client.get("/carrinho")
+        assert pagina.status_code == 200 and contador.total == 1
+        assert "Mel 14" in pagina.get_data(as_text=True)
+
+        with ContadorQueries(db.engine) as contador:
+            api = client.get("/api/carrinho").get_json()
+        assert contador.total == 1
+        assert [i["produto_id"] for i in api["itens"]] == ids
+        assert all(i["quantidade"] == 2 for i in api["itens"])
+
+        with app.test_request_context():
+            session['cart'] = carrinho
+            with ContadorQueries(db.engine) as contador:
+                itens = CartHelper.snapshot_cart_for_checkout(db, models['CartItem'], Product)
+        assert contador.total == 1
+        assert len(itens) == 15 and itens[0] == {"titulo": "Mel 0", "quantidade": 2, "preco": 10.0,
+                                                 "product_id": ids[0]}
+    print("  ✅ Carrinho do visitante OK")
+
+
+def test_carrinho_logado_um_join():
+    """Carrinho do usuário: itens e produtos num único SELECT com JOIN, para qualquer tamanho"""
+    print("\n🧪 Testando carrinho do usuário logado...")
+    from flask import session
+    from app.helpers import CartHelper
+
+    app, db, models = criar_app_teste()
+    app.jinja_env.globals['csrf_token'] = lambda: ''
+    Product, CartItem = models['Product'], models['CartItem']
+    with app.app_context():
+        popular_catalogo(db, models, 15, reviews_por_produto=0)
+        user_id = models['User'].query.first().id
+        ids = [p.id for p in Product.query.order_by(Product.id.desc())]
+        db.session.add_all(CartItem(user_id=user_id, product_id=pid, quantity=3) for pid in ids)
+        db.session.commit()
+        db.session.expunge_all()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+
+        with ContadorQueries(db.engine) as contador:
+            pagina = client.get("/carrinho")
+        assert pagina.status_code == 200 and contador.total == 1
+        assert " JOIN product " in contador.statements[0]
+        assert "descricao" not in contador.statements[0]  # só as colunas do carrinho
+
+        with ContadorQueries(db.engine) as contador:
+            api = client.get("/api/carrinho").get_json()
+        assert contador.total == 1
+        assert [i["produto_id"] for i in api["itens"]] == ids  # ordem de inclusão
+
+        with app.test_request_context():
+            session['user_id'] = user_id
+            with ContadorQueries(db.engine) as contador:
+                itens = CartHelper.snapshot_cart_for_checkout(db, CartItem, Product)
+        assert contador.total == 1
+        assert itens[0] == {"titulo": "Mel 14", "quantidade": 3, "preco": 24.0, "product_id": ids[0]}
+    print("  ✅ Carrinho do usuário OK")
+
+
+def test_carrinho_upsert_unico():
+    """Incremento do carrinho: um INSERT ... ON CONFLICT com trava de estoque; repetidas unificadas"""
+    print("\n🧪 Testando upsert do carrinho...")
+    from app.helpers import CartHelper
+
+    app, db, models = criar_app_teste()
+    Product, CartItem = models['Product'], models['CartItem']
+    with app.app_context():
+        popular_catalogo(db, models, 4, reviews_por_produto=0)  # estoque = i
+        user_id = models['User'].query.first().id
+        p2 = Product.query.filter_by(titulo="Mel 2").one().id
+        p0 = Product.query.filter_by(titulo="Mel 0").one().id
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+
+        with ContadorQueries(db.engine) as contador:
+            assert client.post(f"/carrinho/add/{p2}").status_code == 200
+        assert contador.total == 1 and "ON CONFLICT" in contador.statements[0]
+        assert client.post(f"/carrinho/update/{p2}/add").status_code == 200
+
+        # Estoque 2: o terceiro não entra (nem pela atualização)
+        resp = client.post(f"/carrinho/add/{p2}")
+        assert resp.status_code == 400 and resp.get_data(as_text=True) == "Estoque insuficiente"
+        assert client.post(f"/carrinho/update/{p2}/add").status_code == 400
+        assert client.post(f"/carrinho/add/{p0}").get_data(as_text=True) == "Produto esgotado"
+        assert client.post("/carrinho/add/9999").status_code == 404
+        assert [(i.product_id, i.quantity) for i in CartItem.query.all()] == [(p2, 2)]
+
+        assert client.post(f"/carrinho/update/{p2}/sub").status_code == 200
+        assert client.post(f"/carrinho/update/{p2}/sub").status_code == 200
+        assert CartItem.query.count() == 0
+
+        # Banco antigo, sem o índice e com linhas repetidas
+        db.session.execute(db.text(f"DROP INDEX {CartHelper.UNIQUE_INDEX}"))
+        db.session.add_all([CartItem(user_id=user_id, product_id=p2, quantity=1),
+                            CartItem(user_id=user_id, product_id=p0, quantity=1),
+                            CartItem(user_id=user_id, product_id=p2, quantity=2)])
+        db.session.commit()
+        assert CartHelper.ensure_unique_lines(db, CartItem) == 1
+        assert CartHelper.ensure_unique_lines(db, CartItem) == 0
+        db.session.expire_all()
+        assert sorted((i.product_id, i.quantity) for i in CartItem.query.all()) == sorted([(p2, 3), (p0, 1)])
+    print("  ✅ Upsert do carrinho OK")
+
+
+def test_carrinho_batch():
+    """/api/carrinho/batch: várias operações, uma leitura de estoque, tudo ou nada"""
+    print("\n🧪 Testando alterações do carrinho em lote...")
+    app, db, models = criar_app_teste()
+    Product, CartItem = models['Product'], models['CartItem']
+    with app.app_context():
+        popular_catalogo(db, models, 12, reviews_por_produto=0)  # estoque = i
+        user_id = models['User'].query.first().id
+        ids = {p.titulo: p.id for p in Product.query}
+        mel3, mel5, mel9 = ids["Mel 3"], ids["Mel 5"], ids["Mel 9"]
+        db.session.add(CartItem(user_id=user_id, product_id=mel9, quantity=4))
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+
+        operacoes = [
+            {"produto_id": mel3, "acao": "add", "quantidade": 2},
+            {"produto_id": mel3, "acao": "sub"},
+            {"produto_id": mel5, "acao": "set", "quantidade": 5},
+            {"produto_id": mel9, "acao": "remove"},
+        ]
+        with ContadorQueries(db.engine) as contador:
+            resp = client.post("/api/carrinho/batch", json={"operacoes": operacoes})
+        assert resp.status_code == 200, resp.get_json()
+        # leitura de estoque + DELETE + INSERT ... ON CONFLICT + carrinho atualizado
+        assert contador.total == 4
+        assert resp.get_json() == {
+            "itens": [{"produto_id": mel3, "quantidade": 1}, {"produto_id": mel5, "quantidade": 5}],
+            "total": 13.0 + 5 * 15.0
+        }
+
+        # Acima do estoque: nada é aplicado
+        resp = client.post("/api/carrinho/batch", json={"operacoes": [
+            {"produto_id": mel3, "acao": "add"},
+            {"produto_id": mel5, "acao": "add"},
+        ]})
+        assert resp.status_code == 409
+        assert resp.get_json()["produtos"] == [{"produto_id": mel5, "erro": "Estoque insuficiente", "estoque": 5}]
+        assert {i.product_id: i.quantity for i in CartItem.query} == {mel3: 1, mel5: 5}
+
+        # Estoque caiu abaixo do carrinho: diminuir continua permitido
+        Product.query.filter_by(id=mel5).update({"estoque": 2})
+        db.session.commit()
+        resp = client.post("/api/carrinho/batch", json={"operacoes": [{"produto_id": mel5, "acao": "sub"}]})
+        assert resp.status_code == 200 and resp.get_json()["itens"][1]["quantidade"] == 4
+
+        for corpo in ({}, {"operacoes": [{"produto_id": mel3, "acao": "dobrar"}]},
+                      {"operacoes": [{"produto_id": mel3, "acao": "set"}]},
+                      {"operacoes": [{"produto_id": "x", "acao": "add"}]}):
+            assert client.post("/api/carrinho/batch", json=corpo).status_code == 400
+
+        # Visitante: mesma API sobre o carrinho da sessão
+        visitante = app.test_client()
+        resp = visitante.post("/api/carrinho/batch", json={"operacoes": [
+            {"produto_id": mel3, "acao": "set", "quantidade": 3},
+            {"produto_id": 9999, "acao": "remove"},
+        ]})
+        assert resp.get_json()["itens"] == [{"produto_id": mel3, "quantidade": 3}]
+        with visitante.session_transaction() as sess:
+            assert sess['cart'] == {str(mel3): 3}
+        resp = visitante.post("/api/carrinho/batch", json={"operacoes": [{"produto_id": 9999, "acao": "add"}]})
+        assert resp.status_code == 409 and resp.get_json()["produtos"][0]["erro"] == "Produto não encontrado"
+    print("  ✅ Carrinho em lote OK")
+
+
+def test_login_junta_carrinho_sessao():
+    """Login passa o carrinho da sessão para o banco: uma consulta de estoque + um upsert em lote"""
+    print("\n🧪 Testando junção do carrinho no login...")
+    from werkzeug.security import generate_password_hash
+    from app.routes.auth import auth_bp, init_auth
+
+    app, db, models = criar_app_teste()
+    init_auth(db, models['User'], app.config, None, logging.getLogger("test_catalog"))
+    app.register_blueprint(auth_bp)
+    Product, CartItem, User = models['Product'], models['CartItem'], models['User']
+    with app.app_context():
+        popular_catalogo(db, models, 20, reviews_por_produto=0)  # estoque = i
+        user = User(nome="Comprador", email="comprador@teste.com",
+                    senha_hash=generate_password_hash("Senha123"))
+        db.session.add(user)
+        db.session.flush()
+        ids = {p.titulo: p.id for p in Product.query}
+        db.session.add(CartItem(user_id=user.id, product_id=ids["Mel 4"], quantity=3))
+        db.session.commit()
+        user_id = user.id
+
+        carrinho = {str(ids[f"Mel {i}"]): 2 for i in range(1, 20)}
+        carrinho[str(ids["Mel 0"])] = 1      # esgotado
+        carrinho[str(ids["Mel 4"])] = 3      # já no banco: 3 + 3 limitado ao estoque 4
+        carrinho[str(ids["Mel 1"])] = 5      # acima do estoque 1
+        carrinho["9999"] = 1                 # saiu do catálogo
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['cart'] = carrinho
+
+        with ContadorQueries(db.engine) as contador:
+            resp = client.post("/login", data={"email": "comprador@teste.com", "senha": "Senha123"})
+        assert resp.status_code == 302
+        # usuário + estoque + INSERT ... ON CONFLICT + usuário recarregado após o commit,
+        # independente do tamanho do carrinho
+        assert contador.total == 4
+        assert sum("ON CONFLICT" in st for st in contador.statements) == 1
+
+        db.session.expire_all()
+        linhas = {i.product_id: i.quantity for i in CartItem.query.filter_by(user_id=user_id)}
+        assert len(linhas) == 19 and ids["Mel 0"] not in linhas
+        assert linhas[ids["Mel 1"]] == 1 and linhas[ids["Mel 4"]] == 4 and linhas[ids["Mel 19"]] == 2
+        with client.session_transaction() as sess:
+            assert 'cart' not in sess and sess['user_id'] == user_id
+    print("  ✅ Junção do carrinho no login OK")
+
+
+def test_colunas_novas_em_banco_antigo():
+    """Banco anterior aos contadores/derivados: colunas criadas na inicialização, contadores recalculados"""
+    print("\n🧪 Testando colunas novas em banco existente...")
+    from app.helpers import ImageHelper, ReviewHelper
+
+    app, db, models = criar_app_teste()
+    Product, Review = models['Product'], models['Review']
+    with app.app_context():
+        popular_catalogo(db, models, 3)
+        for coluna in (*ReviewHelper.COUNTER_COLUMNS, *ImageHelper.COLUMNS):
+            db.session.execute(db.text(f"ALTER TABLE product DROP COLUMN {coluna}"))
+        db.session.commit()
+
+        assert ImageHelper.ensure_columns(db) is True
+        assert ReviewHelper.ensure_columns(db, Product, Review) is True
+        # Idempotente: na próxima inicialização não faz nada
+        assert ImageHelper.ensure_columns(db) is False
+        assert ReviewHelper.ensure_columns(db, Product, Review) is False
+        # Contadores recalculados chegam aos clientes do feed de alterações
+        CatalogChange = models['CatalogChange']
+        assert [c.product_id for c in CatalogChange.query.order_by(CatalogChange.seq)] == \
+            [p.id for p in Product.query.order_by(Product.id)]
+
+    data = app.test_client().get("/api/products").get_json()
+    assert [(p["n_reviews"], p["media"]) for p in data] == [(3, 2.0)] * 3
+    assert all(p["imagens"] == [] for p in data)
+    print("  ✅ Colunas novas OK")
+
+
+def test_avaliacao_unica_por_usuario():
+    """Índice único em review: duplicata barrada, bancos antigos deduplicados e contadores recalculados"""
+    print("\n🧪 Testando avaliação única por usuário...")
+    from sqlalchemy.exc import IntegrityError
+    from app.helpers import ReviewHelper
+
+    app, db, models = criar_app_teste()
+    Product, Review, CatalogChange = models['Product'], models['Review'], models['CatalogChange']
+    with app.app_context():
+        popular_catalogo(db, models, 2)
+        produto = Product.query.first()
+
+        # Requisição simultânea que passou pela verificação da rota: o banco barra
+        try:
+            ReviewHelper.create_review(db, Product, Review, 1, produto.id, 5)
+            assert False, "duplicata aceita"
+        except IntegrityError:
+            pass
+        db.session.refresh(produto)
+        assert produto.n_reviews == 3 and produto.soma_notas == 6
+
+        # Banco anterior ao índice, com avaliações repetidas
+        db.session.execute(db.text(f"DROP INDEX {ReviewHelper.UNIQUE_INDEX}"))
+        db.session.execute(db.text(
+            "INSERT INTO review (user_id, product_id, nota, created_at) "
+            f"VALUES (1, {produto.id}, 5, '2026-01-01'), (1, {produto.id}, 4, '2026-01-02')"
+        ))
+        db.session.commit()
+        seq = db.session.query(db.func.max(CatalogChange.seq)).scalar() or 0
+
+        assert ReviewHelper.ensure_unique_reviews(db, Product, Review) == 2
+        assert ReviewHelper.ensure_unique_reviews(db, Product, Review) == 0
+        db.session.refresh(produto)
+        # Fica a mais recente do usuário 1 (nota 4) + as notas 2 e 3 dos outros
+        assert produto.n_reviews == 3 and produto.soma_notas == 9
+        assert [c.product_id for c in CatalogChange.query.filter(CatalogChange.seq > seq)] == [produto.id]
+
+    # Rota: segunda avaliação do mesmo usuário é 409
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = 1
+    assert client.post(f"/api/product/{produto.id}/reviews", json={"nota": 5}).status_code == 409
+    print("  ✅ Avaliação única OK")
+
+
+if __name__ == "__main__":
+    test_api_products_agregados()
+    test_api_products_queries_constantes()
+    test_api_products_search_filtros_sql()
+    test_api_products_cache_etag()
+    test_busca_textual_indice()
+    test_indice_criado_por_outro_processo()
+    test_paginacao_keyset_e_fields()
+    test_detalhe_produto_histograma_e_reviews_paginadas()
+    test_api_avaliacoes_contadores()
+    test_json_provider_datas_e_fallback()
+    test_derivados_imagem_e_srcset()
+    test_upload_por_hash_e_dedupe()
+    test_worker_imagens_background()
+    test_api_products_por_ids()
+    test_feed_alteracoes_catalogo()
+    test_stream_estoque_sse()
+    test_busca_facetas()
+    test_sugestoes_prefixo()
+    test_busca_aproximada_trigramas()
+    test_cache_busca()
+    test_registro_buscas_em_lote()
+    test_carrinho_visitante_uma_consulta()
+    test_carrinho_logado_um_join()
+    test_carrinho_upsert_unico()
+    test_carrinho_batch()
+    test_login_junta_carrinho_sessao()
+    test_colunas_novas_em_banco_antigo()
+    test_avaliacao_unica_por_usuario()